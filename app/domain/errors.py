@@ -13,6 +13,8 @@ class NotFoundError(Exception):
 
 class ValidationError(Exception):
     def __init__(self, message):
+        # Passed on to Exception as well, so that str(error) is the message however the error was raised.
+        super().__init__(message)
         self.message = message
 
 
@@ -30,3 +32,8 @@ class AlreadyExistsError(Exception):
     def __init__(self, message_prefix: Optional[str] = ""):
         self.base_message = "with the provided params already existsts."
         self.message = message_prefix + self.base_message
+
+
+class ReadOnlyError(Exception):
+    def __init__(self, message: Optional[str] = "Writes are not allowed in a read-only unit of work."):
+        self.message = message
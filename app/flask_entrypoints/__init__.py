@@ -5,4 +5,6 @@ from dotenv import load_dotenv
 load_dotenv()
 
 adv = flask.Flask('adv')
-adv.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY")
\ No newline at end of file
+adv.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY")
+# Soft-deleted users disappear at once; their advertisements are purged by app.service_layer.purge_worker.
+adv.config["USER_SOFT_DELETE"] = os.getenv("USER_SOFT_DELETE", "").lower() in ("1", "true")
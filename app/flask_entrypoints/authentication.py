@@ -1,7 +1,12 @@
 from typing import Any
-from flask_jwt_extended import JWTManager, create_access_token, get_jwt_identity
+
+import flask
+from flask_jwt_extended import JWTManager, create_access_token, get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
 
 import app.domain.errors
+import app.orm.routing
 from app.flask_entrypoints import adv
 from app.domain.models import UserColumns
 
@@ -38,3 +43,18 @@ def check_current_user(user_id: int | None = None, get_cuid: bool = True) -> int
             return
         return current_user_id
     raise app.domain.errors.CurrentUserError
+
+
+@adv.before_request
+def set_client_keys() -> None:
+    """
+    Identifies the client of the request for read-your-writes routing: by its address, and by its user id when the
+    request carries a valid access token. Invalid tokens are left for ``jwt_required()`` to reject.
+    """
+    keys = [f"addr:{flask.request.remote_addr}"]
+    try:
+        if verify_jwt_in_request(optional=True) is not None:
+            keys.append(f"user:{get_jwt_identity()}")
+    except (JWTExtendedException, PyJWTError):
+        pass
+    app.orm.routing.client_keys.set(tuple(keys))
@@ -0,0 +1,51 @@
+"""
+Bulk import of users or advertisements from a CSV file with a header line, or an NDJSON file, through ``COPY``.
+
+Usage::
+
+    python -m app.flask_entrypoints.import_data users FILE [--format csv|ndjson] [--batch-size N] [--workers N]
+        [--on-conflict skip|fail]
+    python -m app.flask_entrypoints.import_data advs FILE ...
+
+User records have "name", "email", "password" and an optional "creation_date"; advertisement records have
+"title", "description", "user_id" and an optional "creation_date". Use "-" as FILE to read the standard input.
+With several shards, users are imported into the shard of their e-mail and advertisements into the shard of their
+owner, as the application routes them.
+"""
+import argparse
+import sys
+
+import app.orm
+from app.repository.bulk_import import TARGETS, ImportStats, import_records, read_records
+
+
+def print_progress(stats: ImportStats) -> None:
+    print(f"{stats.read} read, {stats.imported} imported, {stats.skipped} skipped, {stats.invalid} invalid, "
+          f"{stats.rows_per_second:.0f} rows/s", file=sys.stderr)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.flask_entrypoints.import_data",
+                                     description="Bulk import of users or advertisements.")
+    parser.add_argument("target", choices=list(TARGETS), help="table to import into")
+    parser.add_argument("file", type=argparse.FileType("r", encoding="utf-8"), help='file to import, or "-"')
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="file format, guessed from the file extension "
+                                                                    "by default")
+    parser.add_argument("--batch-size", type=int, default=5000, help="number of records per transaction")
+    parser.add_argument("--workers", type=int, help="number of password hashing processes")
+    parser.add_argument("--on-conflict", choices=["skip", "fail"], default="skip",
+                        help="skip users with taken emails and advertisements of unknown users, or fail the batch")
+    args = parser.parse_args(argv)
+
+    file_format = args.format or ("ndjson" if args.file.name.endswith((".ndjson", ".jsonl")) else "csv")
+    stats = import_records(
+        shard_router=app.orm.shard_router, target=TARGETS[args.target],
+        records=read_records(file=args.file, file_format=file_format), batch_size=args.batch_size,
+        skip_conflicts=args.on_conflict == "skip", workers=args.workers, on_batch=print_progress
+    )
+    print(f"Imported {stats.imported} of {stats.read} records ({stats.skipped} skipped, {stats.invalid} invalid) "
+          f"in {stats.seconds:.1f} s, {stats.rows_per_second:.0f} rows/s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 import app.orm.table_mapper
 from app.flask_entrypoints import adv, views
+from app.service_layer.purge_worker import create_purge_worker
 
 if __name__ == "__main__":
     app.orm.table_mapper.start_mapping()
+    if adv.config["USER_SOFT_DELETE"]:
+        create_purge_worker().start()
 
     adv.run(debug=True)
@@ -1,22 +1,29 @@
+import csv
+import dataclasses
+import functools
+import io
+import json
+from typing import Callable, Iterator, Optional
+
 from flask import request, jsonify, Response
 from flask_jwt_extended import jwt_required
 
 import app.domain.errors
+import app.orm
 import app.repository.filtering
 from app.flask_entrypoints import adv, authentication
 from app.service_layer import app_manager
 from app.pass_hashing_and_validation import pass_hashing, validation
 from app.flask_entrypoints.error_handlers import HttpError
 
-from app.service_layer.unit_of_work import UnitOfWork
-
 
 @adv.route("/users/<int:user_id>/", methods=["GET"])
 @jwt_required()
 def get_user_data(user_id: int) -> tuple[Response, int]:
     try:
         user_data: dict = app_manager.get_user_data(
-            user_id=user_id, check_current_user_func=authentication.check_current_user, uow=UnitOfWork()
+            user_id=user_id, check_current_user_func=authentication.check_current_user,
+            uow=app_manager.get_user_data.unit_of_work()
         )
         return jsonify(user_data), 200
     except app.domain.errors.CurrentUserError as e:
@@ -30,7 +37,7 @@ def create_user():
     try:
         new_user_id: int = app_manager.create_user(
             user_data=request.json, validate_func=validation.validate_data_for_user_creation,
-            hash_pass_func=pass_hashing.hash_password, uow=UnitOfWork()
+            hash_pass_func=pass_hashing.hash_password, uow=app_manager.create_user.unit_of_work()
         )
         return jsonify({"user_id": new_user_id}), 201
     except app.domain.errors.ValidationError as e:
@@ -46,13 +53,17 @@ def update_user(user_id: int):
         updated_user_data: dict = app_manager.update_user(
             user_id=user_id, check_current_user_func=authentication.check_current_user,
             validate_func=validation.validate_data_for_user_updating, hash_pass_func=pass_hashing.hash_password,
-            new_data=request.json, uow=UnitOfWork()
+            new_data=request.json, uow=app_manager.update_user.unit_of_work()
         )
         return jsonify({"modified_data": updated_user_data}), 200
     except app.domain.errors.CurrentUserError as e:
         raise HttpError(status_code=403, description=e.message)
     except app.domain.errors.ValidationError as e:
         raise HttpError(status_code=400, description=str(e))
+    except app.domain.errors.AlreadyExistsError as e:
+        raise HttpError(status_code=409, description=f"A user {e.message}")
+    except app.domain.errors.NotFoundError as e:
+        raise HttpError(status_code=404, description=e.message)
 
 
 @adv.route("/users/<int:user_id>/advertisements", methods=["GET"])
@@ -66,7 +77,13 @@ def get_related_advs(user_id: int):
             check_current_user_func=authentication.check_current_user,
             page=page,
             per_page=per_page,
-            uow=UnitOfWork()
+            cursor=request.args.get("cursor"),
+            include_total=request.args.get("include_total"),
+            sort=request.args.get("sort"),
+            created_from=request.args.get("created_from"),
+            created_to=request.args.get("created_to"),
+            fields=request.args.get("fields"),
+            uow=app_manager.get_related_advs.unit_of_work()
         )
         return result, 200
     except app.domain.errors.CurrentUserError:
@@ -82,11 +99,14 @@ def get_related_advs(user_id: int):
 def delete_user(user_id: int):
     try:
         deleted_user_params: dict[str, str | int] = app_manager.delete_user(
-            user_id=user_id, check_current_user_func=authentication.check_current_user, uow=UnitOfWork()
+            user_id=user_id, check_current_user_func=authentication.check_current_user,
+            uow=app_manager.delete_user.unit_of_work(), soft=adv.config["USER_SOFT_DELETE"]
         )
         return jsonify({"deleted_user_params": deleted_user_params}), 200
     except app.domain.errors.CurrentUserError:
         raise HttpError(status_code=403, description="Unavailable operation.")
+    except app.domain.errors.NotFoundError as e:
+        raise HttpError(status_code=404, description=e.message)
 
 
 @adv.route("/advertisements/<int:adv_id>/", methods=["GET"])
@@ -94,7 +114,8 @@ def delete_user(user_id: int):
 def get_adv_params(adv_id: int):
     try:
         adv_params: dict[str, str | int] = app_manager.get_adv_params(
-            adv_id=adv_id, check_current_user_func=authentication.check_current_user, uow=UnitOfWork()
+            adv_id=adv_id, check_current_user_func=authentication.check_current_user,
+            uow=app_manager.get_adv_params.unit_of_work()
         )
         return adv_params, 200
     except app.domain.errors.CurrentUserError as e:
@@ -109,7 +130,8 @@ def create_adv():
     try:
         new_adv_id: int = app_manager.create_adv(
             get_auth_user_id_func=authentication.get_authenticated_user_identity,
-            validate_func=validation.validate_data_for_adv_creation, adv_params=request.json, uow=UnitOfWork()
+            validate_func=validation.validate_data_for_adv_creation, adv_params=request.json,
+            uow=app_manager.create_adv.unit_of_work()
         )
         return jsonify({'new_advertisement_id': new_adv_id}), 201
     except app.domain.errors.CurrentUserError as e:
@@ -118,19 +140,70 @@ def create_adv():
         raise HttpError(status_code=400, description=str(e))
 
 
+@adv.route("/advertisements/bulk", methods=["POST"])
+@jwt_required()
+def create_advs():
+    try:
+        result: dict[str, list[dict]] = app_manager.create_advs(
+            get_auth_user_id_func=authentication.get_authenticated_user_identity,
+            validate_func=validation.validate_data_for_bulk_adv_creation, advs_params=request.json,
+            skip_invalid=request.args.get("skip_invalid", "").lower() in ("1", "true"),
+            uow=app_manager.create_advs.unit_of_work()
+        )
+        return jsonify(result), 201
+    except app.domain.errors.CurrentUserError as e:
+        raise HttpError(status_code=403, description=e.message)
+    except app.domain.errors.ValidationError as e:
+        raise HttpError(status_code=400, description=e.message)
+
+
+@adv.route("/advertisements/bulk", methods=["PATCH"])
+@jwt_required()
+def update_advs():
+    try:
+        updated_ids: list[int] = app_manager.update_advs(
+            get_auth_user_id_func=authentication.get_authenticated_user_identity,
+            validate_selection_func=validation.validate_bulk_selection,
+            validate_func=validation.validate_data_for_adv_updating, params=request.json,
+            uow=app_manager.update_advs.unit_of_work()
+        )
+    except app.domain.errors.ValidationError as e:
+        raise HttpError(status_code=400, description=str(e.message))
+    except app.domain.errors.AlreadyExistsError as e:
+        raise HttpError(status_code=409, description=f"An advertisement {e.message}")
+    return {"updated_advertisement_ids": updated_ids}, 200
+
+
+@adv.route("/advertisements/bulk", methods=["DELETE"])
+@jwt_required()
+def delete_advs():
+    try:
+        deleted_ids: list[int] = app_manager.delete_advs(
+            get_auth_user_id_func=authentication.get_authenticated_user_identity,
+            validate_selection_func=validation.validate_bulk_selection, params=request.json,
+            uow=app_manager.delete_advs.unit_of_work()
+        )
+    except app.domain.errors.ValidationError as e:
+        raise HttpError(status_code=400, description=str(e.message))
+    return {"deleted_advertisement_ids": deleted_ids}, 200
+
+
 @adv.route("/advertisements/<int:adv_id>/", methods=["PATCH"])
 @jwt_required()
 def update_adv(adv_id: int):
     try:
         updated_adv_params: dict [str, str | int] = app_manager.update_adv(
-            adv_id=adv_id, new_params=request.json, check_current_user_func=authentication.check_current_user,
-            validate_func=validation.validate_data_for_adv_updating, uow=UnitOfWork())
+            adv_id=adv_id, new_params=request.json,
+            get_auth_user_id_func=authentication.get_authenticated_user_identity,
+            validate_func=validation.validate_data_for_adv_updating, uow=app_manager.update_adv.unit_of_work())
     except app.domain.errors.NotFoundError as e:
         raise HttpError(status_code=404, description=e.message)
     except app.domain.errors.CurrentUserError as e:
         raise HttpError(status_code=403, description=e.message)
     except app.domain.errors.ValidationError as e:
         raise HttpError(status_code=400, description=str(e))
+    except app.domain.errors.AlreadyExistsError as e:
+        raise HttpError(status_code=409, description=f"An advertisement {e.message}")
     return {"updated_adv_params": updated_adv_params}, 200
 
 
@@ -140,21 +213,90 @@ def search_advs_by_text():
         paginated_result: dict[str, str | int] = app_manager.search_advs_by_text(
             column=request.args.get("column"),
             column_value=request.args.get("column_value"),
-            uow=UnitOfWork(),
+            uow=app_manager.search_advs_by_text.unit_of_work(),
             page=request.args.get("page"),
-            per_page=request.args.get("per_page")
+            per_page=request.args.get("per_page"),
+            cursor=request.args.get("cursor"),
+            include_total=request.args.get("include_total"),
+            filter_type=request.args.get("filter_type"),
+            rank=request.args.get("rank", "").lower() in ("1", "true"),
+            filter_expression=request.args.get("filter"),
+            sort=request.args.get("sort"),
+            created_from=request.args.get("created_from"),
+            created_to=request.args.get("created_to"),
+            fields=request.args.get("fields")
         )
     except app.domain.errors.ValidationError as e:
         raise HttpError(status_code=400, description=str(e.message))
     return paginated_result, 200
 
 
+# Media types of the export formats; rows are sent in chunks of EXPORT_CHUNK_ROWS.
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+EXPORT_CHUNK_ROWS = 500
+
+
+def _encode_export(first_row: Optional[dict], rows: Iterator[dict], export_format: str) -> Iterator[str]:
+    """
+    Encodes the streamed rows, one chunk of lines at a time. Closing the response, e.g. when the client
+    disconnects, closes ``rows`` and with it the database cursor.
+    """
+    try:
+        if first_row is None:
+            return
+        buffer = io.StringIO()
+        if export_format == "csv":
+            writer = csv.DictWriter(buffer, fieldnames=list(first_row))
+            writer.writeheader()
+            write_row = writer.writerow
+        else:
+            write_row = lambda row: buffer.write(json.dumps(row, ensure_ascii=False) + "\n")
+        write_row(first_row)
+        for count, row in enumerate(rows, start=2):
+            write_row(row)
+            if count % EXPORT_CHUNK_ROWS == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    finally:
+        rows.close()
+
+
+@adv.route("/advertisements/export", methods=["GET"])
+def export_advs():
+    export_format = request.args.get("format", "ndjson")
+    if export_format not in EXPORT_FORMATS:
+        raise HttpError(status_code=400, description=f"Valid formats are: {list(EXPORT_FORMATS)}")
+    rows = app_manager.export_advs(
+        column=request.args.get("column"),
+        column_value=request.args.get("column_value"),
+        uow=app_manager.export_advs.unit_of_work(),
+        filter_type=request.args.get("filter_type"),
+        filter_expression=request.args.get("filter"),
+        sort=request.args.get("sort"),
+        created_from=request.args.get("created_from"),
+        created_to=request.args.get("created_to"),
+        fields=request.args.get("fields")
+    )
+    try:
+        first_row = next(rows, None)
+    except app.domain.errors.ValidationError as e:
+        raise HttpError(status_code=400, description=str(e.message))
+    return Response(
+        _encode_export(first_row=first_row, rows=rows, export_format=export_format),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f"attachment; filename=advertisements.{export_format}"}
+    ), 200
+
+
 @adv.route("/advertisements/<int:adv_id>/", methods=["DELETE"])
 @jwt_required()
 def delete_adv(adv_id: int):
     try:
         deleted_adv_params: dict[str, str | int] = app_manager.delete_adv(
-            adv_id=adv_id, get_auth_user_id_func=authentication.get_authenticated_user_identity, uow=UnitOfWork()
+            adv_id=adv_id, get_auth_user_id_func=authentication.get_authenticated_user_identity,
+            uow=app_manager.delete_adv.unit_of_work()
         )
     except app.domain.errors.CurrentUserError as e:
         raise HttpError(status_code=403, description=e.message)
@@ -163,6 +305,114 @@ def delete_adv(adv_id: int):
     return {"deleted_advertisement_params": deleted_adv_params}, 200
 
 
+@dataclasses.dataclass(frozen=True)
+class BatchOperation:
+    """
+    Operation of ``POST /batch``: the service function, the model of the params a client passes to it, the
+    dependencies the single-operation endpoint injects, how that endpoint wraps the result, and the subject of
+    its "already exists" message.
+    """
+    func: Callable
+    params_model: type[validation.BatchParams]
+    dependencies: dict[str, Callable] = dataclasses.field(default_factory=dict)
+    result_key: Optional[str] = None
+    status_code: int = 200
+    subject: str = "An advertisement"
+
+
+BATCH_OPERATIONS: dict[str, BatchOperation] = {
+    "get_user": BatchOperation(
+        func=app_manager.get_user_data, params_model=validation.UserParams, subject="A user",
+        dependencies={"check_current_user_func": authentication.check_current_user}
+    ),
+    "update_user": BatchOperation(
+        func=app_manager.update_user, params_model=validation.UpdateUserParams, result_key="modified_data",
+        subject="A user",
+        dependencies={"check_current_user_func": authentication.check_current_user,
+                      "validate_func": validation.validate_data_for_user_updating,
+                      "hash_pass_func": pass_hashing.hash_password}
+    ),
+    "get_adv": BatchOperation(
+        func=app_manager.get_adv_params, params_model=validation.AdvParams,
+        dependencies={"check_current_user_func": authentication.check_current_user}
+    ),
+    "create_adv": BatchOperation(
+        func=app_manager.create_adv, params_model=validation.CreateAdvParams, result_key="new_advertisement_id",
+        status_code=201,
+        dependencies={"get_auth_user_id_func": authentication.get_authenticated_user_identity,
+                      "validate_func": validation.validate_data_for_adv_creation}
+    ),
+    "update_adv": BatchOperation(
+        func=app_manager.update_adv, params_model=validation.UpdateAdvParams, result_key="updated_adv_params",
+        dependencies={"get_auth_user_id_func": authentication.get_authenticated_user_identity,
+                      "validate_func": validation.validate_data_for_adv_updating}
+    ),
+    "delete_adv": BatchOperation(
+        func=app_manager.delete_adv, params_model=validation.AdvParams, result_key="deleted_advertisement_params",
+        dependencies={"get_auth_user_id_func": authentication.get_authenticated_user_identity}
+    )
+}
+
+BATCH_ERROR_STATUS_CODES = {
+    app.domain.errors.ValidationError: 400,
+    app.domain.errors.AccessDeniedError: 401,
+    app.domain.errors.CurrentUserError: 403,
+    app.domain.errors.NotFoundError: 404,
+    app.domain.errors.AlreadyExistsError: 409
+}
+
+
+@adv.route("/batch", methods=["POST"])
+@jwt_required()
+def run_batch():
+    try:
+        batch: dict = validation.validate_batch_request(
+            **(request.json if isinstance(request.json, dict) else {})
+        )
+    except app.domain.errors.ValidationError as e:
+        raise HttpError(status_code=400, description=str(e.message))
+    operations, invalid_operations = [], {}
+    for index, operation in enumerate(batch["operations"]):
+        batch_operation: Optional[BatchOperation] = BATCH_OPERATIONS.get(operation["op"])
+        if batch_operation is None:
+            invalid_operations[index] = f"Valid operations are: {list(BATCH_OPERATIONS)}"
+            continue
+        try:
+            params: dict = validation.validate_data(validation_model=batch_operation.params_model,
+                                                    data=operation.get("params", {}))
+        except app.domain.errors.ValidationError as e:
+            invalid_operations[index] = e.message
+            continue
+        operations.append(functools.partial(batch_operation.func, **batch_operation.dependencies, **params))
+    if invalid_operations:
+        raise HttpError(status_code=400, description=str({"invalid_operations": invalid_operations}))
+    outcomes, committed = app_manager.run_batch(
+        get_auth_user_id_func=authentication.get_authenticated_user_identity, operations=operations,
+        atomic=batch.get("atomic", False), uow=app_manager.run_batch.unit_of_work()
+    )
+    results = []
+    for operation, (result, error) in zip(batch["operations"], outcomes):
+        batch_operation = BATCH_OPERATIONS[operation["op"]]
+        if isinstance(error, app.domain.errors.AlreadyExistsError):
+            results.append({"status": 409, "errors": f"{batch_operation.subject} {error.message}"})
+        elif error is not None:
+            results.append({"status": BATCH_ERROR_STATUS_CODES[type(error)], "errors": str(error.message)})
+        elif not committed:
+            # Succeeded before the failing operation of an atomic batch, then rolled back with it.
+            results.append({"status": 424, "errors": "Rolled back: a later operation failed."})
+        else:
+            results.append({
+                "status": batch_operation.status_code,
+                "result": result if batch_operation.result_key is None else {batch_operation.result_key: result}
+            })
+    # Operations after the failing one of an atomic batch are not run.
+    results.extend(
+        {"status": 424, "errors": "Not run: an earlier operation failed."}
+        for _ in range(len(batch["operations"]) - len(outcomes))
+    )
+    return jsonify({"committed": committed, "results": results}), 200
+
+
 @adv.route("/login/", methods=["POST"])
 def login():
     try:
@@ -170,9 +420,15 @@ def login():
                                             check_pass_func=pass_hashing.check_password,
                                             grant_access_func=authentication.get_access_token,
                                             credentials=request.json,
-                                            uow=UnitOfWork())
+                                            uow=app_manager.jwt_auth.unit_of_work())
         return jsonify({"access_token": access_token}), 200
     except app.domain.errors.AccessDeniedError as e:
         raise HttpError(status_code=401, description=e.message)
     except app.domain.errors.ValidationError as e:
         raise HttpError(status_code=400, description=str(e))
+
+
+@adv.route("/pool_stats/", methods=["GET"])
+@jwt_required()
+def get_pool_stats():
+    return jsonify(app.orm.get_engines_pool_stats()), 200
@@ -0,0 +1,131 @@
+import dataclasses
+import importlib
+import logging
+import pkgutil
+from typing import Any, Optional
+
+import sqlalchemy
+
+from app.orm.migrations import versions
+
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_TABLE = "schema_migrations"
+
+# Transactional migrations give up instead of queueing behind long transactions, which would block every query
+# waiting for the same table meanwhile. A failed migration is simply run again.
+LOCK_TIMEOUT = "5s"
+
+
+@dataclasses.dataclass(frozen=True)
+class Migration:
+    """
+    A schema version, loaded from a ``versions/v<version>_<name>.py`` module.
+
+    Non-transactional migrations run their statements in autocommit mode, as ``CREATE INDEX CONCURRENTLY``
+    requires; their statements must be idempotent, so that a migration interrupted halfway can be run again.
+    """
+    version: int
+    name: str
+    description: str
+    statements: tuple[str, ...]
+    transactional: bool = True
+
+
+def load_migrations() -> list[Migration]:
+    """
+    Returns the migrations of the ``versions`` package, ordered by version.
+    """
+    migrations = []
+    for module_info in pkgutil.iter_modules(versions.__path__):
+        version, _, name = module_info.name.partition("_")
+        module = importlib.import_module(f"{versions.__name__}.{module_info.name}")
+        migrations.append(Migration(version=int(version.lstrip("v")), name=name, description=module.DESCRIPTION,
+                                    statements=tuple(module.STATEMENTS), transactional=module.TRANSACTIONAL))
+    return sorted(migrations, key=lambda migration: migration.version)
+
+
+def get_applied_versions(engine: sqlalchemy.Engine) -> set[int]:
+    with engine.begin() as connection:
+        connection.execute(sqlalchemy.text(
+            f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ("
+            "version INTEGER PRIMARY KEY, name VARCHAR(200) NOT NULL, applied_at TIMESTAMP NOT NULL DEFAULT now())"
+        ))
+        return set(connection.scalars(sqlalchemy.text(f"SELECT version FROM {MIGRATIONS_TABLE}")))
+
+
+def _drop_invalid_indexes(connection: sqlalchemy.Connection) -> None:
+    """
+    Drops the indexes left invalid by an interrupted ``CREATE INDEX CONCURRENTLY``; ``IF NOT EXISTS`` would
+    otherwise skip rebuilding them.
+    """
+    invalid_indexes = connection.scalars(sqlalchemy.text(
+        "SELECT CAST(indexrelid::regclass AS text) FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indrelid "
+        "WHERE NOT indisvalid AND pg_class.relnamespace = to_regnamespace(current_schema())"
+    )).all()
+    for index in invalid_indexes:
+        logger.warning("Dropping invalid index %s.", index)
+        connection.execute(sqlalchemy.text(f"DROP INDEX CONCURRENTLY IF EXISTS {index}"))
+
+
+def _apply(engine: sqlalchemy.Engine, migration: Migration) -> None:
+    record = sqlalchemy.text(f"INSERT INTO {MIGRATIONS_TABLE} (version, name) VALUES (:version, :name)")
+    if migration.transactional:
+        with engine.begin() as connection:
+            connection.execute(sqlalchemy.text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+            for statement in migration.statements:
+                connection.execute(sqlalchemy.text(statement))
+            connection.execute(record, {"version": migration.version, "name": migration.name})
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        _drop_invalid_indexes(connection=connection)
+        for statement in migration.statements:
+            connection.execute(sqlalchemy.text(statement))
+        connection.execute(record, {"version": migration.version, "name": migration.name})
+
+
+def upgrade(engine: sqlalchemy.Engine, target: Optional[int] = None) -> list[Migration]:
+    """
+    Applies the pending migrations up to ``target`` (all of them by default), each in its own transaction
+    unless it is non-transactional.
+
+    :param engine: engine of the database to migrate
+    :type engine: sqlalchemy.Engine
+    :param target: last version to apply
+    :type target: Optional[int]
+    :return: applied migrations
+    :rtype: list[Migration]
+    """
+    applied_versions = get_applied_versions(engine=engine)
+    applied = []
+    for migration in load_migrations():
+        if migration.version in applied_versions or (target is not None and migration.version > target):
+            continue
+        logger.info("Applying migration %04d %s.", migration.version, migration.name)
+        _apply(engine=engine, migration=migration)
+        applied.append(migration)
+    return applied
+
+
+def get_index_usage(engine: sqlalchemy.Engine) -> list[dict[str, Any]]:
+    """
+    Reads ``pg_stat_user_indexes`` of the current schema, least scanned indexes first. Counters are
+    accumulated since the last statistics reset, and per server: check the replicas too before dropping an index.
+
+    :param engine: engine of the database
+    :type engine: sqlalchemy.Engine
+    :return: one dict per index: table, index, scans, tuples read and fetched, size in bytes, and whether it backs
+        a unique or primary key constraint, which must be kept even if it is never scanned
+    :rtype: list[dict[str, Any]]
+    """
+    with engine.connect() as connection:
+        rows = connection.execute(sqlalchemy.text(
+            "SELECT stats.relname AS table, stats.indexrelname AS index, stats.idx_scan AS scans, "
+            "stats.idx_tup_read AS tuples_read, stats.idx_tup_fetch AS tuples_fetched, "
+            "pg_relation_size(stats.indexrelid) AS size_bytes, pg_index.indisunique AS is_unique "
+            "FROM pg_stat_user_indexes AS stats JOIN pg_index ON pg_index.indexrelid = stats.indexrelid "
+            "WHERE stats.schemaname = current_schema() "
+            "ORDER BY stats.idx_scan, pg_relation_size(stats.indexrelid) DESC"
+        )).mappings().all()
+    return [dict(row) for row in rows]
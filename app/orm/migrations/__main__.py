@@ -0,0 +1,57 @@
+"""
+Usage::
+
+    python -m app.orm.migrations [--shard N] upgrade [--target VERSION]
+    python -m app.orm.migrations [--shard N] status
+    python -m app.orm.migrations [--shard N] index-usage [--unused]
+
+Every command runs against each shard in turn, the primary database being shard 0, or against the one passed with
+``--shard``.
+"""
+import argparse
+import logging
+
+import app.orm
+from app.orm.migrations import upgrade, load_migrations, get_applied_versions, get_index_usage
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.orm.migrations", description="Database schema migrations.")
+    parser.add_argument("--shard", type=int, help="number of the only shard to run the command against")
+    commands = parser.add_subparsers(dest="command", required=True)
+    upgrade_parser = commands.add_parser("upgrade", help="apply the pending migrations")
+    upgrade_parser.add_argument("--target", type=int, help="last version to apply")
+    commands.add_parser("status", help="list the migrations and whether they are applied")
+    usage_parser = commands.add_parser("index-usage", help="report index scans from pg_stat_user_indexes")
+    usage_parser.add_argument("--unused", action="store_true",
+                              help="only list never scanned indexes that do not enforce uniqueness")
+    args = parser.parse_args(argv)
+
+    engines = app.orm.shard_router.engines
+    if args.shard is not None and not 0 <= args.shard < len(engines):
+        parser.error(f"--shard must be between 0 and {len(engines) - 1}")
+    shards = [args.shard] if args.shard is not None else range(len(engines))
+    for shard in shards:
+        engine = engines[shard]
+        print(f"Shard {shard} ({engine.url.render_as_string(hide_password=True)}):")
+        if args.command == "upgrade":
+            applied = upgrade(engine=engine, target=args.target)
+            print(f"Applied {len(applied)} migration(s).")
+        elif args.command == "status":
+            applied_versions = get_applied_versions(engine=engine)
+            for migration in load_migrations():
+                status = "applied" if migration.version in applied_versions else "pending"
+                print(f"{migration.version:04d} {migration.name:<32} {status:<8} {migration.description}")
+        else:
+            print(f"{'table':<8} {'index':<36} {'scans':>10} {'tuples read':>12} {'tuples fetched':>15} "
+                  f"{'size':>12}")
+            for index in get_index_usage(engine=engine):
+                if args.unused and (index["scans"] or index["is_unique"]):
+                    continue
+                print(f"{index['table']:<8} {index['index']:<36} {index['scans']:>10} {index['tuples_read']:>12} "
+                      f"{index['tuples_fetched']:>15} {index['size_bytes']:>12}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,31 @@
+"""
+The schema as ``create_all()`` created it before migrations existed. Every statement is a no-op on such a database.
+"""
+DESCRIPTION = "Create the user and adv tables"
+TRANSACTIONAL = True
+STATEMENTS = (
+    """
+    CREATE TABLE IF NOT EXISTS "user" (
+        id SERIAL NOT NULL,
+        name VARCHAR(200) NOT NULL,
+        email VARCHAR(40) NOT NULL,
+        password VARCHAR(200) NOT NULL,
+        creation_date TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
+        PRIMARY KEY (id)
+    )
+    """,
+    'CREATE UNIQUE INDEX IF NOT EXISTS ix_user_email ON "user" (email)',
+    """
+    CREATE TABLE IF NOT EXISTS adv (
+        id SERIAL NOT NULL,
+        title VARCHAR(200) NOT NULL,
+        description VARCHAR,
+        creation_date TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
+        user_id INTEGER NOT NULL,
+        PRIMARY KEY (id),
+        CONSTRAINT adv_user_id_fkey FOREIGN KEY(user_id) REFERENCES "user" (id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_adv_title ON adv (title)",
+    "CREATE INDEX IF NOT EXISTS ix_adv_description ON adv (description)"
+)
@@ -0,0 +1,14 @@
+"""
+Soft deletion of users and ``ON DELETE CASCADE`` for their advertisements. The foreign key is re-created
+``NOT VALID``, which only takes a brief lock, and validated by the next migration without blocking writes.
+"""
+DESCRIPTION = "Add user.deleted_at and cascade the deletion of users to adv"
+TRANSACTIONAL = True
+STATEMENTS = (
+    'ALTER TABLE "user" ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITHOUT TIME ZONE',
+    """
+    ALTER TABLE adv
+        DROP CONSTRAINT IF EXISTS adv_user_id_fkey,
+        ADD CONSTRAINT adv_user_id_fkey FOREIGN KEY (user_id) REFERENCES "user" (id) ON DELETE CASCADE NOT VALID
+    """
+)
@@ -0,0 +1,8 @@
+"""
+Validation scans adv under a ``SHARE UPDATE EXCLUSIVE`` lock, so reads and writes go on meanwhile.
+"""
+DESCRIPTION = "Validate the adv.user_id foreign key"
+TRANSACTIONAL = True
+STATEMENTS = (
+    "ALTER TABLE adv VALIDATE CONSTRAINT adv_user_id_fkey",
+)
@@ -0,0 +1,15 @@
+"""
+Adding a stored generated column rewrites adv under an exclusive lock; run it in a quiet period on large tables.
+"""
+from app.orm.table_mapper import TEXT_SEARCH_CONFIG
+
+DESCRIPTION = "Add the full-text search column of adv"
+TRANSACTIONAL = True
+STATEMENTS = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"""
+    ALTER TABLE adv ADD COLUMN IF NOT EXISTS search_vector TSVECTOR GENERATED ALWAYS AS (
+        to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(title, '') || ' ' || coalesce(description, ''))
+    ) STORED
+    """
+)
@@ -0,0 +1,24 @@
+"""
+Indexes built and dropped ``CONCURRENTLY``, so the tables stay writable. The composite indexes serve the keyset
+pages of every sort order, ending with "id" as the tiebreaker; "(user_id, ...)" ones serve the advertisements of a
+user. The btree indexes on adv.title and adv.description are dropped: the composite and trigram indexes cover
+title, and nothing looks description up by equality, while a btree on unbounded text fails on long values.
+"""
+DESCRIPTION = "Create composite listing indexes and search indexes, drop unused btree indexes"
+TRANSACTIONAL = False
+STATEMENTS = (
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_name_id ON "user" (name, id)',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_creation_date_id ON "user" (creation_date, id)',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_deleted_at ON "user" (deleted_at) WHERE deleted_at IS NOT NULL',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_name_trgm ON "user" USING gin (name gin_trgm_ops)',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_email_trgm ON "user" USING gin (email gin_trgm_ops)',
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_adv_user_id_id ON adv (user_id, id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_adv_user_id_creation_date_id ON adv (user_id, creation_date, id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_adv_creation_date_id ON adv (creation_date, id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_adv_title_id ON adv (title, id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_adv_search_vector ON adv USING gin (search_vector)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_adv_title_trgm ON adv USING gin (title gin_trgm_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_adv_description_trgm ON adv USING gin (description gin_trgm_ops)",
+    "DROP INDEX CONCURRENTLY IF EXISTS ix_adv_title",
+    "DROP INDEX CONCURRENTLY IF EXISTS ix_adv_description"
+)
@@ -0,0 +1,9 @@
+"""
+A functional index on lower(email), built ``CONCURRENTLY``: "auto" searches look exact e-mail addresses up
+case-insensitively, which neither the unique index on email nor its trigram index answers with a btree lookup.
+"""
+DESCRIPTION = "Create a functional index on lower(user.email)"
+TRANSACTIONAL = False
+STATEMENTS = (
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_email_lower ON "user" (lower(email))',
+)
@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+from typing import Any, Mapping, Optional, Type
+
+import sqlalchemy
+import sqlalchemy.pool
+
+
+POOL_CLASSES: dict[str, Type[sqlalchemy.pool.Pool]] = {
+    "queue": sqlalchemy.pool.QueuePool,
+    "null": sqlalchemy.pool.NullPool,  # e.g. behind PgBouncer, which does the pooling itself
+    "static": sqlalchemy.pool.StaticPool
+}
+
+
+class PoolStats:
+    """
+    Live counters of a connection pool: connections currently checked out, total checkouts, the time spent waiting
+    for a connection and the number of checkouts that timed out.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checked_out = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool) -> None:
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def on_checkout(self, *args) -> None:
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+
+    def on_checkin(self, *args) -> None:
+        with self._lock:
+            self.checked_out -= 1
+
+    def as_dict(self, pool: sqlalchemy.pool.Pool) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "pool_class": type(pool).__mro__[1].__name__,
+                "size": pool.size() if isinstance(pool, sqlalchemy.pool.QueuePool) else None,
+                "checked_out": self.checked_out,
+                "overflow": max(pool.overflow(), 0) if isinstance(pool, sqlalchemy.pool.QueuePool) else None,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6)
+            }
+
+
+def instrument_pool_class(pool_class: Type[sqlalchemy.pool.Pool], stats: PoolStats) -> Type[sqlalchemy.pool.Pool]:
+    """
+    Returns a subclass of ``pool_class`` that times every connection request, including the time spent waiting for
+    a free connection, and counts the requests that fail with ``sqlalchemy.exc.TimeoutError``. ``Pool.recreate()``
+    keeps the class, so the counters survive ``Engine.dispose()``.
+    """
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return pool_class._do_get(self)
+        except sqlalchemy.exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            stats.record_wait(seconds=time.perf_counter() - start, timed_out=timed_out)
+
+    return type(f"Instrumented{pool_class.__name__}", (pool_class,), {"_do_get": _do_get, "stats": stats})
+
+
+def get_pool_options(environ: Mapping[str, str] = os.environ, prefix: str = "DB_POOL") -> dict[str, Any]:
+    """
+    Reads the ``create_engine()`` pool options from the environment:
+
+    - ``DB_POOL_CLASS``: ``queue`` (default), ``null`` or ``static``;
+    - ``DB_POOL_SIZE``, ``DB_POOL_MAX_OVERFLOW``, ``DB_POOL_TIMEOUT`` (seconds): sizing of ``queue`` pools only;
+    - ``DB_POOL_RECYCLE`` (seconds, ``-1`` disables), ``DB_POOL_PRE_PING`` (``1``/``true``).
+
+    :param environ: environment mapping
+    :type environ: Mapping[str, str]
+    :param prefix: name prefix of the variables
+    :type prefix: str
+    :return: keyword arguments for ``create_engine()``
+    :rtype: dict[str, Any]
+    """
+    pool_class_name = environ.get(f"{prefix}_CLASS", "queue").lower()
+    if pool_class_name not in POOL_CLASSES:
+        raise ValueError(f"{prefix}_CLASS must be one of: {list(POOL_CLASSES)}.")
+    options: dict[str, Any] = {
+        "poolclass": POOL_CLASSES[pool_class_name],
+        "pool_recycle": int(environ.get(f"{prefix}_RECYCLE", -1)),
+        "pool_pre_ping": environ.get(f"{prefix}_PRE_PING", "").lower() in ("1", "true")
+    }
+    if options["poolclass"] is sqlalchemy.pool.QueuePool:
+        options.update(pool_size=int(environ.get(f"{prefix}_SIZE", 5)),
+                       max_overflow=int(environ.get(f"{prefix}_MAX_OVERFLOW", 10)),
+                       pool_timeout=float(environ.get(f"{prefix}_TIMEOUT", 30)))
+    return options
+
+
+def create_pooled_engine(dsn: str, pool_options: Optional[dict[str, Any]] = None) -> sqlalchemy.Engine:
+    """
+    Creates an engine whose pool collects ``PoolStats``, available as ``engine.pool.stats``.
+    """
+    pool_options = dict(pool_options if pool_options is not None else get_pool_options())
+    stats = PoolStats()
+    pool_options["poolclass"] = instrument_pool_class(pool_class=pool_options["poolclass"], stats=stats)
+    engine = sqlalchemy.create_engine(dsn, **pool_options)
+    sqlalchemy.event.listen(engine, "checkout", stats.on_checkout)
+    sqlalchemy.event.listen(engine, "checkin", stats.on_checkin)
+    return engine
+
+
+def get_pool_stats(engine: sqlalchemy.Engine) -> dict[str, Any]:
+    """
+    Returns the live pool counters of an engine created with ``create_pooled_engine()``.
+    """
+    return engine.pool.stats.as_dict(pool=engine.pool)
@@ -0,0 +1,89 @@
+import contextvars
+import enum
+import itertools
+import random
+import threading
+import time
+from typing import Iterable, Optional
+
+import sqlalchemy
+
+
+# Keys identifying the client of the current request, e.g. its user id and its address. Writes are recorded for
+# every key, and a read is pinned to the primary if any of its keys wrote recently.
+client_keys: contextvars.ContextVar[tuple[str, ...]] = contextvars.ContextVar("client_keys", default=())
+
+
+class ReplicaPolicy(str, enum.Enum):
+    ROUND_ROBIN = "round_robin"
+    RANDOM = "random"
+
+
+class ReplicaRouter:
+    """
+    Picks the engine a read-only unit of work runs on.
+
+    Reads go to the replicas, chosen by the load-balancing policy. A client that committed a write in the last
+    ``pin_seconds`` seconds reads from a replica only if that replica has already replayed the WAL position of its
+    last write; otherwise the read goes to the primary, so the client always sees its own writes.
+    """
+
+    def __init__(self, primary: sqlalchemy.Engine, replicas: Iterable[sqlalchemy.Engine] = (),
+                 policy: ReplicaPolicy | str = ReplicaPolicy.ROUND_ROBIN, pin_seconds: float = 5.0):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.policy = ReplicaPolicy(policy)
+        self.pin_seconds = pin_seconds
+        self._round_robin = itertools.cycle(self.replicas)
+        self._writes: dict[str, tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def _next_replica(self) -> sqlalchemy.Engine:
+        if self.policy == ReplicaPolicy.RANDOM:
+            return random.choice(self.replicas)
+        with self._lock:
+            return next(self._round_robin)
+
+    def _get_last_write_lsn(self, keys: Iterable[str]) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            pinned = [self._writes[key] for key in keys if key in self._writes and self._writes[key][0] > now]
+        if not pinned:
+            return None
+        return max(pinned, key=lambda write: write[0])[1]
+
+    @staticmethod
+    def _has_replayed(replica: sqlalchemy.Engine, lsn: str) -> bool:
+        with replica.connect() as connection:
+            return bool(connection.execute(
+                sqlalchemy.text("SELECT NOT pg_is_in_recovery() OR pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn)"),
+                {"lsn": lsn}
+            ).scalar())
+
+    def get_read_engine(self, keys: Iterable[str] = ()) -> sqlalchemy.Engine:
+        """
+        Returns the engine for a read-only unit of work of the client identified by ``keys``.
+        """
+        if not self.replicas:
+            return self.primary
+        replica = self._next_replica()
+        lsn = self._get_last_write_lsn(keys=keys)
+        if lsn is None or self._has_replayed(replica=replica, lsn=lsn):
+            return replica
+        return self.primary
+
+    def record_write(self, session: sqlalchemy.orm.Session, keys: Iterable[str] = ()) -> None:
+        """
+        Pins the client to the primary after a committed write, remembering the current WAL position of the primary.
+        Does nothing when no replica is configured.
+        """
+        keys = tuple(keys)
+        if not self.replicas or not keys:
+            return
+        lsn = session.execute(sqlalchemy.text("SELECT CAST(pg_current_wal_lsn() AS text)")).scalar()
+        now = time.monotonic()
+        with self._lock:
+            for key in [key for key, (deadline, _) in self._writes.items() if deadline <= now]:
+                del self._writes[key]
+            for key in keys:
+                self._writes[key] = (now + self.pin_seconds, lsn)
@@ -0,0 +1,92 @@
+import bisect
+import concurrent.futures
+import enum
+import hashlib
+import itertools
+import threading
+from typing import Optional, Sequence
+
+import sqlalchemy
+
+
+class ShardStrategy(str, enum.Enum):
+    HASH = "hash"
+    RANGE = "range"
+
+
+class ShardRouter:
+    """
+    Maps users to shards. Advertisements live on the shard of their owner.
+
+    - ``hash``: a user lives on shard ``user_id % len(engines)``. The id sequences of shard ``i`` generate only ids
+      congruent to ``i``, so a new user is inserted into the shard its id maps to; the shard is picked by a hash of
+      the email, which keeps emails unique across shards at creation.
+    - ``range``: shard ``i`` holds the user ids from ``range_bounds[i]`` up to the next bound. New users are
+      created on the last shard, whose range is open-ended.
+
+    Advertisement ids are interleaved the same way on both strategies, so they are unique across shards and
+    results of several shards can be merged by id. ``prepare_sequences()`` sets the sequences up.
+    """
+
+    def __init__(self, engines: Sequence[sqlalchemy.Engine], strategy: ShardStrategy | str = ShardStrategy.HASH,
+                 range_bounds: Sequence[int] = ()):
+        self.engines = list(engines)
+        self.strategy = ShardStrategy(strategy)
+        self.range_bounds = list(range_bounds)
+        if self.strategy == ShardStrategy.RANGE and (
+                len(self.range_bounds) != len(self.engines) or self.range_bounds != sorted(self.range_bounds)
+        ):
+            raise ValueError("Range sharding needs one ascending lower bound per shard.")
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_sharded(self) -> bool:
+        return len(self.engines) > 1
+
+    @property
+    def executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        """
+        Thread pool running the queries of a fan-out on all the shards at once.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=len(self.engines), thread_name_prefix="shard"
+                )
+            return self._executor
+
+    def get_user_shard(self, user_id: int) -> int:
+        if self.strategy == ShardStrategy.RANGE:
+            return max(bisect.bisect_right(self.range_bounds, user_id) - 1, 0)
+        return user_id % len(self.engines)
+
+    def get_new_user_shard(self, email: str) -> int:
+        if self.strategy == ShardStrategy.RANGE:
+            return len(self.engines) - 1
+        return int.from_bytes(hashlib.blake2b(email.lower().encode(), digest_size=8).digest(), "big") \
+            % len(self.engines)
+
+    def prepare_sequences(self) -> None:
+        """
+        Restarts the id sequences of every shard after its current maximum ids, so that the ids generated by each
+        shard map back to it. Run it once after adding shards, before the application writes to them.
+        """
+        shard_count = len(self.engines)
+        for shard, engine in enumerate(self.engines):
+            with engine.begin() as connection:
+                for table in ("user", "adv"):
+                    next_id = connection.execute(sqlalchemy.text(f'SELECT coalesce(max(id), 0) + 1 FROM "{table}"'))\
+                        .scalar()
+                    if table == "user" and self.strategy == ShardStrategy.RANGE:
+                        bounds = list(itertools.chain(self.range_bounds, [None]))
+                        start, max_value = max(next_id, bounds[shard], 1), bounds[shard + 1]
+                        connection.execute(sqlalchemy.text(
+                            f'ALTER SEQUENCE "{table}_id_seq" INCREMENT BY 1 '
+                            f'{"NO MAXVALUE" if max_value is None else f"MAXVALUE {max_value - 1}"} RESTART WITH {start}'
+                        ))
+                        continue
+                    start = next_id + (shard - next_id) % shard_count
+                    connection.execute(sqlalchemy.text(
+                        f'ALTER SEQUENCE "{table}_id_seq" INCREMENT BY {shard_count} RESTART WITH {start}'
+                    ))
@@ -1,5 +1,6 @@
 import sqlalchemy
-from sqlalchemy import Table, Column, Integer, String, DateTime, func, ForeignKey
+from sqlalchemy import Table, Column, Integer, String, DateTime, func, ForeignKey, Computed, Index, DDL
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import relationship
 
 import app.domain.models
@@ -7,6 +8,10 @@ import app.domain.models
 
 mapper = sqlalchemy.orm.registry()
 
+TEXT_SEARCH_CONFIG = "english"
+
+sqlalchemy.event.listen(mapper.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
 user_table = Table(
     "user",
     mapper.metadata,
@@ -14,27 +19,58 @@ user_table = Table(
     Column("name", String(200), nullable=False),
     Column("email", String(40), nullable=False, unique=True, index=True),
     Column("password", String(200), nullable=False),
-    Column("creation_date", DateTime, server_default=func.now())
+    Column("creation_date", DateTime, server_default=func.now()),
+    # Set when the user is soft-deleted; the purge worker deletes the row once the advertisements are gone.
+    Column("deleted_at", DateTime, nullable=True),
+    Index("ix_user_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+    Index("ix_user_email_trgm", "email", postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"}),
+    Index("ix_user_name_id", "name", "id"),
+    Index("ix_user_creation_date_id", "creation_date", "id"),
+    Index("ix_user_deleted_at", "deleted_at", postgresql_where=sqlalchemy.text("deleted_at IS NOT NULL"))
 )
 
+# Serves the case-insensitive lookups of exact e-mail addresses by "auto" searches.
+Index("ix_user_email_lower", func.lower(user_table.c.email))
+
 
 adv_table = Table(
     "adv",
     mapper.metadata,
     Column("id", Integer, primary_key=True, autoincrement=True),
-    Column("title", String(200), index=True, nullable=False),
-    Column("description", String, index=True),
+    Column("title", String(200), nullable=False),
+    Column("description", String),
     Column("creation_date", DateTime, server_default=func.now()),
-    Column("user_id", Integer, ForeignKey("user.id"), nullable=False)
+    Column("user_id", Integer, ForeignKey("user.id", ondelete="CASCADE"), nullable=False),
+    Column(
+        "search_vector",
+        TSVECTOR,
+        Computed(
+            f"to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(title, '') || ' ' || coalesce(description, ''))",
+            persisted=True
+        )
+    ),
+    Index("ix_adv_search_vector", "search_vector", postgresql_using="gin"),
+    Index("ix_adv_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+    Index(
+        "ix_adv_description_trgm", "description", postgresql_using="gin",
+        postgresql_ops={"description": "gin_trgm_ops"}
+    ),
+    Index("ix_adv_title_id", "title", "id"),
+    Index("ix_adv_creation_date_id", "creation_date", "id"),
+    Index("ix_adv_user_id_id", "user_id", "id"),
+    Index("ix_adv_user_id_creation_date_id", "user_id", "creation_date", "id")
 )
 
 
 def start_mapping():
     mapper.map_imperatively(
-        class_=app.domain.models.User, local_table=user_table, properties={
+        class_=app.domain.models.User, local_table=user_table, exclude_properties=["deleted_at"], properties={
             "adv": relationship(
-                app.domain.models.Advertisement, backref="user", order_by=adv_table.c.id, cascade="delete"
+                app.domain.models.Advertisement, backref="user", order_by=adv_table.c.id, cascade="delete",
+                passive_deletes=True
             )
         }
     )
-    mapper.map_imperatively(class_=app.domain.models.Advertisement, local_table=adv_table)
+    mapper.map_imperatively(
+        class_=app.domain.models.Advertisement, local_table=adv_table, exclude_properties=["search_vector"]
+    )
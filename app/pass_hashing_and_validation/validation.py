@@ -1,5 +1,7 @@
+import datetime
+
 import pydantic
-from typing import TypeVar, Type
+from typing import TypeVar, Type, Annotated, Any
 
 import app.domain.errors
 
@@ -24,10 +26,105 @@ class CreateAdv(pydantic.BaseModel):
     description: str
 
 
+# At most this many advertisements per bulk creation request.
+MAX_BULK_ADVS = 1000
+
+BulkCreateAdv = pydantic.TypeAdapter(Annotated[list[CreateAdv], pydantic.Field(max_length=MAX_BULK_ADVS)])
+
+
 class EditAdv(pydantic.BaseModel):
+    """
+    New values of an advertisement. Every value may be left out, but none may be null: the columns are NOT NULL.
+    """
     title: str | None = None
     description: str | None = None
 
+    @pydantic.field_validator("*")
+    @classmethod
+    def not_null(cls, value: Any) -> Any:
+        if value is None:
+            raise ValueError("Must not be null.")
+        return value
+
+
+class BulkSelection(pydantic.BaseModel):
+    """
+    Rows of a bulk update or delete: a list of ids, or a filter expression in the format of the "filter" query
+    parameter of the listings.
+    """
+    ids: Annotated[list[int], pydantic.Field(min_length=1, max_length=MAX_BULK_ADVS)] | None = None
+    filter: dict[str, Any] | None = None
+
+    @pydantic.model_validator(mode="after")
+    def check_one_selection(self) -> "BulkSelection":
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError('Exactly one of "ids" and "filter" is required.')
+        return self
+
+
+class ImportRecord(pydantic.BaseModel):
+    """
+    Record of a bulk import file. Empty values, as in CSV files, count as missing.
+    """
+    creation_date: datetime.datetime | None = None
+
+    @pydantic.field_validator("*", mode="before")
+    @classmethod
+    def empty_to_none(cls, value: Any) -> Any:
+        return None if value == "" else value
+
+
+class ImportUser(ImportRecord, CreateUser):
+    # The lengths of the columns: the staging table is untyped text, so longer values would fail the whole batch.
+    name: Annotated[str, pydantic.Field(max_length=200)]
+    email: Annotated[str, pydantic.Field(max_length=40)]
+
+
+class ImportAdv(ImportRecord, CreateAdv):
+    title: Annotated[str, pydantic.Field(max_length=200)]
+    user_id: int
+
+
+# At most this many operations per batch request.
+MAX_BATCH_OPERATIONS = 50
+
+
+class BatchOperation(pydantic.BaseModel):
+    op: str
+    params: dict[str, Any] = {}
+
+
+class BatchParams(pydantic.BaseModel):
+    """
+    Params of one operation of a batch request: exactly the arguments the client passes to the service function.
+    """
+    model_config = pydantic.ConfigDict(extra="forbid")
+
+
+class UserParams(BatchParams):
+    user_id: int
+
+
+class UpdateUserParams(UserParams):
+    new_data: dict[str, Any]
+
+
+class AdvParams(BatchParams):
+    adv_id: int
+
+
+class CreateAdvParams(BatchParams):
+    adv_params: dict[str, Any]
+
+
+class UpdateAdvParams(AdvParams):
+    new_params: dict[str, Any]
+
+
+class BatchRequest(pydantic.BaseModel):
+    operations: Annotated[list[BatchOperation], pydantic.Field(min_length=1, max_length=MAX_BATCH_OPERATIONS)]
+    atomic: bool = False
+
 
 class Login(pydantic.BaseModel):
     email: str
@@ -59,3 +156,43 @@ def validate_data_for_adv_creation(**adv_params):
 
 def validate_data_for_adv_updating(**adv_params):
     return validate_data(validation_model=EditAdv, data={**adv_params})
+
+
+def validate_data_for_bulk_adv_creation(
+        advs_params: Any, skip_invalid: bool = False
+) -> tuple[list[tuple[int, dict[str, str]]], list[dict[str, Any]]]:
+    """
+    Validates a list of advertisements in one pass.
+
+    :param advs_params: list of advertisement params
+    :type advs_params: Any
+    :param skip_invalid: whether invalid items are reported instead of failing the whole list
+    :type skip_invalid: bool
+    :return: (index, validated params) of the valid items and {"index", "errors"} of the invalid ones
+    :rtype: tuple[list[tuple[int, dict[str, str]]], list[dict[str, Any]]]
+    :raises app.domain.errors.ValidationError: if the list itself is invalid, or any item is and ``skip_invalid``
+        is false
+    """
+    try:
+        return [(index, adv.model_dump(exclude_unset=True)) for index, adv in
+                enumerate(BulkCreateAdv.validate_python(advs_params))], []
+    except pydantic.ValidationError as e:
+        errors = e.errors(include_context=False)
+    if not skip_invalid or any(not error["loc"] or not isinstance(error["loc"][0], int) for error in errors):
+        raise app.domain.errors.ValidationError(errors)
+    errors_by_index: dict[int, list] = {}
+    for error in errors:
+        errors_by_index.setdefault(error["loc"][0], []).append({**error, "loc": error["loc"][1:]})
+    valid = [
+        (index, CreateAdv.model_validate(adv_params).model_dump(exclude_unset=True))
+        for index, adv_params in enumerate(advs_params) if index not in errors_by_index
+    ]
+    return valid, [{"index": index, "errors": index_errors} for index, index_errors in errors_by_index.items()]
+
+
+def validate_bulk_selection(**selection):
+    return validate_data(validation_model=BulkSelection, data={**selection})
+
+
+def validate_batch_request(**batch):
+    return validate_data(validation_model=BatchRequest, data={**batch})
@@ -0,0 +1,183 @@
+import concurrent.futures
+import csv
+import dataclasses
+import io
+import itertools
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Iterable, Iterator, Optional, TextIO
+
+import pydantic
+
+from app.orm.sharding import ShardRouter
+from app.pass_hashing_and_validation import pass_hashing, validation
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class ImportStats:
+    read: int = 0
+    invalid: int = 0
+    imported: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.imported / self.seconds if self.seconds else 0.0
+
+
+@dataclasses.dataclass(frozen=True)
+class ImportTarget:
+    """
+    How records of one table are staged and moved into it: the staging columns and their types, in COPY order, and
+    the ``INSERT ... SELECT`` from the staging table, with and without conflict handling. ``get_shard`` picks the
+    shard of a validated record the way the application does: users by e-mail, advertisements by their owner.
+    """
+    table: str
+    columns: dict[str, str]
+    insert: str
+    insert_skipping_conflicts: str
+    validation_model: type[pydantic.BaseModel]
+    get_shard: Callable[[ShardRouter, dict[str, Any]], int]
+
+
+TARGETS: dict[str, ImportTarget] = {
+    "users": ImportTarget(
+        table="user", columns={"name": "text", "email": "text", "password": "text", "creation_date": "timestamp"},
+        insert='INSERT INTO "user" (name, email, password, creation_date) '
+               'SELECT name, email, password, coalesce(creation_date, now()) FROM import_staging',
+        insert_skipping_conflicts='INSERT INTO "user" (name, email, password, creation_date) '
+                                  'SELECT DISTINCT ON (email) name, email, password, coalesce(creation_date, now()) '
+                                  'FROM import_staging ON CONFLICT (email) DO NOTHING',
+        validation_model=validation.ImportUser,
+        get_shard=lambda shard_router, values: shard_router.get_new_user_shard(email=values["email"])
+    ),
+    "advs": ImportTarget(
+        table="adv",
+        columns={"title": "text", "description": "text", "user_id": "integer", "creation_date": "timestamp"},
+        insert="INSERT INTO adv (title, description, user_id, creation_date) "
+               "SELECT title, description, user_id, coalesce(creation_date, now()) FROM import_staging",
+        # Advertisements of unknown or deleted users are skipped instead of failing on the foreign key.
+        insert_skipping_conflicts='INSERT INTO adv (title, description, user_id, creation_date) '
+                                  'SELECT title, description, user_id, coalesce(creation_date, now()) '
+                                  'FROM import_staging WHERE EXISTS (SELECT FROM "user" '
+                                  'WHERE "user".id = import_staging.user_id AND "user".deleted_at IS NULL)',
+        validation_model=validation.ImportAdv,
+        get_shard=lambda shard_router, values: shard_router.get_user_shard(user_id=values["user_id"])
+    )
+}
+
+
+def read_records(file: TextIO, file_format: str) -> Iterator[Optional[dict[str, Any]]]:
+    """
+    Streams the records of a CSV file with a header line, or of an NDJSON file with one object per line. A line
+    that is not valid JSON is logged with its number and yields ``None``, which ``import_records()`` counts as an
+    invalid record.
+    """
+    if file_format == "csv":
+        yield from csv.DictReader(file)
+        return
+    for line_number, line in enumerate(file, start=1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.warning("Line %d is not valid JSON: %s", line_number, e)
+                yield None
+
+
+def _to_csv(rows: Iterable[tuple]) -> io.StringIO:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(("" if value is None else value for value in row) for row in rows)
+    buffer.seek(0)
+    return buffer
+
+
+def import_records(shard_router: ShardRouter, target: ImportTarget, records: Iterable[Optional[dict[str, Any]]],
+                   batch_size: int = 5000, skip_conflicts: bool = True,
+                   workers: Optional[int] = None,
+                   on_batch: Optional[Callable[[ImportStats], None]] = None) -> ImportStats:
+    """
+    Imports the records in batches: each batch is validated, its passwords, if any, are hashed across a process
+    pool, then the rows of every shard are streamed into a temporary staging table with ``COPY FROM STDIN`` and
+    moved into the target table with one ``INSERT ... SELECT``, in one transaction per batch and shard.
+
+    :param shard_router: router of the databases to import into
+    :type shard_router: ShardRouter
+    :param target: target table
+    :type target: ImportTarget
+    :param records: records, e.g. from ``read_records()``
+    :type records: Iterable[Optional[dict[str, Any]]]
+    :param batch_size: number of records per transaction
+    :type batch_size: int
+    :param skip_conflicts: skip users with taken emails and advertisements of unknown users, instead of failing
+    :type skip_conflicts: bool
+    :param workers: number of password hashing processes, the number of CPUs by default
+    :type workers: Optional[int]
+    :param on_batch: called with the running stats after each batch
+    :type on_batch: Optional[Callable[[ImportStats], None]]
+    :return: import stats
+    :rtype: ImportStats
+    """
+    stats = ImportStats()
+    started = time.perf_counter()
+    records = iter(records)
+    workers = workers or os.cpu_count() or 1
+    hashes_passwords = "password" in target.columns
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers) if hashes_passwords else None
+    connections = {}
+    try:
+        create_staging_table = f"CREATE TEMPORARY TABLE import_staging " \
+                               f"({', '.join(f'{column} {type_}' for column, type_ in target.columns.items())}) " \
+                               f"ON COMMIT DROP"
+        while batch := list(itertools.islice(records, batch_size)):
+            stats.read += len(batch)
+            rows, shards = [], []
+            for record in batch:
+                try:
+                    values = target.validation_model.model_validate(record).model_dump()
+                except pydantic.ValidationError:
+                    stats.invalid += 1
+                    continue
+                rows.append(tuple(values.get(column) for column in target.columns))
+                shards.append(target.get_shard(shard_router, values))
+            if hashes_passwords and rows:
+                password_index = list(target.columns).index("password")
+                hashed = executor.map(pass_hashing.hash_password, (row[password_index] for row in rows),
+                                      chunksize=max(len(rows) // (4 * workers), 1))
+                rows = [row[:password_index] + (password,) + row[password_index + 1:]
+                        for row, password in zip(rows, hashed)]
+            rows_by_shard: dict[int, list[tuple]] = {}
+            for shard, row in zip(shards, rows):
+                rows_by_shard.setdefault(shard, []).append(row)
+            for shard, shard_rows in rows_by_shard.items():
+                if shard not in connections:
+                    connections[shard] = shard_router.engines[shard].raw_connection()
+                connection = connections[shard]
+                cursor = connection.cursor()
+                cursor.execute(create_staging_table)
+                cursor.copy_expert(f"COPY import_staging ({', '.join(target.columns)}) FROM STDIN WITH (FORMAT csv)",
+                                   _to_csv(shard_rows))
+                cursor.execute(target.insert_skipping_conflicts if skip_conflicts else target.insert)
+                stats.imported += cursor.rowcount
+                stats.skipped += len(shard_rows) - cursor.rowcount
+                connection.commit()
+            stats.seconds = time.perf_counter() - started
+            if on_batch:
+                on_batch(stats)
+    except Exception:
+        for connection in connections.values():
+            connection.rollback()
+        raise
+    finally:
+        for connection in connections.values():
+            connection.close()
+        if executor:
+            executor.shutdown()
+    stats.seconds = time.perf_counter() - started
+    return stats
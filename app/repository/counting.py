@@ -0,0 +1,64 @@
+import collections
+import threading
+import time
+from typing import Hashable, Optional
+
+import sqlalchemy
+from sqlalchemy.orm import Query
+
+
+class CountCache:
+    """
+    Small thread-safe TTL cache of exact row counts, keyed by a normalised filter.
+
+    Entries are not invalidated on writes: a cached total may lag behind the table for up to ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_size: int = 1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data: collections.OrderedDict[Hashable, tuple[float, int]] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[int]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, count = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return count
+
+    def set(self, key: Hashable, count: int) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, count)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+count_cache = CountCache()
+
+
+def estimate_count(session: sqlalchemy.orm.Session, query: Query) -> int:
+    """
+    Returns the planner's row estimate for the query, taken from ``EXPLAIN (FORMAT JSON)`` without executing it.
+
+    :param session: SQLAlchemy session
+    :type session: sqlalchemy.orm.Session
+    :param query: filtered query
+    :type query: sqlalchemy.orm.Query
+    :return: estimated number of rows
+    :rtype: int
+    """
+    connection = session.connection()
+    compiled = query.statement.compile(dialect=connection.dialect)
+    plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    return int(plan[0]["Plan"]["Plan Rows"])
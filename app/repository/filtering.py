@@ -1,16 +1,23 @@
+import base64
+import binascii
 import dataclasses
 import enum
+import json
+import types
 
 import sqlalchemy
 from dataclasses import dataclass
-from datetime import datetime
-from typing import Type, Literal, Any, Optional
+from datetime import date, datetime, timedelta, timezone
+from typing import Type, Literal, Any, Optional, Iterator
 
 from sqlalchemy.orm import Query
 
 import app.domain.errors
-from app.domain import services
 from app.domain.models import AdvertisementColumns, UserColumns, ModelClass, User, Advertisement, ModelClasses
+from app.orm.table_mapper import TEXT_SEARCH_CONFIG, adv_table, user_table
+from app.repository import search_planner
+from app.repository.counting import count_cache, estimate_count
+from app.repository.projection import Projection, get_projection
 
 
 class InvalidFilterParams(Exception):
@@ -20,6 +27,22 @@ class InvalidFilterParams(Exception):
 class FilterTypes(str, enum.Enum):
     COLUMN_VALUE = 'column_value'
     SEARCH_TEXT = 'search_text'
+    FULL_TEXT = 'full_text'
+    FUZZY = 'fuzzy'
+    PREFIX = 'prefix'
+    AUTO = 'auto'
+
+
+# Conditions every listing of the model gets: soft-deleted users are never listed, nor are their advertisements,
+# which stay until the purge deletes them. The NOT EXISTS is a primary key lookup per advertisement.
+VISIBILITY_CONDITIONS = types.MappingProxyType({
+    User: (user_table.c.deleted_at.is_(None),),
+    Advertisement: (
+        ~sqlalchemy.exists().where(user_table.c.id == adv_table.c.user_id, user_table.c.deleted_at.is_not(None)),
+    )
+})
+
+TEXT_FILTER_TYPES = (FilterTypes.SEARCH_TEXT, FilterTypes.FUZZY, FilterTypes.PREFIX, FilterTypes.AUTO)
 
 
 class Comparison(str, enum.Enum):
@@ -31,6 +54,41 @@ class Comparison(str, enum.Enum):
     LE = "<="
 
 
+class IncludeTotal(str, enum.Enum):
+    EXACT = "exact"
+    ESTIMATE = "estimate"
+    NONE = "none"
+
+
+class LogicalOperator(str, enum.Enum):
+    AND = "and"
+    OR = "or"
+
+
+MAX_FILTER_DEPTH = 4
+MAX_FILTER_PREDICATES = 20
+
+# Columns a listing can be sorted by. Each one is backed by a composite "(column, id)" index declared in
+# app.orm.table_mapper, so a sorted page is read in index order and the scan stops after LIMIT rows.
+SORTABLE_COLUMNS = {
+    User: [UserColumns.ID.value, UserColumns.NAME.value, UserColumns.CREATION_DATE.value],
+    Advertisement: [AdvertisementColumns.ID.value, AdvertisementColumns.TITLE.value,
+                    AdvertisementColumns.CREATION_DATE.value, AdvertisementColumns.USER_ID.value]
+}
+
+
+@dataclass(frozen=True)
+class Sort:
+    column: str
+    descending: bool = False
+
+    def __str__(self) -> str:
+        return f'{"-" if self.descending else ""}{self.column}'
+
+
+DEFAULT_SORT = Sort(column="id")
+
+
 class Params(str, enum.Enum):
     MODEL_CLASS = "model_class"
     FILTER_TYPE = "filter_type"
@@ -47,6 +105,128 @@ class ValidParams(enum.Enum):
     COMPARISON = [cmp.value for cmp in Comparison]
 
 
+# Built once at import time and shared by every Filter: validation only reads them.
+VALID_PARAMS = types.MappingProxyType({
+    'model_class': ValidParams.MODEL_CLASS.value,
+    'filter_type': ValidParams.FILTER_TYPE.value,
+    'column': list(dict.fromkeys(ValidParams.COLUMN_USER.value + ValidParams.COLUMN_ADV.value)),
+    ModelClasses.USER.value.__name__ + "_columns": ValidParams.COLUMN_USER.value,
+    ModelClasses.ADV.value.__name__ + "_columns": ValidParams.COLUMN_ADV.value,
+    ModelClasses.USER.value.__name__ + "_text_columns": [UserColumns.NAME.value, UserColumns.EMAIL.value],
+    ModelClasses.ADV.value.__name__ + "_text_columns": [
+        AdvertisementColumns.TITLE.value, AdvertisementColumns.DESCRIPTION.value
+    ],
+    'comparison': ValidParams.COMPARISON.value
+})
+
+COMPARISON_OPERATORS = types.MappingProxyType({
+    Comparison.IS.value: sqlalchemy.sql.expression.ColumnOperators.__eq__,
+    Comparison.NOT.value: sqlalchemy.sql.expression.ColumnOperators.__ne__,
+    Comparison.LT.value: sqlalchemy.sql.expression.ColumnOperators.__lt__,
+    Comparison.LE.value: sqlalchemy.sql.expression.ColumnOperators.__le__,
+    Comparison.GT.value: sqlalchemy.sql.expression.ColumnOperators.__gt__,
+    Comparison.GE.value: sqlalchemy.sql.expression.ColumnOperators.__ge__
+})
+
+
+def is_digits(value: Any) -> bool:
+    """
+    Tells whether a value passed for an integer column is an integer or a string of digits. Booleans are rejected,
+    though ``bool`` is a subclass of ``int``.
+    """
+    return isinstance(value, int) and not isinstance(value, bool) or (isinstance(value, str) and value.isdigit())
+
+
+class ValueFormat(str, enum.Enum):
+    TEXT = "text"
+    DIGITS = "digits"
+    DATE = "date"
+
+
+VALUE_FORMAT_DESCRIPTIONS = types.MappingProxyType({
+    ValueFormat.TEXT: "a string",
+    ValueFormat.DIGITS: "an integer or a string of digits",
+    ValueFormat.DATE: 'a date string of the following format: "YYYY-MM-DD"'
+})
+
+
+@dataclass(frozen=True)
+class FilterSpec:
+    """
+    One valid combination of a model class, a filter type, a column and a comparison, together with the format
+    its "column_value" must have. Comparisons are not part of text searches, and full-text search has no column.
+    Values are scalars: lists and objects passed in a JSON filter are never accepted.
+    """
+    model_class: Type[User | Advertisement]
+    filter_type: str
+    column: Optional[str]
+    comparison: Optional[str]
+    value_format: ValueFormat = ValueFormat.TEXT
+
+    def accepts(self, column_value: Any) -> bool:
+        if column_value is None:
+            return self.filter_type == FilterTypes.SEARCH_TEXT
+        match self.value_format:
+            case ValueFormat.DIGITS:
+                return is_digits(column_value)
+            case ValueFormat.DATE:
+                try:
+                    datetime.strptime(column_value, "%Y-%m-%d")
+                except (ValueError, TypeError):
+                    return False
+                return True
+        return isinstance(column_value, str)
+
+
+def _build_filter_specs() -> types.MappingProxyType:
+    specs = {}
+    for model_class in ValidParams.MODEL_CLASS.value:
+        columns = VALID_PARAMS[model_class.__name__ + "_columns"]
+        text_columns = VALID_PARAMS[model_class.__name__ + "_text_columns"]
+        for column in columns:
+            value_format = ValueFormat.TEXT
+            if column in (UserColumns.ID, AdvertisementColumns.USER_ID):
+                value_format = ValueFormat.DIGITS
+            elif column == AdvertisementColumns.CREATION_DATE:
+                value_format = ValueFormat.DATE
+            for comparison in VALID_PARAMS["comparison"]:
+                if column in text_columns and comparison not in (Comparison.IS, Comparison.NOT):
+                    continue
+                specs[(model_class, FilterTypes.COLUMN_VALUE.value, column, comparison)] = FilterSpec(
+                    model_class=model_class, filter_type=FilterTypes.COLUMN_VALUE.value, column=column,
+                    comparison=comparison, value_format=value_format
+                )
+        for filter_type in TEXT_FILTER_TYPES:
+            for column in text_columns:
+                specs[(model_class, filter_type.value, column, None)] = FilterSpec(
+                    model_class=model_class, filter_type=filter_type.value, column=column, comparison=None
+                )
+    specs[(Advertisement, FilterTypes.FULL_TEXT.value, None, None)] = FilterSpec(
+        model_class=Advertisement, filter_type=FilterTypes.FULL_TEXT.value, column=None, comparison=None
+    )
+    return types.MappingProxyType(specs)
+
+
+FILTER_SPECS = _build_filter_specs()
+
+
+def get_filter_spec(model_class: Any, filter_type: Any, column: Any, comparison: Any) -> Optional[FilterSpec]:
+    """
+    Looks up the spec of a filter in ``FILTER_SPECS``. Returns ``None`` if the combination is not a valid one.
+    """
+    filter_type = getattr(filter_type, "value", filter_type)
+    key = (
+        model_class,
+        filter_type,
+        getattr(column, "value", column),
+        getattr(comparison, "value", comparison) if filter_type == FilterTypes.COLUMN_VALUE else None
+    )
+    try:
+        return FILTER_SPECS.get(key)
+    except TypeError:
+        return None
+
+
 class ErrType(str, enum.Enum):
     MISSING = "missing_params"
     INVALID = "invalid_params"
@@ -85,34 +265,88 @@ class ParamsValidation:
                 self.logs.add(it)
 
 
+def parse_timestamp(name: str, value: Any) -> tuple[datetime, bool]:
+    """
+    Parses a date-range bound passed by the client: a date, "YYYY-MM-DD", or an ISO 8601 date-time. Aware date-times
+    are converted to naive UTC ones, matching the "timestamp without time zone" columns.
+
+    :param name: name of the parameter, used in the error message
+    :type name: str
+    :param value: value passed
+    :type value: Any
+    :return: the timestamp and whether a bare date was passed
+    :rtype: tuple[datetime, bool]
+    :raises app.domain.errors.ValidationError: if the value is not a date or a date-time
+    """
+    try:
+        timestamp = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise app.domain.errors.ValidationError(message={ErrType.INVALID.value: {
+            name: 'Must be a date string of the following format: "YYYY-MM-DD" or an ISO 8601 date-time.'
+        }})
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    try:
+        is_date = isinstance(value, str) and bool(date.fromisoformat(value))
+    except ValueError:
+        is_date = False
+    return timestamp, is_date
+
+
+def escape_like(value: str, escape_char: str = "\\") -> str:
+    """
+    Escapes LIKE wildcards in a user-supplied search term, so it is matched literally.
+    """
+    return value.replace(escape_char, escape_char * 2).replace("%", escape_char + "%").replace("_", escape_char + "_")
+
+
+def encode_cursor(payload: dict[str, Any]) -> str:
+    """
+    Packs the position of the last row of a page into an opaque, url-safe string.
+
+    :param payload: values of the row the next page starts after
+    :type payload: dict[str, Any]
+    :return: cursor string
+    :rtype: str
+    """
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> dict[str, Any]:
+    """
+    Unpacks a cursor created by ``encode_cursor()``.
+
+    :param cursor: cursor string
+    :type cursor: str
+    :return: values of the row the next page starts after
+    :rtype: dict[str, Any]
+    :raises app.domain.errors.ValidationError: if the cursor is malformed
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError, UnicodeError):
+        payload = None
+    if not isinstance(payload, dict) or not isinstance(payload.get("id"), int) or \
+            not isinstance(payload.get("sort", str(DEFAULT_SORT)), str):
+        raise app.domain.errors.ValidationError(message={"invalid_params": {"cursor": "Invalid cursor."}})
+    return payload
+
+
 class Filter:
 
     def __init__(self, session: sqlalchemy.orm.Session, ):
         self.session = session
-        self._comparison = {"is": {"apply": "__eq__", "explain": "Equal to"},
-                            "is_not": {"apply": "__ne__", "explain": "Not equal to"},
-                            "<": {"apply": "__lt__", "explain": "Less than"},
-                            "<=": {"apply": "__le__", "explain": "Less than or equal to"},
-                            ">": {"apply": "__gt__", "explain": "Greater than"},
-                            ">=": {"apply": "__ge__", "explain": "Greater than or equal to"}}
         self.query_filtered: Optional[Query] = None
+        self.projection: Optional[Projection] = None
+        self.count_cache_key: Optional[tuple] = None
+        self.search_plan: Optional[search_planner.SearchPlan] = None
+        self.predicates_count: int = 0
         self.res_list: Optional[list] = None
         self.paginated: Optional[dict] = None
         self.page_default_value: int = 1
         self.per_page_default_value: int = 10
         self.params_info = ParamsValidation(
-            missing_params=[], invalid_params={}, logs=set(), valid_params={
-                'model_class': ValidParams.MODEL_CLASS.value,
-                'filter_type': ValidParams.FILTER_TYPE.value,
-                'column': list(set(ValidParams.COLUMN_USER.value + ValidParams.COLUMN_ADV.value)),
-                ModelClasses.USER.value.__name__ + "_columns": ValidParams.COLUMN_USER.value,
-                ModelClasses.ADV.value.__name__ + "_columns": ValidParams.COLUMN_ADV.value,
-                ModelClasses.USER.value.__name__ + "_text_columns": [UserColumns.NAME.value, UserColumns.EMAIL.value],
-                ModelClasses.ADV.value.__name__ + "_text_columns": [
-                        AdvertisementColumns.TITLE.value, AdvertisementColumns.DESCRIPTION.value
-                    ],
-                'comparison': ValidParams.COMPARISON.value
-            }
+            missing_params=[], invalid_params={}, logs=set(), valid_params=VALID_PARAMS  # type: ignore
         )
 
     def _validate_params(self, data: dict[str, Any], params: Type[Params]) -> None:
@@ -123,6 +357,12 @@ class Filter:
                 if not(
                         (param == Params.COMPARISON or param == Params.COLUMN_VALUE) and
                         self.params_info.params_passed.get(Params.FILTER_TYPE) == FilterTypes.SEARCH_TEXT
+                ) and not (
+                        param == Params.COMPARISON and
+                        self.params_info.params_passed.get(Params.FILTER_TYPE) in TEXT_FILTER_TYPES
+                ) and not (
+                        (param == Params.COMPARISON or param == Params.COLUMN) and
+                        self.params_info.params_passed.get(Params.FILTER_TYPE) == FilterTypes.FULL_TEXT
                 ):
                     self.params_info.add_error_info(
                         info_type=ErrType.MISSING.value, info=f'{param.value}'  # type: ignore
@@ -130,7 +370,8 @@ class Filter:
             params_dict |= {param.value: data.get(param.value)}  # type: ignore
         for param_name, param_value in params_dict.items():
             if param_value is not None and param_name != Params.COLUMN_VALUE and not (
-              param_name == Params.COMPARISON and params_dict.get(Params.FILTER_TYPE.value) == FilterTypes.SEARCH_TEXT
+              param_name == Params.COMPARISON and
+              params_dict.get(Params.FILTER_TYPE.value) in (*TEXT_FILTER_TYPES, FilterTypes.FULL_TEXT)
             ):
                 if param_value not in self.params_info.valid_params.get(param_name):
                     self.params_info.add_error_info(
@@ -140,10 +381,20 @@ class Filter:
                         }
                     )
         match params_dict:
+            case {Params.FILTER_TYPE.value: FilterTypes.FULL_TEXT, Params.MODEL_CLASS.value: mc}:
+                if mc in ValidParams.MODEL_CLASS.value and mc is not ModelClasses.ADV.value:
+                    self.params_info.add_error_info(
+                        info_type=ErrType.INVALID.value,
+                        info={
+                            Params.MODEL_CLASS.value: f'When "{Params.FILTER_TYPE.value}" is '
+                                                      f'"{FilterTypes.FULL_TEXT.value}", the only valid model class '
+                                                      f'is "{ModelClasses.ADV.value.__name__}".'
+                        }
+                    )
             case {Params.COLUMN.value: c, Params.COLUMN_VALUE.value: cv, Params.FILTER_TYPE.value: ft} if \
               ft == FilterTypes.COLUMN_VALUE and \
               c in [UserColumns.ID, AdvertisementColumns.ID, AdvertisementColumns.USER_ID] and \
-              (isinstance(cv, str) and not cv.isdigit() and not isinstance(cv, int)):
+              cv is not None and not is_digits(cv):
                 self.params_info.add_error_info(
                     info_type=ErrType.INVALID.value,
                     info={Params.COLUMN_VALUE.value: f'When "{Params.COLUMN.value}" is "{c}", '
@@ -175,7 +426,8 @@ class Filter:
                                                  f'{[Comparison.IS.value, Comparison.NOT.value]}.'
                     }
                 )
-            case {Params.FILTER_TYPE: FilterTypes.SEARCH_TEXT, Params.COLUMN: c, Params.MODEL_CLASS: mc} if c not in \
+            case {Params.FILTER_TYPE: ft, Params.COLUMN: c, Params.MODEL_CLASS: mc} if ft in TEXT_FILTER_TYPES and \
+                    c not in \
                     set(
                         self.params_info.valid_params[ModelClasses.USER.value.__name__ + "_text_columns"] +
                         self.params_info.valid_params[ModelClasses.ADV.value.__name__ + "_text_columns"]
@@ -200,22 +452,376 @@ class Filter:
         if self.params_info.logs:
             raise app.domain.errors.ValidationError(message=self.params_info.create_message())
 
-    def _check_page_and_per_page(self, page: Any, per_page: Any) -> dict[Literal["page", "per_page"], int]:
-        params_dict = {"page": page, "per_page": per_page}
-        for key, value in params_dict.items():
-            match value:
-                case value if (isinstance(value, int) or (isinstance(value, str) and value.isdigit())) and \
-                              int(value) > self.query_filtered.count():
-                    if key == "page": params_dict[key] = self.page_default_value
-                    else: params_dict[key] = int(value)
-                case value if (isinstance(value, int) or (isinstance(value, str) and value.isdigit())) and \
-                              0 < int(value) <= self.query_filtered.count():
-                    params_dict[key] = int(value)
-                case _:
-                    if key == "page": params_dict[key] = self.page_default_value
-                    else: params_dict[key] = self.per_page_default_value
+    def _check_filter(self, data: dict[str, Any]) -> None:
+        """
+        Validates a filter with one lookup in ``FILTER_SPECS``. Only a filter that is not found there goes
+        through ``_validate_params()``, which walks every parameter to build the detailed error message.
+        """
+        spec = get_filter_spec(model_class=data.get(Params.MODEL_CLASS.value),
+                               filter_type=data.get(Params.FILTER_TYPE.value),
+                               column=data.get(Params.COLUMN.value),
+                               comparison=data.get(Params.COMPARISON.value))
+        if spec is None or not spec.accepts(data.get(Params.COLUMN_VALUE.value)):
+            self._validate_params(data=data, params=Params)
+            if spec is not None:
+                # The filter is a valid one, only its value is of the wrong type, e.g. a list in a JSON filter.
+                self.params_info.add_error_info(
+                    info_type=ErrType.INVALID.value,
+                    info={Params.COLUMN_VALUE.value: f'"{Params.COLUMN_VALUE.value}" must be '
+                                                     f'{VALUE_FORMAT_DESCRIPTIONS[spec.value_format]}.'}
+                )
+                raise app.domain.errors.ValidationError(message=self.params_info.create_message())
+
+    def _check_page_and_per_page(
+            self, page: Any, per_page: Any, total: Optional[int] = None
+    ) -> dict[Literal["page", "per_page"], int]:
+        """
+        Normalises the "page" and "per_page" values passed by the client. When the total number of matching rows
+        is already known, a page number exceeding it falls back to the default page.
+        """
+        params_dict = {"page": self.page_default_value, "per_page": self._check_per_page(per_page=per_page)}
+        match page:
+            case page if (isinstance(page, int) or (isinstance(page, str) and page.isdigit())) and \
+                         0 < int(page) and (total is None or int(page) <= total):
+                params_dict["page"] = int(page)
         return params_dict
 
+    def _check_per_page(self, per_page: Any) -> int:
+        if (isinstance(per_page, int) or (isinstance(per_page, str) and per_page.isdigit())) and int(per_page) > 0:
+            return int(per_page)
+        return self.per_page_default_value
+
+    def _get_page_with_total(self, page: int, per_page: int) -> tuple[list[sqlalchemy.Row], Optional[int]]:
+        """
+        Fetches one page together with the total number of matching rows in a single statement, carrying the total
+        on every row as a ``COUNT(*) OVER ()`` window column.
+
+        The total is ``None`` when the page is empty, since there is no row to carry it.
+        """
+        rows = self.query_filtered.add_columns(sqlalchemy.func.count().over().label("total")) \
+            .offset((page - 1) * per_page).limit(per_page).all()
+        if not rows:
+            return [], None
+        return rows, rows[0].total
+
+    def _check_include_total(self, include_total: Any) -> IncludeTotal:
+        if include_total is None:
+            return IncludeTotal.EXACT
+        try:
+            return IncludeTotal(include_total)
+        except ValueError:
+            raise app.domain.errors.ValidationError(
+                message={"invalid_params": {"include_total": f"Valid values are: {[it.value for it in IncludeTotal]}"}}
+            )
+
+    def _get_page_with_exact_total(self, page: int, per_page: int) -> tuple[int, list[sqlalchemy.Row], int]:
+        """
+        Returns the normalised page number, the page rows and the exact total. Totals of text searches are taken
+        from ``count_cache`` when possible, so paging through one search does not recount it. Keys start with the
+        engine of the session, so every shard of a fan-out caches its own total.
+        """
+        total: Optional[int] = count_cache.get(self.count_cache_key) if self.count_cache_key else None
+        if total is not None:
+            page = self._check_page_and_per_page(page=page, per_page=per_page, total=total)["page"]
+            return page, self.query_filtered.offset((page - 1) * per_page).limit(per_page).all(), total
+        rows, total = self._get_page_with_total(page=page, per_page=per_page)
+        if total is None:
+            first_page_rows, total = self._get_page_with_total(page=1, per_page=per_page) \
+                if page > 1 else ([], None)
+            total = total or 0
+            page = self._check_page_and_per_page(page=page, per_page=per_page, total=total)["page"]
+            if page == 1:
+                rows = first_page_rows
+        if self.count_cache_key:
+            count_cache.set(self.count_cache_key, total)
+        return page, rows, total
+
+    def _get_offset_page(self, page: Any, per_page: Any,
+                         include_total: Any) -> dict[str, int | bool | list[dict[str, str | int]]]:
+        """
+        Returns an OFFSET/LIMIT page. Depending on ``include_total`` the page carries the exact total, the
+        planner's estimate of it, or only a "has_next" flag found by fetching one extra row.
+        """
+        include_total = self._check_include_total(include_total=include_total)
+        page_and_per_page = self._check_page_and_per_page(page=page, per_page=per_page)
+        page, per_page = page_and_per_page["page"], page_and_per_page["per_page"]
+        if include_total == IncludeTotal.EXACT:
+            page, rows, total = self._get_page_with_exact_total(page=page, per_page=per_page)
+            paginated_data = {"page": page, "per_page": per_page, "total": total}
+        else:
+            rows = self.query_filtered.offset((page - 1) * per_page).limit(per_page + 1).all()
+            paginated_data = {"page": page, "per_page": per_page, "has_next": len(rows) > per_page}
+            rows = rows[:per_page]
+            if include_total == IncludeTotal.ESTIMATE:
+                paginated_data["total"] = max(
+                    estimate_count(session=self.session, query=self.query_filtered),
+                    (page - 1) * per_page + len(rows) + paginated_data["has_next"]
+                )
+        if "total" in paginated_data:
+            paginated_data["total_pages"] = (paginated_data["total"] + per_page - 1) // per_page
+        paginated_data["items"] = [self.projection.serialize(row) for row in rows]
+        return paginated_data
+
+    def _check_sort(self, model_class: Type[User | Advertisement], sort: Any) -> Optional[Sort]:
+        """
+        Parses a "sort" value such as "-creation_date": a sortable column, optionally prefixed with "-" for the
+        descending order.
+        """
+        if sort is None or sort == "":
+            return None
+        if isinstance(sort, str) and sort.lstrip("-") in SORTABLE_COLUMNS[model_class] and sort.count("-") <= 1:
+            return Sort(column=sort.lstrip("-"), descending=sort.startswith("-"))
+        valid_values = [f"{prefix}{column}" for column in SORTABLE_COLUMNS[model_class] for prefix in ("", "-")]
+        raise app.domain.errors.ValidationError(
+            message={ErrType.INVALID.value: {"sort": f"Valid values are: {valid_values}"}}
+        )
+
+    @staticmethod
+    def _get_order_by(model_class: Type[User | Advertisement], sort: Sort) -> list:
+        """
+        Returns the ORDER BY clauses of the sort, with the primary key as the tiebreaker, so rows with equal sort
+        keys always come in the same order and pages do not overlap.
+        """
+        columns = [getattr(model_class, sort.column)] if sort.column != DEFAULT_SORT.column else []
+        columns.append(model_class.id)
+        return [column.desc() if sort.descending else column.asc() for column in columns]
+
+    def _get_keyset_page(self, model_class: Type[User | Advertisement], cursor: str, per_page: Any,
+                         sort: Optional[Sort] = None) -> dict[str, int | str | None | list[dict[str, str | int]]]:
+        """
+        Returns the page of rows following the cursor position, seeking by the sort key and the primary key instead
+        of skipping rows with OFFSET, so every page costs the same regardless of its depth.
+
+        An empty cursor string starts from the first row. Any ranking order is replaced by the sort order, which
+        defaults to the primary key. A cursor is only valid for the sort it was created with.
+        """
+        per_page = self._check_per_page(per_page=per_page)
+        sort = sort or DEFAULT_SORT
+        sort_attr = getattr(model_class, sort.column)
+        query = self.query_filtered
+        if cursor:
+            payload = decode_cursor(cursor=cursor)
+            if payload.get("sort", str(DEFAULT_SORT)) != str(sort):
+                raise app.domain.errors.ValidationError(message={"invalid_params": {"cursor": "Invalid cursor."}})
+            if sort.column == DEFAULT_SORT.column:
+                position, after = model_class.id, payload["id"]
+            else:
+                position = sqlalchemy.tuple_(sort_attr, model_class.id)
+                after = sqlalchemy.tuple_(self._decode_sort_key(model_class, sort, payload.get("key")), payload["id"])
+            query = query.filter(position < after if sort.descending else position > after)
+        rows: list[sqlalchemy.Row] = query.order_by(None).order_by(
+            *self._get_order_by(model_class=model_class, sort=sort)
+        ).limit(per_page + 1).all()
+        has_next: bool = len(rows) > per_page
+        rows = rows[:per_page]
+        next_cursor = None
+        if has_next:
+            payload = {"id": rows[-1].id}
+            if sort != DEFAULT_SORT:
+                payload["sort"] = str(sort)
+            if sort.column != DEFAULT_SORT.column:
+                key = getattr(rows[-1], sort.column)
+                payload["key"] = key.isoformat() if isinstance(key, datetime) else key
+            next_cursor = encode_cursor(payload=payload)
+        return {
+            "per_page": per_page,
+            "next_cursor": next_cursor,
+            "items": [self.projection.serialize(row) for row in rows]
+        }
+
+    @staticmethod
+    def _decode_sort_key(model_class: Type[User | Advertisement], sort: Sort, key: Any) -> Any:
+        python_type = sqlalchemy.inspect(model_class).columns[sort.column].type.python_type
+        try:
+            if python_type is datetime and isinstance(key, str):
+                return datetime.fromisoformat(key)
+            if isinstance(key, python_type) and not isinstance(key, bool):
+                return key
+        except ValueError:
+            pass
+        raise app.domain.errors.ValidationError(message={"invalid_params": {"cursor": "Invalid cursor."}})
+
+    def _build_condition(self,
+                         model_class: Type[User | Advertisement],
+                         filter_type: FilterTypes,
+                         column: Optional[AdvertisementColumns | UserColumns],
+                         column_value: Any,
+                         comparison: Optional[Comparison],
+                         rank: Optional[bool] = None) -> tuple[sqlalchemy.ColumnElement, list]:
+        """
+        Compiles one validated predicate into a WHERE clause and the ORDER BY clauses it implies.
+        """
+        model_attr = getattr(model_class, column, None) if column else None
+        if filter_type == FilterTypes.AUTO:
+            return self._build_planned_condition(model_class=model_class, column=column, model_attr=model_attr,
+                                                 term=str(column_value), rank=rank)
+        if filter_type == FilterTypes.SEARCH_TEXT:
+            return model_attr.ilike(f'%{escape_like(str(column_value))}%', escape="\\"), []
+        if filter_type == FilterTypes.PREFIX:
+            return model_attr.ilike(f'{escape_like(str(column_value))}%', escape="\\"), []
+        if filter_type == FilterTypes.FUZZY:
+            return model_attr.op("%")(column_value), [
+                sqlalchemy.func.similarity(model_attr, column_value).desc(), model_class.id
+            ]
+        if filter_type == FilterTypes.FULL_TEXT:
+            search_vector = sqlalchemy.inspect(model_class).local_table.c.search_vector
+            ts_query = sqlalchemy.func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, column_value)
+            order_by = [sqlalchemy.func.ts_rank(search_vector, ts_query).desc(), model_class.id] if rank else []
+            return search_vector.op("@@")(ts_query), order_by
+        if column == "creation_date":
+            return self._build_date_condition(model_attr=model_attr, column_value=column_value,
+                                              comparison=comparison), []
+        condition = COMPARISON_OPERATORS[getattr(comparison, "value", comparison)](model_attr, column_value)
+        return condition, []
+
+    def _build_planned_condition(self, model_class: Type[User | Advertisement], column: str, model_attr: Any,
+                                 term: str, rank: Optional[bool] = None) -> tuple[sqlalchemy.ColumnElement, list]:
+        """
+        Builds the condition of an "auto" search with the strategy the search planner picks. Every strategy
+        matches the requested column only, case-insensitively, but not all of them match substrings like
+        "search_text" does:
+
+        - equality: the whole value equals the term (e-mail addresses in ``user.email``), compared lowercased so
+          that the ``lower(email)`` index answers it;
+        - prefix: the value starts with the term (terms too short for trigrams);
+        - trigram: the value contains the term, as with "search_text";
+        - full text: the value contains all the words of the term, in any order and stemmed (multi-word terms in
+          advertisements). The combined ``search_vector`` index narrows the candidates, and the column's own vector
+          drops rows whose words are in the other column only.
+        """
+        self.search_plan = search_planner.plan_search(
+            session=self.session, model_class=model_class, column=column, term=term
+        )
+        match self.search_plan.strategy:
+            case search_planner.SearchStrategy.EQUALITY:
+                return sqlalchemy.func.lower(model_attr) == sqlalchemy.func.lower(term), []
+            case search_planner.SearchStrategy.PREFIX:
+                return model_attr.ilike(f'{escape_like(term)}%', escape="\\"), []
+            case search_planner.SearchStrategy.FULL_TEXT:
+                search_vector = sqlalchemy.inspect(model_class).local_table.c.search_vector
+                # Only lexemes joined by AND: a row matching in the column also matches in the combined vector.
+                ts_query = sqlalchemy.func.plainto_tsquery(TEXT_SEARCH_CONFIG, term)
+                column_vector = sqlalchemy.func.to_tsvector(
+                    TEXT_SEARCH_CONFIG, sqlalchemy.func.coalesce(model_attr, "")
+                )
+                order_by = [sqlalchemy.func.ts_rank(column_vector, ts_query).desc(), model_class.id] if rank else []
+                return sqlalchemy.and_(search_vector.op("@@")(ts_query), column_vector.op("@@")(ts_query)), order_by
+        return model_attr.ilike(f'%{escape_like(term)}%', escape="\\"), []
+
+    @staticmethod
+    def _build_date_condition(model_attr: Any, column_value: str, comparison: Comparison) -> sqlalchemy.ColumnElement:
+        """
+        Compares the timestamp column with a calendar day as the half-open range ``[day, next day)`` on the raw
+        column, so the comparison can be answered by an index range scan instead of casting every row to a date.
+        """
+        day_start = datetime.strptime(column_value, "%Y-%m-%d")
+        day_end = day_start + timedelta(days=1)
+        match comparison:
+            case Comparison.IS:
+                return sqlalchemy.and_(model_attr >= day_start, model_attr < day_end)
+            case Comparison.NOT:
+                return sqlalchemy.or_(model_attr < day_start, model_attr >= day_end)
+            case Comparison.LT:
+                return model_attr < day_start
+            case Comparison.LE:
+                return model_attr < day_end
+            case Comparison.GT:
+                return model_attr >= day_end
+            case Comparison.GE:
+                return model_attr >= day_start
+
+    def _build_created_range(self, model_class: Type[User | Advertisement], created_from: Any,
+                             created_to: Any) -> Optional[sqlalchemy.ColumnElement]:
+        """
+        Compiles the "created_from" and "created_to" bounds into the half-open range
+        ``created_from <= creation_date < created_to`` on the raw column. A bare date passed as "created_to"
+        includes the whole day.
+        """
+        clauses = []
+        lower = upper = None
+        if created_from not in (None, ""):
+            lower, _ = parse_timestamp(name="created_from", value=created_from)
+            clauses.append(model_class.creation_date >= lower)
+        if created_to not in (None, ""):
+            upper, is_date = parse_timestamp(name="created_to", value=created_to)
+            upper += timedelta(days=1) if is_date else timedelta()
+            clauses.append(model_class.creation_date < upper)
+        if lower is not None and upper is not None and lower >= upper:
+            raise app.domain.errors.ValidationError(message={ErrType.INVALID.value: {
+                "created_to": 'Must be later than "created_from".'
+            }})
+        return sqlalchemy.and_(*clauses) if clauses else None
+
+    def _build_expression(self, model_class: Type[User | Advertisement], node: Any, path: str = "filter",
+                          depth: int = 0) -> sqlalchemy.ColumnElement:
+        """
+        Recursively compiles a compound filter expression into one WHERE clause. A node is either a group,
+        ``{"and": [...]}`` or ``{"or": [...]}``, or a predicate with the "filter_type" (defaults to
+        "column_value"), "column", "column_value" and "comparison" (defaults to "is" for "column_value" predicates)
+        keys, validated like a single filter. Errors of a predicate echo only the keys the client passed.
+        """
+        def invalid(message: str | dict) -> app.domain.errors.ValidationError:
+            return app.domain.errors.ValidationError(message={ErrType.INVALID.value: {path: message}})
+
+        if not isinstance(node, dict) or not node:
+            raise invalid("Must be a non-empty object.")
+        if depth > MAX_FILTER_DEPTH:
+            raise invalid(f"Groups can be nested at most {MAX_FILTER_DEPTH} levels deep.")
+        groups = set(node) & {op.value for op in LogicalOperator}
+        if groups:
+            if len(node) != 1:
+                raise invalid(f"A group must contain exactly one of {[op.value for op in LogicalOperator]}.")
+            operator, children = next(iter(node.items()))
+            if not isinstance(children, list) or not children:
+                raise invalid(f'"{operator}" must be a non-empty list.')
+            clauses = [
+                self._build_expression(model_class=model_class, node=child, path=f"{path}.{operator}[{i}]",
+                                       depth=depth + 1)
+                for i, child in enumerate(children)
+            ]
+            return sqlalchemy.and_(*clauses) if operator == LogicalOperator.AND else sqlalchemy.or_(*clauses)
+        unknown_keys = set(node) - {Params.FILTER_TYPE.value, Params.COLUMN.value, Params.COLUMN_VALUE.value,
+                                    Params.COMPARISON.value}
+        if unknown_keys:
+            raise invalid(f"Unknown keys: {sorted(unknown_keys)}.")
+        self.predicates_count += 1
+        if self.predicates_count > MAX_FILTER_PREDICATES:
+            raise invalid(f"A filter can contain at most {MAX_FILTER_PREDICATES} predicates.")
+        filter_type = node.get(Params.FILTER_TYPE.value, FilterTypes.COLUMN_VALUE.value)
+        predicate = {
+            Params.FILTER_TYPE.value: filter_type,
+            Params.COLUMN.value: node.get(Params.COLUMN.value),
+            Params.COLUMN_VALUE.value: node.get(Params.COLUMN_VALUE.value),
+            Params.COMPARISON.value: node.get(
+                Params.COMPARISON.value, Comparison.IS.value if filter_type == FilterTypes.COLUMN_VALUE else None
+            )
+        }
+        try:
+            Filter(session=self.session)._check_filter(data={Params.MODEL_CLASS.value: model_class, **predicate})
+        except app.domain.errors.ValidationError as e:
+            raise invalid(e.message | {"params_passed": node} if "params_passed" in e.message else e.message)
+        condition, _ = self._build_condition(model_class=model_class, **predicate)
+        return condition
+
+    def _parse_filter_expression(self, filter_expression: str | dict) -> dict:
+        if isinstance(filter_expression, str):
+            try:
+                return json.loads(filter_expression)
+            except ValueError:
+                raise app.domain.errors.ValidationError(
+                    message={ErrType.INVALID.value: {"filter": "Must be a valid JSON object."}}
+                )
+        return filter_expression
+
+    def get_filter_condition(self, model_class: Type[User | Advertisement],
+                             filter_expression: str | dict) -> sqlalchemy.ColumnElement:
+        """
+        Compiles a filter expression into a WHERE clause only, e.g. for set-based updates and deletes.
+        """
+        return self._build_expression(
+            model_class=model_class, node=self._parse_filter_expression(filter_expression=filter_expression)
+        )
+
     def get_filter_result(self,
                           model_class: Optional[Type[User | Advertisement]] = None,
                           filter_type: Optional[FilterTypes] = None,
@@ -224,41 +830,129 @@ class Filter:
                           comparison: Optional[Comparison] = None,
                           paginate: Optional[bool] = None,
                           page: Optional[int] = None,
-                          per_page: Optional[int] = None) -> list | dict[str, int | list[dict[str, str | int]]]:
-        self._validate_params(params=Params, data={'model_class': model_class,
-                                                   'filter_type': filter_type,
-                                                   'comparison': comparison,
-                                                   'column': column,
-                                                   'column_value': column_value})
-        query: sqlalchemy.orm.Query = self.session.query(model_class)
-        model_attr = getattr(model_class, column, None)
-        if filter_type == FilterTypes.SEARCH_TEXT:
-            self.query_filtered = query.filter(model_attr.ilike(f'%{column_value}%'))
-        else:
-            comparison_operator = getattr(sqlalchemy.sql.expression.ColumnOperators,
-                                          self._comparison.get(comparison)["apply"])
-            if column == "creation_date":
-                self.query_filtered = query.filter(
-                    comparison_operator(model_class.creation_date.cast(sqlalchemy.Date),  # type: ignore
-                                        datetime.strptime(column_value, "%Y-%m-%d"))
+                          per_page: Optional[int] = None,
+                          cursor: Optional[str] = None,
+                          include_total: Optional[IncludeTotal] = None,
+                          rank: Optional[bool] = None,
+                          filter_expression: Optional[str | dict] = None,
+                          sort: Optional[str] = None,
+                          created_from: Optional[str | datetime] = None,
+                          created_to: Optional[str | datetime] = None,
+                          fields: Optional[str | list[str]] = None,
+                          yield_per: Optional[int] = None
+                          ) -> list | dict[str, int | list[dict[str, str | int]]] | Iterator[dict[str, Any]]:
+        if filter_expression is not None:
+            if model_class not in ValidParams.MODEL_CLASS.value:
+                raise app.domain.errors.ValidationError(
+                    message={ErrType.INVALID.value: {
+                        Params.MODEL_CLASS.value: f'Valid values are: {ValidParams.MODEL_CLASS.value}'
+                    }}
                 )
-            self.query_filtered = query.filter(comparison_operator(model_attr, column_value))
+            filter_expression = self._parse_filter_expression(filter_expression=filter_expression)
+            condition = self._build_expression(model_class=model_class, node=filter_expression)
+            created_range = self._build_created_range(model_class=model_class, created_from=created_from,
+                                                      created_to=created_to)
+            sort = self._check_sort(model_class=model_class, sort=sort)
+            self.query_filtered = self._get_base_query(
+                model_class=model_class, paginate=paginate or yield_per is not None, fields=fields, sort=sort
+            ).filter(*[clause for clause in (condition, created_range) if clause is not None])
+            self.count_cache_key = (self.session.get_bind(), model_class.__name__,
+                                    json.dumps(filter_expression, sort_keys=True, default=str), str(created_from),
+                                    str(created_to))
+            return self._get_result(paginate=paginate, model_class=model_class, page=page, per_page=per_page,
+                                    cursor=cursor, include_total=include_total, sort=sort, yield_per=yield_per)
+        self._check_filter(data={'model_class': model_class,
+                                 'filter_type': filter_type,
+                                 'comparison': comparison,
+                                 'column': column,
+                                 'column_value': column_value})
+        if filter_type in (*TEXT_FILTER_TYPES, FilterTypes.FULL_TEXT):
+            self.count_cache_key = (
+                self.session.get_bind(), model_class.__name__, FilterTypes(filter_type).value,
+                getattr(column, "value", column), column_value,
+                str(created_from), str(created_to)
+            )
+        condition, order_by = self._build_condition(
+            model_class=model_class, filter_type=filter_type, column=column, column_value=column_value,
+            comparison=comparison, rank=rank
+        )
+        created_range = self._build_created_range(model_class=model_class, created_from=created_from,
+                                                  created_to=created_to)
+        sort = self._check_sort(model_class=model_class, sort=sort)
+        self.query_filtered = self._get_base_query(
+            model_class=model_class, paginate=paginate or yield_per is not None, fields=fields, sort=sort
+        ).filter(*[clause for clause in (condition, created_range) if clause is not None]).order_by(*order_by)
+        return self._get_result(paginate=paginate, model_class=model_class, page=page, per_page=per_page,
+                                cursor=cursor, include_total=include_total, sort=sort, ranked=bool(order_by),
+                                yield_per=yield_per)
+
+    def _check_fields(self, model_class: Type[User | Advertisement], fields: Any) -> Optional[tuple[str, ...]]:
+        """
+        Parses a "fields" value, a comma-separated string or a list of column names, into a tuple of unique
+        columns of the model. ``None`` or an empty value selects all the columns.
+        """
+        if fields is None or fields == "" or fields == []:
+            return None
+        valid_columns = self.params_info.valid_params[model_class.__name__ + "_columns"]
+        if isinstance(fields, str):
+            fields = fields.split(",")
+        if isinstance(fields, (list, tuple)) and all(isinstance(field, str) for field in fields):
+            fields = tuple(dict.fromkeys(field.strip() for field in fields))
+            if all(field in valid_columns for field in fields):
+                return fields
+        raise app.domain.errors.ValidationError(
+            message={ErrType.INVALID.value: {"fields": f"Valid values are: {valid_columns}"}}
+        )
+
+    def _get_base_query(self, model_class: Type[User | Advertisement], paginate: Optional[bool],
+                        fields: Any = None, sort: Optional[Sort] = None) -> Query:
+        """
+        Paginated listings and streamed results select only the columns of the requested fields, plus the primary
+        key and the sort key pagination reads, and serialize the rows directly, skipping the construction of mapped
+        instances and the identity map. Unpaginated results are mapped instances.
+        """
+        visibility_conditions = VISIBILITY_CONDITIONS.get(model_class, ())
+        if paginate:
+            self.projection = get_projection(
+                model_class=model_class, columns=self._check_fields(model_class=model_class, fields=fields),
+                required_columns=(DEFAULT_SORT.column, (sort or DEFAULT_SORT).column)
+            )
+            return self.session.query(*self.projection.select_list).filter(*visibility_conditions)
+        return self.session.query(model_class).filter(*visibility_conditions)
+
+    def _get_result(self, paginate: Optional[bool], model_class: Type[User | Advertisement], page: Any,
+                    per_page: Any, cursor: Optional[str], include_total: Any, sort: Optional[Sort] = None,
+                    ranked: bool = False, yield_per: Optional[int] = None) -> list | dict | Iterator[dict[str, Any]]:
+        """
+        Orders the filtered query and fetches the result. An explicit "sort" replaces the ranking order of
+        relevance searches; unranked results are ordered by the primary key, so that offset pages are stable.
+        With ``yield_per`` the result is an iterator of serialized rows instead.
+        """
+        if paginate and cursor is not None:
+            return self._get_keyset_page(model_class=model_class, cursor=cursor, per_page=per_page, sort=sort)
+        if sort or not ranked:
+            self.query_filtered = self.query_filtered.order_by(None).order_by(
+                *self._get_order_by(model_class=model_class, sort=sort or DEFAULT_SORT)
+            )
+        if yield_per is not None:
+            return self._iter_rows(yield_per=yield_per)
         if paginate:
-            page_and_per_page = self._check_page_and_per_page(page=page, per_page=per_page)
-            page, per_page = page_and_per_page["page"], page_and_per_page["per_page"]
-            offset = (page - 1) * per_page
-            total: int = self.query_filtered.count()
-            model_instances: list[ModelClass] = self.query_filtered.offset(offset).limit(per_page).all()
-            paginated_data: dict[str, int | list[dict[str, str | int]]] = {
-                "page": page,
-                "per_page": per_page,
-                "total": total,
-                "total_pages": (total + per_page - 1) // per_page,
-                "items": [services.get_params(model=model_instance) for model_instance in model_instances]
-            }
-            return paginated_data  # type: dict[str, int | list[dict[str, str | int]]]
+            return self._get_offset_page(page=page, per_page=per_page, include_total=include_total)
         return self.query_filtered.all()
 
+    def _iter_rows(self, yield_per: int) -> Iterator[dict[str, Any]]:
+        """
+        Streams the rows of the filtered query through a server-side (named) cursor, fetching ``yield_per`` rows at
+        a time, so memory use does not grow with the size of the result. The query runs on the first ``next()``;
+        closing the iterator early closes the cursor without reading the remaining rows.
+        """
+        result = self.session.execute(self.query_filtered.statement, execution_options={"yield_per": yield_per})
+        try:
+            for row in result:
+                yield self.projection.serialize(row)
+        finally:
+            result.close()
+
 
 def get_list_or_paginated_data(session,
                                model_class: Type[ModelClass] | None = None,
@@ -268,7 +962,40 @@ def get_list_or_paginated_data(session,
                                column_value: str | int | datetime | None = None,
                                paginate: bool | None = None,
                                page: int | None = 1,
-                               per_page: int | None = 10) -> dict:
+                               per_page: int | None = 10,
+                               cursor: str | None = None,
+                               include_total: IncludeTotal | None = None,
+                               rank: bool | None = None,
+                               filter_expression: str | dict | None = None,
+                               sort: str | None = None,
+                               created_from: str | datetime | None = None,
+                               created_to: str | datetime | None = None,
+                               fields: str | list[str] | None = None) -> dict:
+    return Filter(session=session).get_filter_result(
+        model_class, filter_type, column, column_value, comparison, paginate, page, per_page, cursor, include_total,
+        rank, filter_expression, sort, created_from, created_to, fields
+    )
+
+
+def iter_filtered_data(session,
+                       model_class: Type[ModelClass] | None = None,
+                       filter_type: FilterTypes | None = None,
+                       comparison: Comparison | None = None,
+                       column: AdvertisementColumns | UserColumns | None = None,
+                       column_value: str | int | datetime | None = None,
+                       filter_expression: str | dict | None = None,
+                       sort: str | None = None,
+                       created_from: str | datetime | None = None,
+                       created_to: str | datetime | None = None,
+                       fields: str | list[str] | None = None,
+                       chunk_size: int = 1000) -> Iterator[dict[str, Any]]:
+    """
+    Same filters as ``get_list_or_paginated_data()``, but the whole result is streamed, ``chunk_size`` rows per
+    fetch from a server-side cursor. Filters are validated at the call; the query runs on the first ``next()``.
+    Relevance ranking is not applied: rows are ordered by "sort", or by id.
+    """
     return Filter(session=session).get_filter_result(
-        model_class, filter_type, column, column_value, comparison, paginate, page, per_page
+        model_class=model_class, filter_type=filter_type, column=column, column_value=column_value,
+        comparison=comparison, filter_expression=filter_expression, sort=sort, created_from=created_from,
+        created_to=created_to, fields=fields, yield_per=chunk_size
     )
@@ -0,0 +1,80 @@
+import dataclasses
+import functools
+from datetime import datetime
+from typing import Type, Any, Callable, Optional, Sequence
+
+import sqlalchemy
+
+from app.domain.models import User, Advertisement, UserColumns, AdvertisementColumns
+from app.orm.table_mapper import user_table, adv_table
+
+
+@dataclasses.dataclass(frozen=True)
+class Projection:
+    """
+    Read-only projection of a model: the columns selected for a listing and the serializer turning each fetched
+    ``Row`` into the response dict, without building mapped instances.
+
+    ``extra_columns`` are selected after ``columns`` but left out of the response; pagination reads them, e.g. the
+    primary key and the sort key of the last row of a keyset page.
+    """
+    model_class: Type[User | Advertisement]
+    table: sqlalchemy.Table
+    columns: tuple[str, ...]
+    extra_columns: tuple[str, ...] = ()
+    converters: tuple[Optional[Callable[[Any], Any]], ...] = dataclasses.field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "converters", tuple(
+            datetime.isoformat if self.table.c[column].type.python_type is datetime else None
+            for column in self.columns
+        ))
+
+    @property
+    def select_list(self) -> list[sqlalchemy.orm.InstrumentedAttribute]:
+        return [getattr(self.model_class, column) for column in self.columns + self.extra_columns]
+
+    def serialize(self, row: Sequence) -> dict[str, Any]:
+        """
+        Builds the response dict of a row. Extra trailing values, such as a window total, are ignored.
+        """
+        return {
+            column: convert(value) if convert is not None and value is not None else value
+            for column, convert, value in zip(self.columns, self.converters, row)
+        }
+
+
+TABLES: dict[Type[User | Advertisement], sqlalchemy.Table] = {User: user_table, Advertisement: adv_table}
+
+# Same keys as app.domain.services.get_params() returns for mapped instances.
+PROJECTIONS: dict[Type[User | Advertisement], Projection] = {
+    User: Projection(model_class=User, table=TABLES[User], columns=(
+        UserColumns.ID.value, UserColumns.NAME.value, UserColumns.EMAIL.value, UserColumns.CREATION_DATE.value
+    )),
+    Advertisement: Projection(model_class=Advertisement, table=TABLES[Advertisement], columns=(
+        AdvertisementColumns.ID.value, AdvertisementColumns.TITLE.value, AdvertisementColumns.DESCRIPTION.value,
+        AdvertisementColumns.CREATION_DATE.value, AdvertisementColumns.USER_ID.value
+    ))
+}
+
+
+@functools.lru_cache(maxsize=256)
+def get_projection(model_class: Type[User | Advertisement], columns: Optional[tuple[str, ...]] = None,
+                   required_columns: tuple[str, ...] = ()) -> Projection:
+    """
+    Returns the projection of the given columns, or of all the public columns of the model, extended with the
+    columns pagination needs. Projections are cached, so each combination is built once.
+
+    :param model_class: model class
+    :type model_class: Type[User | Advertisement]
+    :param columns: validated column names to serialize
+    :type columns: Optional[tuple[str, ...]]
+    :param required_columns: column names that must be selected even if they are not serialized
+    :type required_columns: tuple[str, ...]
+    :return: projection
+    :rtype: Projection
+    """
+    columns = columns or PROJECTIONS[model_class].columns
+    extra_columns = tuple(column for column in dict.fromkeys(required_columns) if column not in columns)
+    return Projection(model_class=model_class, table=TABLES[model_class], columns=columns,
+                      extra_columns=extra_columns)
@@ -1,19 +1,44 @@
 from datetime import datetime
-from typing import Any, Protocol, Optional
+from typing import Any, Protocol, Optional, Iterator
 
+import sqlalchemy
 from sqlalchemy.exc import IntegrityError
 
 import app.domain.errors
-import app.service_layer.app_manager
 from app.domain.models import User, Advertisement, UserColumns, AdvertisementColumns
 from app.repository import filtering
-from app.repository.filtering import FilterTypes, Comparison
+from app.repository.filtering import FilterTypes, Comparison, IncludeTotal
+from app.orm.table_mapper import user_table
+from app.repository.projection import PROJECTIONS
 
 
 class NotFoundError(Exception):
     pass
 
 
+# SQLSTATE codes of the constraint violations told apart by get_integrity_error().
+UNIQUE_VIOLATION = "23505"
+NOT_NULL_VIOLATION = "23502"
+
+
+def get_integrity_error(error: IntegrityError) -> Exception:
+    """
+    Maps a constraint violation to a domain error: a unique violation means that the row already exists, any
+    other one, e.g. a NOT NULL or a check violation, that the values are invalid.
+    """
+    pgcode = getattr(error.orig, "pgcode", None)
+    if pgcode == UNIQUE_VIOLATION:
+        return app.domain.errors.AlreadyExistsError()
+    diag = getattr(error.orig, "diag", None)
+    if pgcode == NOT_NULL_VIOLATION:
+        return app.domain.errors.ValidationError(
+            {"invalid_params": {getattr(diag, "column_name", None) or "values": "Must not be null."}}
+        )
+    return app.domain.errors.ValidationError(
+        {"invalid_params": {"values": f'Violate the "{getattr(diag, "constraint_name", None)}" constraint.'}}
+    )
+
+
 class RepoProto(Protocol):
     def add(self, instance) -> None:
         pass
@@ -21,6 +46,12 @@ class RepoProto(Protocol):
     def get(self, instance_id: int) -> Any:
         pass
 
+    def create(self, instance) -> Any:
+        pass
+
+    def create_many(self, instances: list, chunk_size: int = 500) -> list:
+        pass
+
     def get_list_or_paginated_data(self,
                                    filter_type: FilterTypes,
                                    comparison: Comparison,
@@ -28,17 +59,58 @@ class RepoProto(Protocol):
                                    column_value: int | str| datetime,
                                    paginate: Optional[bool] = False,
                                    page: Optional[int] = None,
-                                   per_page: Optional[int] = None) -> list | dict:
+                                   per_page: Optional[int] = None,
+                                   cursor: Optional[str] = None,
+                                   include_total: Optional[IncludeTotal] = None,
+                                   rank: Optional[bool] = None,
+                                   filter_expression: Optional[str | dict] = None,
+                                   sort: Optional[str] = None,
+                                   created_from: Optional[str | datetime] = None,
+                                   created_to: Optional[str | datetime] = None,
+                                   fields: Optional[str | list[str]] = None) -> list | dict:
+        pass
+
+    def iter_filtered_data(self,
+                           filter_type: FilterTypes,
+                           comparison: Comparison,
+                           column: UserColumns | AdvertisementColumns,
+                           column_value: int | str | datetime,
+                           filter_expression: Optional[str | dict] = None,
+                           sort: Optional[str] = None,
+                           created_from: Optional[str | datetime] = None,
+                           created_to: Optional[str | datetime] = None,
+                           fields: Optional[str | list[str]] = None,
+                           chunk_size: int = 1000) -> Iterator[dict[str, Any]]:
         pass
 
     def delete(self, instance) -> None:
         pass
 
+    def update(self, instance_id: int, new_attrs: dict[str, Any],
+               owner_id: Optional[int] = None) -> Optional[dict[str, str | int]]:
+        pass
+
+    def delete_by_id(self, instance_id: int, owner_id: Optional[int] = None) -> Optional[dict[str, str | int]]:
+        pass
+
+    def exists(self, instance_id: int) -> bool:
+        pass
+
+    def update_many(self, owner_id: int, new_attrs: dict[str, Any], ids: Optional[list[int]] = None,
+                    filter_expression: Optional[str | dict] = None, after_id: int = 0,
+                    limit: int = 500) -> list[int]:
+        pass
+
+    def delete_many(self, owner_id: int, ids: Optional[list[int]] = None,
+                    filter_expression: Optional[str | dict] = None, after_id: int = 0, limit: int = 500) -> list[int]:
+        pass
+
 
 class Repository:
     def __init__(self, session):
         self.session = session
         self.model_cl = None
+        self.owner_column: Optional[str] = None
 
     def add(self, instance) -> None:
         try:
@@ -49,6 +121,65 @@ class Repository:
     def get(self, instance_id: int) -> Any:
         return self.session.get(self.model_cl, instance_id)
 
+    def create(self, instance) -> Any:
+        """
+        Inserts the instance with one ``INSERT ... RETURNING id, creation_date`` statement and sets the generated
+        values on it. The instance is not added to the session, so reading them after the commit does not expire
+        and reload it.
+
+        :param instance: new instance of the repository's model
+        :type instance: User | Advertisement
+        :return: the instance with "id" and "creation_date" set
+        :rtype: User | Advertisement
+        :raises app.domain.errors.AlreadyExistsError: if the instance violates a unique constraint
+        """
+        values = {
+            column_attr.key: getattr(instance, column_attr.key)
+            for column_attr in sqlalchemy.inspect(self.model_cl).column_attrs
+            if getattr(instance, column_attr.key) is not None
+        }
+        statement = sqlalchemy.insert(self.model_cl).values(**values).returning(
+            self.model_cl.id, self.model_cl.creation_date
+        )
+        try:
+            row = self.session.execute(statement).one()
+        except IntegrityError:
+            raise app.domain.errors.AlreadyExistsError
+        instance.id, instance.creation_date = row.id, row.creation_date
+        return instance
+
+    def create_many(self, instances: list, chunk_size: int = 500) -> list:
+        """
+        Inserts the instances with multi-row ``INSERT ... VALUES (...), (...) RETURNING id, creation_date``
+        statements of at most ``chunk_size`` rows, and sets the generated values on them in the order given.
+        As with ``create()``, the instances are not added to the session.
+
+        :param instances: new instances of the repository's model, all with the same attributes set
+        :type instances: list[User | Advertisement]
+        :param chunk_size: number of rows per statement
+        :type chunk_size: int
+        :return: the instances with "id" and "creation_date" set
+        :rtype: list[User | Advertisement]
+        :raises app.domain.errors.AlreadyExistsError: if an instance violates a unique constraint
+        """
+        if not instances:
+            return instances
+        column_keys = [column_attr.key for column_attr in sqlalchemy.inspect(self.model_cl).column_attrs]
+        values = [
+            {key: getattr(instance, key) for key in column_keys if getattr(instance, key) is not None}
+            for instance in instances
+        ]
+        statement = sqlalchemy.insert(self.model_cl).returning(
+            self.model_cl.id, self.model_cl.creation_date, sort_by_parameter_order=True
+        ).execution_options(insertmanyvalues_page_size=chunk_size)
+        try:
+            rows = self.session.execute(statement, values).all()
+        except IntegrityError:
+            raise app.domain.errors.AlreadyExistsError
+        for instance, row in zip(instances, rows):
+            instance.id, instance.creation_date = row.id, row.creation_date
+        return instances
+
     def get_list_or_paginated_data(self,
                                    filter_type: FilterTypes,
                                    comparison: Comparison,
@@ -56,7 +187,15 @@ class Repository:
                                    column_value: int | str| datetime,
                                    paginate: Optional[bool] = False,
                                    page: Optional[int] = None,
-                                   per_page: Optional[int] = None) -> list | dict:
+                                   per_page: Optional[int] = None,
+                                   cursor: Optional[str] = None,
+                                   include_total: Optional[IncludeTotal] = None,
+                                   rank: Optional[bool] = None,
+                                   filter_expression: Optional[str | dict] = None,
+                                   sort: Optional[str] = None,
+                                   created_from: Optional[str | datetime] = None,
+                                   created_to: Optional[str | datetime] = None,
+                                   fields: Optional[str | list[str]] = None) -> list | dict:
         return filtering.get_list_or_paginated_data(
             session=self.session,
             model_class=self.model_cl,
@@ -66,20 +205,266 @@ class Repository:
             column_value=column_value,
             paginate=paginate,
             page=page,
-            per_page=per_page
+            per_page=per_page,
+            cursor=cursor,
+            include_total=include_total,
+            rank=rank,
+            filter_expression=filter_expression,
+            sort=sort,
+            created_from=created_from,
+            created_to=created_to,
+            fields=fields
+        )
+
+    def iter_filtered_data(self,
+                           filter_type: FilterTypes,
+                           comparison: Comparison,
+                           column: UserColumns | AdvertisementColumns,
+                           column_value: int | str | datetime,
+                           filter_expression: Optional[str | dict] = None,
+                           sort: Optional[str] = None,
+                           created_from: Optional[str | datetime] = None,
+                           created_to: Optional[str | datetime] = None,
+                           fields: Optional[str | list[str]] = None,
+                           chunk_size: int = 1000) -> Iterator[dict[str, Any]]:
+        """
+        Streams the serialized rows matching the filters through a server-side cursor, ``chunk_size`` rows per
+        fetch. The iterator must be consumed, or closed, while the session is open.
+        """
+        return filtering.iter_filtered_data(
+            session=self.session,
+            model_class=self.model_cl,
+            filter_type=filter_type,
+            comparison=comparison,
+            column=column,
+            column_value=column_value,
+            filter_expression=filter_expression,
+            sort=sort,
+            created_from=created_from,
+            created_to=created_to,
+            fields=fields,
+            chunk_size=chunk_size
         )
 
     def delete(self, instance) -> None:
         self.session.delete(instance)
 
+    def _get_where_clause(self, instance_id: int, owner_id: Optional[int] = None) -> list:
+        clauses = [self.model_cl.id == instance_id]
+        if owner_id is not None and self.owner_column is not None:
+            clauses.append(getattr(self.model_cl, self.owner_column) == owner_id)
+        return clauses
+
+    def update(self, instance_id: int, new_attrs: dict[str, Any],
+               owner_id: Optional[int] = None) -> Optional[dict[str, str | int]]:
+        """
+        Updates the row in one ``UPDATE ... WHERE ... RETURNING`` statement, bypassing the ORM unit of work.
+        Passing ``owner_id`` puts the ownership check into the WHERE clause.
+
+        :param instance_id: primary key of the row
+        :type instance_id: int
+        :param new_attrs: new values of the columns
+        :type new_attrs: dict[str, Any]
+        :param owner_id: id of the user who must own the row
+        :type owner_id: Optional[int]
+        :return: params of the updated row, or ``None`` if no row matched
+        :rtype: Optional[dict[str, str | int]]
+        :raises app.domain.errors.AlreadyExistsError: if the new values violate a unique constraint
+        :raises app.domain.errors.ValidationError: if the new values violate any other constraint
+        """
+        projection = PROJECTIONS[self.model_cl]
+        where_clause = self._get_where_clause(instance_id=instance_id, owner_id=owner_id)
+        if new_attrs:
+            statement = sqlalchemy.update(self.model_cl).where(*where_clause).values(**new_attrs) \
+                .returning(*projection.select_list).execution_options(synchronize_session=False)
+        else:
+            statement = sqlalchemy.select(*projection.select_list).where(*where_clause)
+        try:
+            row = self.session.execute(statement).first()
+        except IntegrityError as e:
+            raise get_integrity_error(error=e)
+        return projection.serialize(row) if row else None
+
+    def delete_by_id(self, instance_id: int, owner_id: Optional[int] = None) -> Optional[dict[str, str | int]]:
+        """
+        Deletes the row in one ``DELETE ... WHERE ... RETURNING`` statement, bypassing the ORM unit of work.
+        Passing ``owner_id`` puts the ownership check into the WHERE clause.
+
+        :param instance_id: primary key of the row
+        :type instance_id: int
+        :param owner_id: id of the user who must own the row
+        :type owner_id: Optional[int]
+        :return: params of the deleted row, or ``None`` if no row matched
+        :rtype: Optional[dict[str, str | int]]
+        """
+        projection = PROJECTIONS[self.model_cl]
+        statement = sqlalchemy.delete(self.model_cl) \
+            .where(*self._get_where_clause(instance_id=instance_id, owner_id=owner_id)) \
+            .returning(*projection.select_list).execution_options(synchronize_session=False)
+        row = self.session.execute(statement).first()
+        return projection.serialize(row) if row else None
+
+    def _get_chunk(self, owner_id: int, ids: Optional[list[int]], filter_expression: Optional[str | dict],
+                   after_id: int, limit: int) -> sqlalchemy.ScalarSelect:
+        """
+        Selects and locks the ids of the next ``limit`` rows of the owner, after ``after_id``, that are in ``ids``
+        or match the filter expression.
+        """
+        clauses = [getattr(self.model_cl, self.owner_column) == owner_id, self.model_cl.id > after_id]
+        if ids is not None:
+            clauses.append(self.model_cl.id.in_(ids))
+        if filter_expression is not None:
+            clauses.append(filtering.Filter(session=self.session).get_filter_condition(
+                model_class=self.model_cl, filter_expression=filter_expression
+            ))
+        return sqlalchemy.select(self.model_cl.id).where(*clauses).order_by(self.model_cl.id).limit(limit) \
+            .with_for_update().scalar_subquery()
+
+    def update_many(self, owner_id: int, new_attrs: dict[str, Any], ids: Optional[list[int]] = None,
+                    filter_expression: Optional[str | dict] = None, after_id: int = 0,
+                    limit: int = 500) -> list[int]:
+        """
+        Updates one chunk of the owner's rows, selected by ids or by a filter expression, in one set-based
+        ``UPDATE ... WHERE id IN (SELECT ... LIMIT ... FOR UPDATE) RETURNING id`` statement. Callers walk the
+        chunks by passing the last returned id as ``after_id``, committing in between, so locks are held briefly.
+
+        :param owner_id: id of the user who must own the rows
+        :type owner_id: int
+        :param new_attrs: new values of the columns
+        :type new_attrs: dict[str, Any]
+        :param ids: ids of the rows
+        :type ids: Optional[list[int]]
+        :param filter_expression: filter expression, as accepted by ``get_list_or_paginated_data()``
+        :type filter_expression: Optional[str | dict]
+        :param after_id: only rows with a greater id are updated
+        :type after_id: int
+        :param limit: chunk size
+        :type limit: int
+        :return: ascending ids of the updated rows
+        :rtype: list[int]
+        :raises app.domain.errors.AlreadyExistsError: if the new values violate a unique constraint
+        :raises app.domain.errors.ValidationError: if the new values violate any other constraint
+        """
+        chunk = self._get_chunk(owner_id=owner_id, ids=ids, filter_expression=filter_expression, after_id=after_id,
+                                limit=limit)
+        try:
+            return sorted(self.session.scalars(
+                sqlalchemy.update(self.model_cl).where(self.model_cl.id.in_(chunk)).values(**new_attrs)
+                .returning(self.model_cl.id).execution_options(synchronize_session=False)
+            ))
+        except IntegrityError as e:
+            raise get_integrity_error(error=e)
+
+    def delete_many(self, owner_id: int, ids: Optional[list[int]] = None,
+                    filter_expression: Optional[str | dict] = None, after_id: int = 0, limit: int = 500) -> list[int]:
+        """
+        Deletes one chunk of the owner's rows, like ``update_many()`` updates them.
+
+        :return: ascending ids of the deleted rows
+        :rtype: list[int]
+        """
+        chunk = self._get_chunk(owner_id=owner_id, ids=ids, filter_expression=filter_expression, after_id=after_id,
+                                limit=limit)
+        return sorted(self.session.scalars(
+            sqlalchemy.delete(self.model_cl).where(self.model_cl.id.in_(chunk)).returning(self.model_cl.id)
+            .execution_options(synchronize_session=False)
+        ))
+
+    def exists(self, instance_id: int) -> bool:
+        """
+        Tells whether the row exists. Used after a write matched no row, to tell "not found" from "not yours".
+        """
+        return self.session.execute(
+            sqlalchemy.select(sqlalchemy.literal(1)).where(*self._get_where_clause(instance_id=instance_id))
+        ).first() is not None
+
 
 class UserRepository(Repository):
+    """
+    Soft-deleted users, whose "deleted_at" is set, are invisible to every method except the purge ones.
+    """
     def __init__(self, session):
         super().__init__(session=session)
         self.model_cl = User
 
+    def get(self, instance_id: int) -> Any:
+        return self.session.scalars(
+            sqlalchemy.select(User).where(*self._get_where_clause(instance_id=instance_id))
+        ).first()
+
+    def _get_where_clause(self, instance_id: int, owner_id: Optional[int] = None) -> list:
+        return super()._get_where_clause(instance_id=instance_id, owner_id=owner_id) + [
+            user_table.c.deleted_at.is_(None)
+        ]
+
+    def soft_delete_by_id(self, instance_id: int) -> Optional[dict[str, str | int]]:
+        """
+        Marks the user as deleted in one ``UPDATE ... RETURNING`` statement. The advertisements are left for
+        ``purge_deleted()``, so the request does not wait for them.
+
+        :param instance_id: primary key of the user
+        :type instance_id: int
+        :return: params of the deleted user, or ``None`` if no user matched
+        :rtype: Optional[dict[str, str | int]]
+        """
+        projection = PROJECTIONS[User]
+        row = self.session.execute(
+            sqlalchemy.update(User).where(*self._get_where_clause(instance_id=instance_id))
+            .values({user_table.c.deleted_at: sqlalchemy.func.now()})
+            .returning(*projection.select_list).execution_options(synchronize_session=False)
+        ).first()
+        return projection.serialize(row) if row else None
+
+    def get_deleted_ids(self, limit: int) -> list[int]:
+        """
+        Returns the ids of the soft-deleted users, oldest deletions first.
+        """
+        return list(self.session.scalars(
+            sqlalchemy.select(user_table.c.id).where(user_table.c.deleted_at.is_not(None))
+            .order_by(user_table.c.deleted_at).limit(limit)
+        ))
+
+    def purge_deleted(self, instance_id: int) -> bool:
+        """
+        Deletes the row of a soft-deleted user. The remaining advertisements go with it by ``ON DELETE CASCADE``.
+        """
+        return self.session.execute(
+            sqlalchemy.delete(user_table).where(user_table.c.id == instance_id, user_table.c.deleted_at.is_not(None))
+        ).rowcount > 0
+
 
 class AdvRepository(Repository):
+    """
+    Advertisements of soft-deleted users are invisible to every method, like their owners, until the purge
+    deletes them.
+    """
     def __init__(self, session):
         super().__init__(session=session)
         self.model_cl = Advertisement
+        self.owner_column = AdvertisementColumns.USER_ID.value
+
+    def get(self, instance_id: int) -> Any:
+        return self.session.scalars(
+            sqlalchemy.select(Advertisement).where(*self._get_where_clause(instance_id=instance_id))
+        ).first()
+
+    def _get_where_clause(self, instance_id: int, owner_id: Optional[int] = None) -> list:
+        return super()._get_where_clause(instance_id=instance_id, owner_id=owner_id) + [
+            *filtering.VISIBILITY_CONDITIONS[Advertisement]
+        ]
+
+    def delete_by_user_id(self, user_id: int, limit: Optional[int] = None) -> int:
+        """
+        Deletes the advertisements of the user with one set-based ``DELETE`` and returns their number. With
+        ``limit``, deletes at most that many, skipping rows locked by a concurrent purge, so that a purge batch
+        holds few locks for a short time.
+        """
+        condition = Advertisement.user_id == user_id
+        if limit is not None:
+            condition = Advertisement.id.in_(
+                sqlalchemy.select(Advertisement.id).where(condition).limit(limit).with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+        return self.session.execute(
+            sqlalchemy.delete(Advertisement).where(condition).execution_options(synchronize_session=False)
+        ).rowcount
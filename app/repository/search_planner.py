@@ -0,0 +1,162 @@
+import dataclasses
+import enum
+import logging
+import math
+import re
+import threading
+import time
+from typing import Any, Type
+
+import sqlalchemy
+
+from app.domain.models import User, Advertisement, UserColumns
+
+
+logger = logging.getLogger(__name__)
+
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+STATS_TTL: float = 300.0
+
+# Cost model constants, in abstract units of "rows touched". GIN lookups are charged per posting list read
+# (one per trigram or per word), heap rechecks per estimated matching row. Tune them from the logged plans.
+MIN_TRIGRAM_TERM_LENGTH = 3
+SEQ_ROW_COST = 1.0
+INDEX_ROW_COST = 0.2
+GIN_LOOKUP_COST = 50.0
+TRIGRAM_SELECTIVITY_PER_CHAR = 0.3
+FULL_TEXT_SELECTIVITY_PER_WORD = 0.05
+
+
+class SearchStrategy(str, enum.Enum):
+    EQUALITY = "equality"
+    PREFIX = "prefix"
+    TRIGRAM = "trigram"
+    FULL_TEXT = "full_text"
+
+
+@dataclasses.dataclass(frozen=True)
+class ColumnStats:
+    rows: float
+    distinct: float
+
+
+@dataclasses.dataclass(frozen=True)
+class SearchPlan:
+    strategy: SearchStrategy
+    estimated_cost: float
+    estimated_rows: float
+    reason: str
+
+
+# Keyed by the bind as well, like the count cache: every shard has its own statistics.
+_stats_cache: dict[tuple[Any, str, str], tuple[float, ColumnStats]] = {}
+_stats_lock = threading.Lock()
+
+
+def get_column_stats(session: sqlalchemy.orm.Session, table_name: str, column: str) -> ColumnStats:
+    """
+    Returns the planner statistics of a column (``pg_class.reltuples`` and ``pg_stats.n_distinct``) in the database
+    the session is bound to, cached for ``STATS_TTL`` seconds.
+
+    :param session: SQLAlchemy session
+    :type session: sqlalchemy.orm.Session
+    :param table_name: name of the table
+    :type table_name: str
+    :param column: name of the column
+    :type column: str
+    :return: column statistics
+    :rtype: ColumnStats
+    """
+    key = (session.get_bind(), table_name, column)
+    with _stats_lock:
+        cached = _stats_cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    row = session.execute(
+        sqlalchemy.text(
+            "SELECT c.reltuples, s.n_distinct FROM pg_class c "
+            "LEFT JOIN pg_stats s ON s.tablename = c.relname AND s.attname = :column "
+            "WHERE c.relname = :table_name AND c.relkind = 'r'"
+        ),
+        {"table_name": table_name, "column": column}
+    ).first()
+    rows = max(float(row.reltuples), 1.0) if row and row.reltuples is not None else 1.0
+    n_distinct = float(row.n_distinct) if row and row.n_distinct is not None else 0.0
+    distinct = rows * -n_distinct if n_distinct < 0 else n_distinct or rows
+    stats = ColumnStats(rows=rows, distinct=max(distinct, 1.0))
+    with _stats_lock:
+        _stats_cache[key] = (time.monotonic() + STATS_TTL, stats)
+    return stats
+
+
+def clear_stats_cache() -> None:
+    with _stats_lock:
+        _stats_cache.clear()
+
+
+def _estimate(strategy: SearchStrategy, term: str, stats: ColumnStats) -> tuple[float, float]:
+    match strategy:
+        case SearchStrategy.EQUALITY:
+            rows = stats.rows / stats.distinct
+            return math.log2(stats.rows + 1) + rows * INDEX_ROW_COST, rows
+        case SearchStrategy.PREFIX:
+            return stats.rows * SEQ_ROW_COST, stats.rows
+        case SearchStrategy.TRIGRAM:
+            trigrams = len(term) - MIN_TRIGRAM_TERM_LENGTH + 1
+            rows = stats.rows * TRIGRAM_SELECTIVITY_PER_CHAR ** trigrams
+            return GIN_LOOKUP_COST * trigrams + rows * SEQ_ROW_COST, rows
+        case SearchStrategy.FULL_TEXT:
+            words = len(term.split())
+            rows = stats.rows * FULL_TEXT_SELECTIVITY_PER_WORD ** words
+            return GIN_LOOKUP_COST * words + rows * INDEX_ROW_COST, rows
+
+
+def plan_search(
+        session: sqlalchemy.orm.Session, model_class: Type[User | Advertisement], column: str, term: str
+) -> SearchPlan:
+    """
+    Chooses the search backend for a text term. Candidates are picked by the term and the column, and the cheapest
+    of them by the cost model above, fed with cached column statistics:
+
+    - exact-looking e-mail addresses searched in ``user.email`` are matched as the whole value;
+    - terms shorter than ``MIN_TRIGRAM_TERM_LENGTH`` produce no trigrams, so they are matched as prefixes;
+    - other terms use the trigram indexes, or full-text search for multi-word terms in advertisements.
+
+    Only the trigram strategy keeps the substring semantics of "search_text"; see
+    ``Filter._build_planned_condition()`` for the rows each strategy matches.
+
+    The plan is logged, so the policy can be tuned from production data.
+
+    :param session: SQLAlchemy session
+    :type session: sqlalchemy.orm.Session
+    :param model_class: model class to search
+    :type model_class: Type[User | Advertisement]
+    :param column: text column to search in
+    :type column: str
+    :param term: search term
+    :type term: str
+    :return: chosen strategy with its estimated cost
+    :rtype: SearchPlan
+    """
+    term = term.strip()
+    if model_class is User and column == UserColumns.EMAIL and EMAIL_PATTERN.match(term):
+        candidates, reason = [SearchStrategy.EQUALITY], "exact-looking e-mail"
+    elif len(term) < MIN_TRIGRAM_TERM_LENGTH:
+        candidates, reason = [SearchStrategy.PREFIX], "term too short for trigrams"
+    elif model_class is Advertisement and len(term.split()) > 1:
+        candidates, reason = [SearchStrategy.TRIGRAM, SearchStrategy.FULL_TEXT], "multi-word term"
+    else:
+        candidates, reason = [SearchStrategy.TRIGRAM], "single-word term"
+    stats = get_column_stats(session=session, table_name=sqlalchemy.inspect(model_class).local_table.name,
+                             column=column)
+    plans = []
+    for strategy in candidates:
+        cost, rows = _estimate(strategy=strategy, term=term, stats=stats)
+        plans.append(SearchPlan(strategy=strategy, estimated_cost=cost, estimated_rows=rows, reason=reason))
+    plan = min(plans, key=lambda candidate: candidate.estimated_cost)
+    logger.info(
+        "search plan: model=%s column=%s term_length=%s strategy=%s estimated_cost=%.1f estimated_rows=%.1f "
+        "reason=%s", model_class.__name__, column, len(term), plan.strategy.value, plan.estimated_cost,
+        plan.estimated_rows, plan.reason
+    )
+    return plan
@@ -0,0 +1,131 @@
+import concurrent.futures
+import heapq
+import itertools
+from datetime import datetime
+from typing import Any, Iterator, Optional, Sequence
+
+import sqlalchemy
+
+from app.repository.filtering import Sort, DEFAULT_SORT, encode_cursor
+
+
+class ShardedRepository:
+    """
+    Runs the reads of a repository on all the shards in parallel and merges their results, for queries that are not
+    scoped to one user. Every shard returns its own first rows in the requested order; the merge keeps the first
+    rows overall:
+
+    - keyset pages: each shard returns one page after the cursor, and the next cursor is built from the last row
+      of the merged page;
+    - offset pages: each shard returns the rows of all the pages up to the requested one, so deep offset pages
+      cost more on every shard; prefer cursors. Totals are summed.
+
+    Results are ordered by the sort key and id; relevance ranking is not comparable across shards and is replaced by
+    the id order. Text sort keys are merged in code point order, matching the per-shard order with the "C"
+    collation only.
+    """
+
+    def __init__(self, repositories: Sequence, executor: concurrent.futures.Executor):
+        self.repositories = list(repositories)
+        self.model_cl = self.repositories[0].model_cl
+        self.executor = executor
+
+    def _fan_out(self, method: str, **kwargs) -> list:
+        futures = [self.executor.submit(getattr(repository, method), **kwargs) for repository in self.repositories]
+        return [future.result() for future in futures]
+
+    def get(self, instance_id: int) -> Any:
+        return next((instance for instance in self._fan_out("get", instance_id=instance_id) if instance), None)
+
+    def exists(self, instance_id: int) -> bool:
+        return any(self._fan_out("exists", instance_id=instance_id))
+
+    def get_list_or_paginated_data(self, paginate: Optional[bool] = False, page: Any = None, per_page: Any = None,
+                                   cursor: Optional[str] = None, include_total: Any = None,
+                                   rank: Optional[bool] = None, sort: Optional[str] = None,
+                                   fields: Optional[str | list[str]] = None, **kwargs) -> list | dict:
+        if not paginate:
+            return list(itertools.chain.from_iterable(
+                self._fan_out("get_list_or_paginated_data", sort=sort, fields=fields, **kwargs)
+            ))
+        sort = sort or str(DEFAULT_SORT)
+        requested_fields = self._split_fields(fields=fields)
+        shard_fields = None
+        if requested_fields is not None:
+            shard_fields = list(dict.fromkeys(requested_fields + [DEFAULT_SORT.column, sort.lstrip("-")]))
+        per_page = int(per_page) if str(per_page).isdigit() and int(per_page) > 0 else 10
+        page = int(page) if str(page).isdigit() and int(page) > 0 else 1
+        results = self._fan_out(
+            "get_list_or_paginated_data", paginate=True, page=1,
+            per_page=per_page if cursor is not None else page * per_page, cursor=cursor,
+            include_total=include_total, rank=rank, sort=sort, fields=shard_fields, **kwargs
+        )
+        sort = Sort(column=sort.lstrip("-"), descending=sort.startswith("-"))
+        items = list(heapq.merge(*(result["items"] for result in results), reverse=sort.descending,
+                                 key=lambda item: (self._get_sort_key(item=item, sort=sort), item["id"])))
+        if cursor is not None:
+            page_items = items[:per_page]
+            has_next = len(items) > per_page or any(result["next_cursor"] for result in results)
+            paginated_data = {"per_page": per_page, "next_cursor": self._get_next_cursor(
+                last_item=page_items[-1], sort=sort
+            ) if has_next and page_items else None}
+        else:
+            page_items = items[(page - 1) * per_page:page * per_page]
+            paginated_data = {"page": page, "per_page": per_page}
+            if all("has_next" in result for result in results):
+                paginated_data["has_next"] = len(items) > page * per_page or any(
+                    result["has_next"] for result in results
+                )
+            if all("total" in result for result in results):
+                paginated_data["total"] = sum(result["total"] for result in results)
+                paginated_data["total_pages"] = (paginated_data["total"] + per_page - 1) // per_page
+        if requested_fields is not None:
+            page_items = [{field: item[field] for field in requested_fields} for item in page_items]
+        paginated_data["items"] = page_items
+        return paginated_data
+
+    def iter_filtered_data(self, sort: Optional[str] = None, fields: Optional[str | list[str]] = None,
+                           **kwargs) -> Iterator[dict[str, Any]]:
+        """
+        Merges the ordered streams of all the shards. Each shard holds one server-side cursor open and is read one
+        chunk at a time as the merge reaches it.
+        """
+        sort = sort or str(DEFAULT_SORT)
+        requested_fields = self._split_fields(fields=fields)
+        shard_fields = None
+        if requested_fields is not None:
+            shard_fields = list(dict.fromkeys(requested_fields + [DEFAULT_SORT.column, sort.lstrip("-")]))
+        streams = [repository.iter_filtered_data(sort=sort, fields=shard_fields, **kwargs)
+                   for repository in self.repositories]
+        sort = Sort(column=sort.lstrip("-"), descending=sort.startswith("-"))
+        try:
+            for item in heapq.merge(*streams, reverse=sort.descending,
+                                    key=lambda item: (self._get_sort_key(item=item, sort=sort), item["id"])):
+                yield item if requested_fields is None else {field: item[field] for field in requested_fields}
+        finally:
+            for stream in streams:
+                stream.close()
+
+    @staticmethod
+    def _split_fields(fields: Optional[str | list[str]]) -> Optional[list[str]]:
+        if fields is None or fields == "" or fields == []:
+            return None
+        if isinstance(fields, str):
+            fields = fields.split(",")
+        return [field.strip() for field in fields]
+
+    def _get_sort_key(self, item: dict, sort: Sort) -> Any:
+        value = item[sort.column]
+        if isinstance(value, str) and sqlalchemy.inspect(self.model_cl).columns[sort.column].type.python_type is \
+                datetime:
+            return datetime.fromisoformat(value)
+        return value
+
+    @staticmethod
+    def _get_next_cursor(last_item: dict, sort: Sort) -> str:
+        payload = {"id": last_item["id"]}
+        if sort != DEFAULT_SORT:
+            payload["sort"] = str(sort)
+        if sort.column != DEFAULT_SORT.column:
+            payload["key"] = last_item[sort.column]
+        return encode_cursor(payload=payload)
@@ -1,18 +1,20 @@
 from datetime import datetime
-from typing import Callable, Optional
+from typing import Any, Callable, Iterator, Optional
 import logging
 
 from app.domain import errors, services, models
 from app.repository.filtering import FilterTypes, UserColumns, AdvertisementColumns, Comparison
+from app.service_layer.unit_of_work import UnitOfWork, ReadOnlyUnitOfWork, BatchUnitOfWork, uses_unit_of_work
 
 
 logging.basicConfig()
 logging.getLogger('sqlalchemy.engine').setLevel(logging.INFO)
 
 
+@uses_unit_of_work(ReadOnlyUnitOfWork)
 def get_user_data(user_id: int, check_current_user_func: Callable, uow):
     current_user_id: int = check_current_user_func(user_id=user_id, get_cuid=True)
-    with uow:
+    with uow.use_user_shard(user_id=current_user_id):
         user = uow.users.get(current_user_id)
     user_params: dict[str, str | int] = services.get_params(model=user)
     if user_params:
@@ -20,87 +22,234 @@ def get_user_data(user_id: int, check_current_user_func: Callable, uow):
     raise errors.NotFoundError(message_prefix="The user")
 
 
+@uses_unit_of_work(UnitOfWork)
 def create_user(user_data: dict[str, str], validate_func: Callable, hash_pass_func: Callable, uow):
     validated_data = validate_func(**user_data)
     validated_data["password"] = hash_pass_func(password=validated_data["password"])
     user = services.create_user(**validated_data)
-    with uow:
-        uow.users.add(user)
+    with uow.use_new_user_shard(email=user.email):
+        user_id: int = uow.users.create(user).id
         uow.commit()
-        user_id: int = user.id
         return user_id
 
 
+@uses_unit_of_work(UnitOfWork)
 def update_user(user_id: int, check_current_user_func: Callable, validate_func: Callable,
                 hash_pass_func: Callable, new_data: dict[str, str], uow) -> dict:
     curent_user_id: int = check_current_user_func(user_id=user_id)
     validated_data: dict[str, str] = validate_func(**new_data)
     if validated_data.get("password"):
         validated_data["password"] = hash_pass_func(password=validated_data["password"])
-    with uow:
-        current_user: models.User = uow.users.get(instance_id=curent_user_id)
-        updated_user = services.update_instance(instance=current_user, new_attrs=validated_data)
-        uow.users.add(updated_user)
+    with uow.use_user_shard(user_id=curent_user_id):
+        updated_user_params = uow.users.update(instance_id=curent_user_id, new_attrs=validated_data)
+        if not updated_user_params:
+            raise errors.NotFoundError(message_prefix="The user")
         uow.commit()
-        updated_user_params = services.get_params(model=updated_user)
         return updated_user_params
 
 
+@uses_unit_of_work(ReadOnlyUnitOfWork)
 def get_related_advs(
         authenticated_user_id: int, check_current_user_func: Callable, uow, page: Optional[int] = None,
-        per_page: Optional[int] = None
+        per_page: Optional[int] = None, cursor: Optional[str] = None, include_total: Optional[str] = None,
+        sort: Optional[str] = None, created_from: Optional[str] = None, created_to: Optional[str] = None,
+        fields: Optional[str] = None
 ) -> dict[str, int | list[dict[str, str | int]]]:
 
     current_user_id = check_current_user_func(user_id=authenticated_user_id)
-    with uow:
+    with uow.use_user_shard(user_id=current_user_id):
         paginated_data = uow.advs.get_list_or_paginated_data(
             filter_type=FilterTypes.COLUMN_VALUE, comparison=Comparison.IS, column=AdvertisementColumns.USER_ID,
-            column_value=current_user_id, paginate=True, page=page, per_page=per_page
+            column_value=current_user_id, paginate=True, page=page, per_page=per_page, cursor=cursor,
+            include_total=include_total, sort=sort, created_from=created_from, created_to=created_to, fields=fields
         )
     if paginated_data["items"]:
         return paginated_data
     raise errors.NotFoundError(base_message="The related advertisements are not found.")
 
 
-def delete_user(user_id: int, check_current_user_func: Callable, uow) -> dict[str, str | int]:
+@uses_unit_of_work(UnitOfWork)
+def delete_user(user_id: int, check_current_user_func: Callable, uow, soft: bool = False) -> dict[str, str | int]:
+    """
+    Deletes the user. The advertisements are deleted by the database (``ON DELETE CASCADE``), or, with ``soft``,
+    the user is only marked as deleted and ``purge_deleted_users()`` deletes them later in batches.
+    """
     current_user_id: int = check_current_user_func(user_id=user_id)
-    with uow:
-        user_to_delete: models.User = uow.users.get(current_user_id)
-        if not user_to_delete:
-            raise errors.NotFoundError
-        deleted_user_params: dict[str, str | int] = services.get_params(model=user_to_delete)
-        uow.users.delete(user_to_delete)
+    with uow.use_user_shard(user_id=current_user_id):
+        if soft:
+            deleted_user_params: Optional[dict[str, str | int]] = uow.users.soft_delete_by_id(
+                instance_id=current_user_id
+            )
+        else:
+            deleted_user_params = uow.users.delete_by_id(instance_id=current_user_id)
+        if not deleted_user_params:
+            raise errors.NotFoundError(message_prefix="The user")
         uow.commit()
     return deleted_user_params
 
 
+@uses_unit_of_work(UnitOfWork)
+def purge_deleted_users(uow, batch_size: int = 500, max_users: int = 100) -> int:
+    """
+    Deletes the advertisements of soft-deleted users, at most ``batch_size`` per transaction, then the users
+    themselves. Each batch is committed on its own, so no transaction holds many row locks or runs for long.
+
+    :param uow: unit of work routed to the shard to purge; it is entered once per batch
+    :param batch_size: number of advertisements deleted per transaction
+    :type batch_size: int
+    :param max_users: number of soft-deleted users handled per call
+    :type max_users: int
+    :return: number of purged users
+    :rtype: int
+    """
+    with uow:
+        user_ids: list[int] = uow.users.get_deleted_ids(limit=max_users)
+    purged = 0
+    for user_id in user_ids:
+        deleted_advs = batch_size
+        while deleted_advs == batch_size:
+            with uow:
+                deleted_advs = uow.advs.delete_by_user_id(user_id=user_id, limit=batch_size)
+                if deleted_advs < batch_size:
+                    purged += uow.users.purge_deleted(instance_id=user_id)
+                uow.commit()
+    return purged
+
+
+@uses_unit_of_work(UnitOfWork)
 def create_adv(get_auth_user_id_func: Callable, validate_func: Callable, adv_params: dict[str, str | int], uow) -> int:
     authenticated_user_id: int = get_auth_user_id_func()
     validated_data = validate_func(**adv_params)
     validated_data |= {"user_id": authenticated_user_id}
     adv = services.create_adv(**validated_data)
-    with uow:
-        uow.advs.add(adv)
+    with uow.use_user_shard(user_id=authenticated_user_id):
+        adv_id: int = uow.advs.create(adv).id
+        uow.commit()
+        return adv_id
+
+
+@uses_unit_of_work(UnitOfWork)
+def create_advs(
+        get_auth_user_id_func: Callable, validate_func: Callable, advs_params: list[dict[str, str]], uow,
+        skip_invalid: bool = False
+) -> dict[str, list[dict]]:
+    """
+    Creates the advertisements of the authenticated user in one transaction, with multi-row inserts.
+
+    :param get_auth_user_id_func: returns the id of the authenticated user
+    :type get_auth_user_id_func: Callable
+    :param validate_func: validates the whole list, returning the valid items with their indexes and the errors
+    :type validate_func: Callable
+    :param advs_params: params of the advertisements
+    :type advs_params: list[dict[str, str]]
+    :param uow: unit of work
+    :param skip_invalid: create the valid advertisements and report the invalid ones, instead of failing
+    :type skip_invalid: bool
+    :return: "created" items with the index in the list and the new id, and "errors" items with the index and
+        the validation errors
+    :rtype: dict[str, list[dict]]
+    :raises app.domain.errors.ValidationError: if any item is invalid and ``skip_invalid`` is false, or none is
+        valid
+    """
+    authenticated_user_id: int = get_auth_user_id_func()
+    valid_items, item_errors = validate_func(advs_params=advs_params, skip_invalid=skip_invalid)
+    if not valid_items:
+        raise errors.ValidationError(item_errors)
+    advs = [services.create_adv(**validated_data, user_id=authenticated_user_id) for _, validated_data in valid_items]
+    with uow.use_user_shard(user_id=authenticated_user_id):
+        uow.advs.create_many(advs)
         uow.commit()
-        return adv.id
+    return {"created": [{"index": index, "id": adv.id} for (index, _), adv in zip(valid_items, advs)],
+            "errors": item_errors}
+
+
+def _apply_in_chunks(uow, user_id: int, write_chunk: Callable[..., list[int]], chunk_size: int) -> list[int]:
+    """
+    Calls ``write_chunk(after_id=..., limit=...)`` in a new transaction per chunk until a chunk comes back short.
+    Chunks already committed stay applied if a later one fails.
+    """
+    affected_ids, after_id = [], 0
+    while True:
+        with uow.use_user_shard(user_id=user_id):
+            chunk_ids: list[int] = write_chunk(after_id=after_id, limit=chunk_size)
+            uow.commit()
+        affected_ids.extend(chunk_ids)
+        if len(chunk_ids) < chunk_size:
+            return affected_ids
+        after_id = chunk_ids[-1]
+
+
+@uses_unit_of_work(UnitOfWork)
+def update_advs(get_auth_user_id_func: Callable, validate_selection_func: Callable, validate_func: Callable,
+                params: dict, uow, chunk_size: int = 500) -> list[int]:
+    """
+    Updates the authenticated user's advertisements selected by "ids" or by a "filter" expression with the
+    values of "set", in set-based statements of at most ``chunk_size`` rows, each committed on its own.
+
+    :return: ids of the updated advertisements
+    :rtype: list[int]
+    """
+    authenticated_user_id: int = get_auth_user_id_func()
+    if not isinstance(params, dict):
+        raise errors.ValidationError({"invalid_params": {"body": "Must be a JSON object."}})
+    selection: dict = validate_selection_func(**{key: value for key, value in params.items() if key != "set"})
+    new_values = params.get("set") or {}
+    if not isinstance(new_values, dict):
+        raise errors.ValidationError({"invalid_params": {"set": "Must be a JSON object."}})
+    new_attrs: dict[str, str] = validate_func(**new_values)
+    if not new_attrs:
+        raise errors.ValidationError({"invalid_params": {"set": "Must contain the values to update."}})
+    return _apply_in_chunks(
+        uow=uow, user_id=authenticated_user_id, chunk_size=chunk_size,
+        write_chunk=lambda after_id, limit: uow.advs.update_many(
+            owner_id=authenticated_user_id, new_attrs=new_attrs, ids=selection.get("ids"),
+            filter_expression=selection.get("filter"), after_id=after_id, limit=limit
+        )
+    )
+
+
+@uses_unit_of_work(UnitOfWork)
+def delete_advs(get_auth_user_id_func: Callable, validate_selection_func: Callable, params: dict, uow,
+                chunk_size: int = 500) -> list[int]:
+    """
+    Deletes the authenticated user's advertisements selected by "ids" or by a "filter" expression, in set-based
+    statements of at most ``chunk_size`` rows, each committed on its own.
+
+    :return: ids of the deleted advertisements
+    :rtype: list[int]
+    """
+    authenticated_user_id: int = get_auth_user_id_func()
+    if not isinstance(params, dict):
+        raise errors.ValidationError({"invalid_params": {"body": "Must be a JSON object."}})
+    selection: dict = validate_selection_func(**params)
+    return _apply_in_chunks(
+        uow=uow, user_id=authenticated_user_id, chunk_size=chunk_size,
+        write_chunk=lambda after_id, limit: uow.advs.delete_many(
+            owner_id=authenticated_user_id, ids=selection.get("ids"), filter_expression=selection.get("filter"),
+            after_id=after_id, limit=limit
+        )
+    )
 
 
+@uses_unit_of_work(UnitOfWork)
 def update_adv(
-        adv_id: int, new_params: dict, check_current_user_func: Callable, validate_func: Callable, uow
+        adv_id: int, new_params: dict, get_auth_user_id_func: Callable, validate_func: Callable, uow
 ) -> dict[str, str | int]:
-    with uow:
-        adv: models.Advertisement = uow.advs.get(instance_id=adv_id)
-        if not adv:
+    authenticated_user_id: int = get_auth_user_id_func()
+    validated_data: dict[str, str] = validate_func(**new_params)
+    with uow.use_user_shard(user_id=authenticated_user_id):
+        updated_adv_params: Optional[dict[str, str | int]] = uow.advs.update(
+            instance_id=adv_id, new_attrs=validated_data, owner_id=authenticated_user_id
+        )
+        if not updated_adv_params:
+            if uow.advs.exists(instance_id=adv_id):
+                raise errors.CurrentUserError
             raise errors.NotFoundError(message_prefix="The advertisement")
-        check_current_user_func(user_id=adv.user_id)
-        validated_data: dict[str, str] = validate_func(**new_params)
-        updated_adv: models.Advertisement = services.update_instance(instance=adv, new_attrs=validated_data)
-        uow.advs.add(updated_adv)
         uow.commit()
-        updated_adv_params: dict = services.get_params(model=updated_adv)
         return updated_adv_params
 
 
+@uses_unit_of_work(ReadOnlyUnitOfWork)
 def get_users_list(column: UserColumns, column_value: str | int | datetime, uow) -> list[models.User]:
     with uow:
         results = uow.users.get_list_or_paginated_data(filter_type=FilterTypes.COLUMN_VALUE,
@@ -110,6 +259,7 @@ def get_users_list(column: UserColumns, column_value: str | int | datetime, uow)
         return results
 
 
+@uses_unit_of_work(ReadOnlyUnitOfWork)
 def get_adv_params(adv_id: int, check_current_user_func: Callable, uow) -> dict[str, str | int]:
     with uow:
         adv: models.Advertisement = uow.advs.get(instance_id=adv_id)
@@ -120,41 +270,131 @@ def get_adv_params(adv_id: int, check_current_user_func: Callable, uow) -> dict[
         raise errors.NotFoundError(message_prefix="The advertisement")
 
 
+@uses_unit_of_work(ReadOnlyUnitOfWork)
 def search_advs_by_text(
         uow,
         column_value: str | int | datetime,
         column: Optional[str] = None,
         page: Optional[str] = None,
-        per_page: Optional[str] = None
+        per_page: Optional[str] = None,
+        cursor: Optional[str] = None,
+        include_total: Optional[str] = None,
+        filter_type: Optional[str] = None,
+        rank: Optional[bool] = None,
+        filter_expression: Optional[str | dict] = None,
+        sort: Optional[str] = None,
+        created_from: Optional[str] = None,
+        created_to: Optional[str] = None,
+        fields: Optional[str] = None
 ) -> dict[str, str | int]:
-    if not column:
+    if not filter_type:
+        filter_type = FilterTypes.SEARCH_TEXT
+    if not column and filter_type != FilterTypes.FULL_TEXT:
         column = "description"
     with uow:
         paginated_res: dict[str, int | list[dict[str, str | int]]] = uow.advs.get_list_or_paginated_data(
-            filter_type=FilterTypes.SEARCH_TEXT, comparison=Comparison.IS, column=column, column_value=column_value,
-            page=page, per_page=per_page, paginate=True
+            filter_type=filter_type, comparison=Comparison.IS, column=column, column_value=column_value,
+            page=page, per_page=per_page, paginate=True, cursor=cursor, include_total=include_total, rank=rank,
+            filter_expression=filter_expression, sort=sort, created_from=created_from, created_to=created_to,
+            fields=fields
         )
+    if fields:
+        return paginated_res
     paginated_res["items"] = [
         {params_dict["title"]: params_dict["description"]} for params_dict in paginated_res["items"]
     ]
     return paginated_res
 
 
+@uses_unit_of_work(ReadOnlyUnitOfWork)
+def export_advs(
+        uow,
+        column_value: str | int | datetime,
+        column: Optional[str] = None,
+        filter_type: Optional[str] = None,
+        filter_expression: Optional[str | dict] = None,
+        sort: Optional[str] = None,
+        created_from: Optional[str] = None,
+        created_to: Optional[str] = None,
+        fields: Optional[str] = None,
+        chunk_size: int = 1000
+) -> Iterator[dict[str, str | int]]:
+    """
+    Streams all the advertisements matching the search, with the same filters as ``search_advs_by_text()``.
+    The unit of work stays open while the result is consumed and is closed with the iterator, so a consumer that
+    stops early should close it. Invalid filters raise on the first ``next()``.
+    """
+    if not filter_type:
+        filter_type = FilterTypes.SEARCH_TEXT
+    if not column and filter_type != FilterTypes.FULL_TEXT:
+        column = "description"
+    with uow:
+        yield from uow.advs.iter_filtered_data(
+            filter_type=filter_type, comparison=Comparison.IS, column=column, column_value=column_value,
+            filter_expression=filter_expression, sort=sort, created_from=created_from, created_to=created_to,
+            fields=fields, chunk_size=chunk_size
+        )
+
+
+@uses_unit_of_work(UnitOfWork)
 def delete_adv(adv_id: int, get_auth_user_id_func: Callable, uow) -> dict[str, str | int]:
     authenticated_user_id: int = get_auth_user_id_func()
-    with uow:
-        adv_to_delete = uow.advs.get(adv_id)
-        try:
-            if adv_to_delete.user_id == authenticated_user_id:
-                deleted_adv_params: dict[str, str | int] = services.get_params(model=adv_to_delete)
-                uow.advs.delete(adv_to_delete)
-                uow.commit()
-                return deleted_adv_params
-            raise errors.CurrentUserError
-        except AttributeError:
+    with uow.use_user_shard(user_id=authenticated_user_id):
+        deleted_adv_params: Optional[dict[str, str | int]] = uow.advs.delete_by_id(
+            instance_id=adv_id, owner_id=authenticated_user_id
+        )
+        if not deleted_adv_params:
+            if uow.advs.exists(instance_id=adv_id):
+                raise errors.CurrentUserError
             raise errors.NotFoundError(message_prefix="The advertisement")
+        uow.commit()
+        return deleted_adv_params
+
+
+# Errors an operation of a batch can fail with; any other exception fails the whole batch.
+BATCH_OPERATION_ERRORS = (errors.NotFoundError, errors.ValidationError, errors.AccessDeniedError,
+                          errors.CurrentUserError, errors.AlreadyExistsError)
+
+
+@uses_unit_of_work(BatchUnitOfWork)
+def run_batch(
+        get_auth_user_id_func: Callable, operations: list[Callable[..., Any]], uow, atomic: bool = False
+) -> tuple[list[tuple[Any, Optional[Exception]]], bool]:
+    """
+    Runs service functions of the authenticated user one after another in one transaction on their shard, and
+    commits it once.
+
+    :param get_auth_user_id_func: returns the id of the authenticated user
+    :type get_auth_user_id_func: Callable
+    :param operations: service functions with all their arguments bound but ``uow``
+    :type operations: list[Callable[..., Any]]
+    :param uow: batch unit of work
+    :param atomic: whether a failing operation rolls the whole batch back and stops it; otherwise only the
+        operation's own savepoint is rolled back and the batch goes on
+    :type atomic: bool
+    :return: (result, error) of each run operation, and whether the transaction was committed
+    :rtype: tuple[list[tuple[Any, Optional[Exception]]], bool]
+    """
+    authenticated_user_id: int = get_auth_user_id_func()
+    outcomes: list[tuple[Any, Optional[Exception]]] = []
+    with uow.use_user_shard(user_id=authenticated_user_id):
+        for operation in operations:
+            try:
+                if atomic:
+                    outcomes.append((operation(uow=uow), None))
+                    continue
+                with uow.savepoint():
+                    outcomes.append((operation(uow=uow), None))
+            except BATCH_OPERATION_ERRORS as e:
+                outcomes.append((None, e))
+                if atomic:
+                    uow.rollback()
+                    return outcomes, False
+        uow.commit()
+    return outcomes, True
 
 
+@uses_unit_of_work(ReadOnlyUnitOfWork)
 def jwt_auth(validate_func: Callable, check_pass_func: Callable[..., bool], grant_access_func: Callable,
              credentials: dict, uow) -> str:
     validated_data = validate_func(**credentials)
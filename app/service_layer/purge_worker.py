@@ -0,0 +1,63 @@
+import logging
+import os
+import threading
+
+import app.orm
+from app.service_layer import app_manager
+
+
+logger = logging.getLogger(__name__)
+
+
+class PurgeWorker(threading.Thread):
+    """
+    Background thread purging soft-deleted users and their advertisements every ``interval`` seconds.
+    Several workers, e.g. one per application process, can run at once: advertisements locked by one of them are
+    skipped by the others.
+    """
+
+    def __init__(self, interval: float = 10.0, batch_size: int = 500):
+        super().__init__(name="purge-worker", daemon=True)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.stopped = threading.Event()
+
+    def run_once(self) -> int:
+        purged = sum(
+            app_manager.purge_deleted_users(
+                uow=app_manager.purge_deleted_users.unit_of_work().use_shard(shard=shard), batch_size=self.batch_size
+            )
+            for shard in range(len(app.orm.shard_router.engines))
+        )
+        if purged:
+            logger.info("Purged %s soft-deleted users.", purged)
+        return purged
+
+    def run(self) -> None:
+        while not self.stopped.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Purging soft-deleted users failed.")
+            self.stopped.wait(self.interval)
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+
+def create_purge_worker() -> PurgeWorker:
+    """
+    Creates a worker configured by ``PURGE_INTERVAL_SECONDS`` and ``PURGE_BATCH_SIZE``.
+    """
+    return PurgeWorker(interval=float(os.getenv("PURGE_INTERVAL_SECONDS", 10)),
+                       batch_size=int(os.getenv("PURGE_BATCH_SIZE", 500)))
+
+
+if __name__ == "__main__":
+    import app.orm.table_mapper
+
+    logging.basicConfig(level=logging.INFO)
+    app.orm.table_mapper.start_mapping()
+    worker = create_purge_worker()
+    worker.start()
+    worker.join()
@@ -1,17 +1,63 @@
+from typing import Callable, Type, Iterable, Optional
+
+import sqlalchemy
 from sqlalchemy.exc import IntegrityError
 
 import app.repository.repository
 import app.domain.errors
-from app.orm import session_maker
+from app.orm import session_maker, router, shard_router
+import app.orm.routing
 from app.repository.repository import RepoProto, UserRepository, AdvRepository
+from app.repository.sharding import ShardedRepository
 
 
 class UnitOfWork:
-    def __init__(self):
+    """
+    Unit of work on the primary database. ``client_keys`` identify the client for read-your-writes routing and
+    default to the keys of the current request.
+
+    With several shards, user-scoped service functions route the unit to one shard with ``use_user_shard()`` or
+    ``use_new_user_shard()`` before entering it. An unrouted unit opens a session on every shard, and its
+    repositories run reads on all of them, merging the results.
+    """
+    def __init__(self, client_keys: Optional[Iterable[str]] = None):
         self.session_maker = session_maker
+        self.router = router
+        self.shard_router = shard_router
+        self.shard: Optional[int] = None
+        self.client_keys = tuple(client_keys) if client_keys is not None else app.orm.routing.client_keys.get()
+
+    def use_shard(self, shard: int) -> "UnitOfWork":
+        self.shard = shard
+        return self
+
+    def use_user_shard(self, user_id: int) -> "UnitOfWork":
+        return self.use_shard(shard=self.shard_router.get_user_shard(user_id=user_id))
+
+    def use_new_user_shard(self, email: str) -> "UnitOfWork":
+        return self.use_shard(shard=self.shard_router.get_new_user_shard(email=email))
+
+    def _get_bind(self) -> sqlalchemy.Engine:
+        return self.shard_router.engines[self.shard or 0]
+
+    def _open_session(self, bind: sqlalchemy.Engine) -> sqlalchemy.orm.Session:
+        return self.session_maker(bind=bind)
 
     def __enter__(self):
-        self.session = self.session_maker()
+        if self.shard is None and self.shard_router.is_sharded:
+            self.sessions = [self._open_session(bind=engine) for engine in self.shard_router.engines]
+            self.session = None
+            self.users: RepoProto = ShardedRepository(
+                repositories=[UserRepository(session=session) for session in self.sessions],
+                executor=self.shard_router.executor
+            )
+            self.advs: RepoProto = ShardedRepository(
+                repositories=[AdvRepository(session=session) for session in self.sessions],
+                executor=self.shard_router.executor
+            )
+            return self
+        self.session = self._open_session(bind=self._get_bind())
+        self.sessions = [self.session]
         self.users: RepoProto = UserRepository(session=self.session)
         self.advs: RepoProto = AdvRepository(session=self.session)
         return self
@@ -19,14 +65,97 @@ class UnitOfWork:
     def __exit__(self, exc_type, exc_val, exc_tb):
         if exc_type is not None:
             self.rollback()
-            self.session.close()
-        self.session.close()
+        for session in self.sessions:
+            session.close()
 
     def rollback(self):
-        self.session.rollback()
+        for session in self.sessions:
+            session.rollback()
 
     def commit(self):
         try:
-            self.session.commit()
+            for session in self.sessions:
+                session.commit()
         except IntegrityError:
             raise app.domain.errors.AlreadyExistsError
+        # Read after the commit, so the recorded WAL position covers its commit record.
+        if self.session is not None:
+            self.router.record_write(session=self.session, keys=self.client_keys)
+
+
+class ReadOnlyUnitOfWork(UnitOfWork):
+    """
+    Unit of work for query-only service functions. The session is bound to the engine the replica router picks for
+    the client (a replica, or the primary while the client's last write may not have been replayed yet) and runs in
+    a ``READ ONLY`` transaction (optionally ``DEFERRABLE``, which makes long serializable reads wait for a safe
+    snapshot instead of risking a serialization failure), never autoflushes, and does not expire loaded instances,
+    since nothing is written. With several shards, sessions are bound to the shards themselves.
+    """
+    def __init__(self, deferrable: bool = False, client_keys: Optional[Iterable[str]] = None):
+        super().__init__(client_keys=client_keys)
+        self.deferrable = deferrable
+
+    def _get_bind(self) -> sqlalchemy.Engine:
+        if self.shard_router.is_sharded:
+            return super()._get_bind()
+        return self.router.get_read_engine(keys=self.client_keys)
+
+    def _open_session(self, bind: sqlalchemy.Engine) -> sqlalchemy.orm.Session:
+        session = super()._open_session(bind=bind)
+        session.autoflush = False
+        session.expire_on_commit = False
+        session.connection(execution_options={"postgresql_readonly": True, "postgresql_deferrable": self.deferrable})
+        return session
+
+    def commit(self):
+        raise app.domain.errors.ReadOnlyError
+
+
+class BatchUnitOfWork(UnitOfWork):
+    """
+    Unit of work shared by the operations of a batch: one session and one transaction on the primary, opened by the
+    outermost ``with`` block. Service functions entering it again reuse that session and keep its routing, and
+    their commits only flush, so the batch ends with a single commit. ``savepoint()`` lets one operation be rolled
+    back alone.
+    """
+    def __init__(self, client_keys: Optional[Iterable[str]] = None):
+        super().__init__(client_keys=client_keys)
+        self.depth = 0
+
+    def use_shard(self, shard: int) -> "BatchUnitOfWork":
+        if not self.depth:
+            super().use_shard(shard=shard)
+        return self
+
+    def savepoint(self) -> sqlalchemy.orm.SessionTransaction:
+        return self.session.begin_nested()
+
+    def __enter__(self):
+        self.depth += 1
+        if self.depth == 1:
+            super().__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.depth -= 1
+        if not self.depth:
+            super().__exit__(exc_type, exc_val, exc_tb)
+
+    def commit(self):
+        if self.depth > 1:
+            try:
+                self.session.flush()
+            except IntegrityError:
+                raise app.domain.errors.AlreadyExistsError
+            return
+        super().commit()
+
+
+def uses_unit_of_work(uow_class: Type[UnitOfWork]) -> Callable:
+    """
+    Declares the unit of work a service function needs. Callers create it with ``func.unit_of_work()``.
+    """
+    def decorator(func: Callable) -> Callable:
+        func.unit_of_work = uow_class
+        return func
+    return decorator
@@ -9,6 +9,10 @@ import app.pass_hashing_and_validation.pass_hashing, app.domain.errors
 from app.flask_entrypoints import adv
 from app.orm import table_mapper
 from app.domain import services
+from app.repository.counting import count_cache
+
+
+table_mapper.start_mapping()
 
 
 @pytest.fixture(scope="session")
@@ -30,6 +34,13 @@ def clear_db_before_and_after_test(engine):
     table_mapper.mapper.metadata.create_all(bind=engine)
 
 
+@pytest.fixture(autouse=True)
+def clear_count_cache():
+    count_cache.clear()
+    yield
+    count_cache.clear()
+
+
 @pytest.fixture
 def test_client():
     return adv.test_client()
@@ -144,6 +155,17 @@ class FakeBaseRepo:
     def add(self, instance):
         self.temp_added.append(instance)
 
+    def create(self, instance):
+        if not instance.id:
+            instance.id = max((item.id for item in self.instances), default=0) + 1
+        if not instance.creation_date:
+            instance.creation_date = datetime.datetime(1900, 1, 1)
+        self.instances.add(instance)
+        return instance
+
+    def create_many(self, instances, chunk_size=500):
+        return [self.create(instance) for instance in instances]
+
     def get(self, instance_id):
         if instance_id not in (instance.id for instance in self.instances):
             return []
@@ -157,6 +179,33 @@ class FakeBaseRepo:
     def delete(self, instance):
         self.temp_deleted.append(instance)
 
+    def _get_owned(self, instance_id, owner_id=None):
+        instance = self.get(instance_id)
+        if not instance or (owner_id is not None and getattr(instance, "user_id", owner_id) != owner_id):
+            return None
+        return instance
+
+    def update(self, instance_id, new_attrs, owner_id=None):
+        instance = self._get_owned(instance_id=instance_id, owner_id=owner_id)
+        if instance is None:
+            return None
+        return services.get_params(model=services.update_instance(instance=instance, new_attrs=new_attrs))
+
+    def delete_by_id(self, instance_id, owner_id=None):
+        instance = self._get_owned(instance_id=instance_id, owner_id=owner_id)
+        if instance is None:
+            return None
+        self.temp_deleted.append(instance)
+        return services.get_params(model=instance)
+
+    def delete_by_user_id(self, user_id):
+        instances = [instance for instance in self.instances if getattr(instance, "user_id", None) == user_id]
+        self.temp_deleted.extend(instances)
+        return len(instances)
+
+    def exists(self, instance_id):
+        return bool(self.get(instance_id))
+
     def execute_adding(self):
         for item in self.temp_added:
             if not item.id:
@@ -176,6 +225,9 @@ class FakeUsersRepo(FakeBaseRepo):
     def __init__(self, users: list):
         super().__init__(instances=users)
 
+    def soft_delete_by_id(self, instance_id):
+        return self.delete_by_id(instance_id=instance_id)
+
     def __str__(self):
         return "FakeUsersRepo"
 
@@ -193,6 +245,12 @@ class FakeUnitOfWork:
         self.users = users
         self.advs = advs
 
+    def use_user_shard(self, user_id):
+        return self
+
+    def use_new_user_shard(self, email):
+        return self
+
     def __enter__(self):
         return self
 
@@ -5,6 +5,7 @@ import pytest
 
 import app.domain.errors
 import app.flask_entrypoints.authentication
+import app.pass_hashing_and_validation.validation
 from app.service_layer import app_manager
 
 
@@ -112,13 +113,14 @@ def test_get_related_advs(fake_check_current_user_func, fake_uow_user_and_adv):
     assert result["items"] == [expected]
 
 
-def test_delete_user(fake_check_current_user_func, fake_uow_user_and_adv):
+@pytest.mark.parametrize("soft", (False, True))
+def test_delete_user(fake_check_current_user_func, fake_uow_user_and_adv, soft):
     user_id, fake_uow = fake_uow_user_and_adv.user_id, fake_uow_user_and_adv.fake_uow
     user_data_before_deletion = app_manager.get_user_data(
         user_id=user_id, check_current_user_func=fake_check_current_user_func, uow=fake_uow
     )
     result = app_manager.delete_user(
-        user_id=user_id, check_current_user_func=fake_check_current_user_func, uow=fake_uow
+        user_id=user_id, check_current_user_func=fake_check_current_user_func, uow=fake_uow, soft=soft
     )
     try:
         app_manager.get_user_data(user_id=user_id, check_current_user_func=fake_check_current_user_func, uow=fake_uow)
@@ -171,11 +173,13 @@ def test_get_adv_params_raises_not_found_error(fake_check_current_user_func, fak
     assert e.value.message == "The advertisement with the provided parameters is not found."
 
 
-def test_update_adv(fake_validate_func, fake_check_current_user_func, fake_uow_user_and_adv):
+def test_update_adv(
+        fake_validate_func, fake_get_auth_user_id_func, fake_check_current_user_func, fake_uow_user_and_adv
+):
     adv_id, fake_uow = fake_uow_user_and_adv.adv_id, fake_uow_user_and_adv.fake_uow
     new_params = {"title": "new_title", "description": "new_description"}
     result: dict[str, str | int] = app_manager.update_adv(
-        adv_id=adv_id, new_params=new_params, check_current_user_func=fake_check_current_user_func,
+        adv_id=adv_id, new_params=new_params, get_auth_user_id_func=fake_get_auth_user_id_func,
         validate_func=fake_validate_func, uow=fake_uow
     )
     adv_from_repo_params: dict[str, str | int] = app_manager.get_adv_params(
@@ -186,16 +190,25 @@ def test_update_adv(fake_validate_func, fake_check_current_user_func, fake_uow_u
     assert result == adv_from_repo_params
 
 
-def test_update_adv_raises_not_found_error(fake_validate_func, fake_check_current_user_func, fake_uow_user_and_adv):
+def test_update_adv_raises_not_found_error(fake_validate_func, fake_get_auth_user_id_func, fake_uow_user_and_adv):
     adv_id, fake_uow, new_params = \
         fake_uow_user_and_adv.adv_id + 1, fake_uow_user_and_adv.fake_uow, {"title": "new_title"}
     with pytest.raises(expected_exception=app.domain.errors.NotFoundError) as e:
         app_manager.update_adv(
-            adv_id=adv_id, new_params=new_params, check_current_user_func=fake_check_current_user_func,
+            adv_id=adv_id, new_params=new_params, get_auth_user_id_func=fake_get_auth_user_id_func,
             validate_func=fake_validate_func, uow=fake_uow_user_and_adv.fake_uow
         )
 
 
+def test_update_adv_raises_current_user_error(fake_validate_func, fake_get_auth_user_id_func_2, fake_uow_user_and_adv):
+    adv_id, fake_uow = fake_uow_user_and_adv.adv_id, fake_uow_user_and_adv.fake_uow
+    with pytest.raises(expected_exception=app.domain.errors.CurrentUserError):
+        app_manager.update_adv(
+            adv_id=adv_id, new_params={"title": "new_title"}, get_auth_user_id_func=fake_get_auth_user_id_func_2,
+            validate_func=fake_validate_func, uow=fake_uow
+        )
+
+
 def test_search_advs_by_text(test_adv_params, fake_uow_user_and_adv):
     fake_uow = fake_uow_user_and_adv.fake_uow
     column_value = "test"
@@ -231,3 +244,21 @@ def test_delete_adv_raises_not_found_error(fake_get_auth_user_id_func, fake_advs
     with pytest.raises(expected_exception=app.domain.errors.NotFoundError) as e:
         app_manager.delete_adv(adv_id=1, get_auth_user_id_func=fake_get_auth_user_id_func, uow=fake_uow)
     assert e.value.message == "The advertisement with the provided parameters is not found."
+
+
+def test_create_advs_creates_valid_advs_and_reports_invalid_ones(fake_get_auth_user_id_func, fake_uow_user):
+    advs_params = [{"title": "title_1", "description": "description_1"}, {"title": "title_2"},
+                   {"title": "title_3", "description": "description_3"}]
+    result = app_manager.create_advs(
+        get_auth_user_id_func=fake_get_auth_user_id_func, advs_params=advs_params, uow=fake_uow_user.fake_uow,
+        validate_func=app.pass_hashing_and_validation.validation.validate_data_for_bulk_adv_creation,
+        skip_invalid=True
+    )
+    assert [item["index"] for item in result["created"]] == [0, 2]
+    assert result["errors"][0]["index"] == 1
+    assert result["errors"][0]["errors"][0]["loc"] == ("description",)
+    with pytest.raises(app.domain.errors.ValidationError):
+        app_manager.create_advs(
+            get_auth_user_id_func=fake_get_auth_user_id_func, advs_params=advs_params, uow=fake_uow_user.fake_uow,
+            validate_func=app.pass_hashing_and_validation.validation.validate_data_for_bulk_adv_creation
+        )
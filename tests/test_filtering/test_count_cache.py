@@ -0,0 +1,27 @@
+import time
+
+from app.repository.counting import CountCache
+
+
+def test_count_cache_returns_count_set_before_ttl_expires():
+    cache = CountCache(ttl=60)
+    cache.set(("Advertisement", "search_text", "title", "bike"), 5)
+    assert cache.get(("Advertisement", "search_text", "title", "bike")) == 5
+
+
+def test_count_cache_returns_none_when_ttl_expired():
+    cache = CountCache(ttl=0.01)
+    cache.set("key", 5)
+    time.sleep(0.02)
+    assert cache.get("key") is None
+
+
+def test_count_cache_evicts_least_recently_used_key_when_max_size_exceeded():
+    cache = CountCache(ttl=60, max_size=2)
+    cache.set("first", 1)
+    cache.set("second", 2)
+    cache.get("first")
+    cache.set("third", 3)
+    assert cache.get("first") == 1
+    assert cache.get("second") is None
+    assert cache.get("third") == 3
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import pytest
+
+import app.domain.errors
+import app.repository.filtering
+from app.domain.models import Advertisement
+from app.repository.filtering import parse_timestamp
+
+ADV_PARAMS = {"model_class": Advertisement, "filter_type": "column_value", "comparison": ">=", "column": "id",
+              "column_value": "1000", "paginate": True}
+
+
+@pytest.mark.parametrize("value,expected", (("2024-01-02", (datetime(2024, 1, 2), True)),
+                                            ("2024-01-02T10:30:00", (datetime(2024, 1, 2, 10, 30), False)),
+                                            ("2024-01-02T10:30:00+03:00", (datetime(2024, 1, 2, 7, 30), False))))
+def test_parse_timestamp_returns_naive_timestamp_and_whether_date_was_passed(value, expected):
+    assert parse_timestamp(name="created_from", value=value) == expected
+
+
+@pytest.mark.parametrize("created_from,created_to,expected_total", (("1900-01-01", None, 4),
+                                                                   ("1900-01-01T00:00:01", None, 0),
+                                                                   (None, "1900-01-01", 4),
+                                                                   (None, "1900-01-01T00:00:00", 0),
+                                                                   ("1899-12-31", "1900-01-02T00:00:00", 4)))
+def test_get_list_or_paginated_data_filters_by_half_open_creation_date_range(
+        session_maker, create_test_users_and_advs, created_from, created_to, expected_total
+):
+    with session_maker() as sess:
+        result = app.repository.filtering.get_list_or_paginated_data(
+            session=sess, created_from=created_from, created_to=created_to, **ADV_PARAMS
+        )
+    assert result["total"] == expected_total
+
+
+@pytest.mark.parametrize("comparison,expected_total", (("is", 4), ("is_not", 0), ("<", 0), ("<=", 4), (">", 0),
+                                                       (">=", 4)))
+def test_get_list_or_paginated_data_compares_creation_date_with_whole_day(
+        session_maker, create_test_users_and_advs, comparison, expected_total
+):
+    with session_maker() as sess:
+        result = app.repository.filtering.get_list_or_paginated_data(
+            session=sess, model_class=Advertisement, filter_type="column_value", column="creation_date",
+            column_value="1900-01-01", comparison=comparison, paginate=True
+        )
+    assert result["total"] == expected_total
+
+
+@pytest.mark.parametrize("created_from,created_to,expected_message", (
+        ("INVALID", None, {"created_from": 'Must be a date string of the following format: "YYYY-MM-DD" or an ISO '
+                                           '8601 date-time.'}),
+        ("1900-01-02", "1900-01-01", {"created_to": 'Must be later than "created_from".'})
+))
+def test_get_list_or_paginated_data_raises_error_when_creation_date_range_is_invalid(
+        session_maker, created_from, created_to, expected_message
+):
+    with session_maker() as sess:
+        with pytest.raises(app.domain.errors.ValidationError) as e:
+            app.repository.filtering.get_list_or_paginated_data(
+                session=sess, created_from=created_from, created_to=created_to, **ADV_PARAMS
+            )
+    assert e.value.message == {"invalid_params": expected_message}
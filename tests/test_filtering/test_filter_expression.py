@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+import app.domain.errors
+import app.repository.filtering
+from app.domain.models import Advertisement
+
+
+@pytest.mark.parametrize(
+    "filter_expression,expected_ids",
+    (
+            ({"and": [{"column": "user_id", "comparison": "is", "column_value": "1000"},
+                      {"filter_type": "search_text", "column": "title", "column_value": "1003"}]}, [1003]),
+            ({"or": [{"column": "id", "comparison": "is", "column_value": "1000"},
+                     {"and": [{"column": "user_id", "comparison": "is", "column_value": "1001"},
+                              {"column": "creation_date", "comparison": ">=", "column_value": "1900-01-01"}]}]},
+             [1000, 1001, 1004]),
+            (json.dumps({"and": [{"column": "id", "comparison": ">", "column_value": "1003"}]}), [1004]),
+            ({"and": [{"column": "id", "column_value": 1003}]}, [1003]),
+    )
+)
+def test_get_list_or_paginated_data_applies_compound_filter_expression(
+        session_maker, create_test_users_and_advs, filter_expression, expected_ids
+):
+    with session_maker() as sess:
+        result = app.repository.filtering.get_list_or_paginated_data(
+            session=sess, model_class=Advertisement, filter_expression=filter_expression, paginate=True
+        )
+    assert sorted(item["id"] for item in result["items"]) == expected_ids
+    assert result["total"] == len(expected_ids)
+
+
+@pytest.mark.parametrize(
+    "filter_expression,expected_message",
+    (
+            ("{invalid", {"invalid_params": {"filter": "Must be a valid JSON object."}}),
+            ({"and": []}, {"invalid_params": {"filter": '"and" must be a non-empty list.'}}),
+            ({"and": [{"column": "id"}], "or": [{"column": "id"}]},
+             {"invalid_params": {"filter": "A group must contain exactly one of ['and', 'or']."}}),
+            ({"and": [{"column": "id", "comparison": "is", "column_value": "1", "model_class": "User"}]},
+             {"invalid_params": {"filter.and[0]": "Unknown keys: ['model_class']."}}),
+    )
+)
+def test_get_list_or_paginated_data_raises_error_when_filter_expression_is_malformed(
+        filter_expression, expected_message
+):
+    with pytest.raises(app.domain.errors.ValidationError) as e:
+        app.repository.filtering.get_list_or_paginated_data(
+            session="fake_session", model_class=Advertisement, filter_expression=filter_expression, paginate=True
+        )
+    assert e.value.message == expected_message
+
+
+def test_get_list_or_paginated_data_reports_path_of_invalid_predicate():
+    filter_expression = {"or": [{"column": "id", "comparison": "is", "column_value": "1"},
+                                {"column": "name", "comparison": "is", "column_value": "test"}]}
+    with pytest.raises(app.domain.errors.ValidationError) as e:
+        app.repository.filtering.get_list_or_paginated_data(
+            session="fake_session", model_class=Advertisement, filter_expression=filter_expression, paginate=True
+        )
+    assert set(e.value.message["invalid_params"].keys()) == {"filter.or[1]"}
+    assert set(e.value.message["invalid_params"]["filter.or[1]"]["invalid_params"].keys()) == {"column"}
+
+
+def test_get_list_or_paginated_data_echoes_only_passed_keys_of_invalid_predicate():
+    predicate = {"column": "id", "column_value": "text"}
+    with pytest.raises(app.domain.errors.ValidationError) as e:
+        app.repository.filtering.get_list_or_paginated_data(
+            session="fake_session", model_class=Advertisement, filter_expression={"and": [predicate]}, paginate=True
+        )
+    assert e.value.message["invalid_params"]["filter.and[0]"] == {
+        "params_passed": predicate,
+        "invalid_params": {"column_value": 'When "column" is "id", "column_value" must be a digit.'}
+    }
+
+
+def test_get_list_or_paginated_data_raises_error_when_filter_expression_has_too_many_predicates():
+    filter_expression = {"or": [{"column": "id", "comparison": "is", "column_value": str(i)} for i in range(21)]}
+    with pytest.raises(app.domain.errors.ValidationError) as e:
+        app.repository.filtering.get_list_or_paginated_data(
+            session="fake_session", model_class=Advertisement, filter_expression=filter_expression, paginate=True
+        )
+    assert e.value.message == {
+        "invalid_params": {"filter.or[20]": "A filter can contain at most 20 predicates."}
+    }
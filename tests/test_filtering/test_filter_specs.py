@@ -0,0 +1,68 @@
+import pytest
+import sqlalchemy
+
+import app.repository.filtering
+from app.domain.models import User, Advertisement, UserColumns
+from app.repository.filtering import Filter, FilterTypes, Comparison, get_filter_spec
+
+
+def test_get_filter_spec_returns_same_spec_for_enum_members_and_their_values():
+    spec = get_filter_spec(model_class=User, filter_type=FilterTypes.COLUMN_VALUE, column=UserColumns.ID,
+                           comparison=Comparison.GE)
+    assert spec is get_filter_spec(model_class=User, filter_type="column_value", column="id", comparison=">=")
+    assert spec.accepts("1000") and not spec.accepts("text")
+
+
+@pytest.mark.parametrize("column_value,expected", (
+        (1000, True), ("1000", True), (True, False), (1.5, False), ([1], False), ({"a": 1}, False), ("-1", False)
+))
+def test_filter_spec_accepts_only_integers_and_digit_strings_for_integer_columns(column_value, expected):
+    spec = get_filter_spec(model_class=Advertisement, filter_type="column_value", column="user_id", comparison="is")
+    assert spec.accepts(column_value) is expected
+
+
+@pytest.mark.parametrize("model_class,filter_type,column,comparison", (
+        (User, "column_value", "name", "<"),
+        (User, "search_text", "title", None),
+        (User, "full_text", None, None),
+        ("INVALID", "column_value", "id", "is"),
+        (Advertisement, "column_value", ["id"], "is")
+))
+def test_get_filter_spec_returns_none_when_filter_is_invalid(model_class, filter_type, column, comparison):
+    assert get_filter_spec(model_class=model_class, filter_type=filter_type, column=column,
+                           comparison=comparison) is None
+
+
+def test_get_filter_result_skips_params_walk_when_filter_spec_is_found(
+        session_maker, create_test_users_and_advs, monkeypatch
+):
+    def fail(*args, **kwargs):
+        raise AssertionError("_validate_params() called")
+
+    monkeypatch.setattr(Filter, "_validate_params", fail)
+    with session_maker() as sess:
+        result = app.repository.filtering.get_list_or_paginated_data(
+            session=sess, model_class=Advertisement, filter_type="search_text", column="title",
+            column_value="test_filter", comparison="ANY", paginate=True
+        )
+    assert result["total"] == 4
+
+
+def test_get_filter_result_reuses_compiled_statement_for_same_filter_shape(
+        engine, session_maker, create_test_users_and_advs
+):
+    cache_hits = []
+    listener = lambda conn, cursor, statement, params, context, executemany: cache_hits.append(
+        context.cache_hit == sqlalchemy.engine.default.CACHE_HIT
+    )
+    sqlalchemy.event.listen(engine, "after_cursor_execute", listener)
+    try:
+        with session_maker() as sess:
+            for column_value in ("test_filter_1000", "test_filter_1001"):
+                app.repository.filtering.get_list_or_paginated_data(
+                    session=sess, model_class=Advertisement, filter_type="search_text", column="title",
+                    column_value=column_value, paginate=True
+                )
+    finally:
+        sqlalchemy.event.remove(engine, "after_cursor_execute", listener)
+    assert cache_hits[-1] is True
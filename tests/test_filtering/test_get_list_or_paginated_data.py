@@ -1,4 +1,5 @@
 import pytest
+import sqlalchemy
 import app.domain.errors
 import app.repository
 import app.repository.filtering
@@ -148,7 +149,7 @@ def test_get_list_or_paginated_data_raises_error_when_invalid_params_are_passed(
         "Valid values are: [<class 'app.models.User'>, <class 'app.models.Advertisement'>]"
     )
     assert set(e.value.message["invalid_params"]["filter_type"]) == set(
-        "Valid values are: ['column_value', 'search_text']"
+        "Valid values are: ['column_value', 'search_text', 'full_text', 'fuzzy', 'prefix', 'auto']"
     )
     assert set(e.value.message["invalid_params"]["column"]) == set(
         "Valid values are: ['description', 'title', 'email', 'user_id', 'name', 'creation_date', 'id']"
@@ -170,3 +171,130 @@ def test_get_list_or_paginated_data_raises_error_when_all_params_are_missing(
     assert set(e.value.message["missing_params"]) == {
         "model_class", "filter_type", "column", "column_value", "comparison"
     }
+
+
+@pytest.mark.parametrize("page,expected_statements", ((1, 1), (5, 2)))
+def test_get_list_or_paginated_data_fetches_page_and_total_in_one_statement(
+        engine, session_maker, create_test_users_and_advs, page, expected_statements
+):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    sqlalchemy.event.listen(engine, "before_cursor_execute", listener)
+    try:
+        with session_maker() as sess:
+            result = app.repository.filtering.get_list_or_paginated_data(
+                session=sess, model_class=models.Advertisement, filter_type="search_text", column="title",
+                column_value="test_filter", paginate=True, page=page
+            )
+    finally:
+        sqlalchemy.event.remove(engine, "before_cursor_execute", listener)
+    assert len([statement for statement in statements if statement.lstrip().startswith("SELECT")]) == \
+           expected_statements
+    assert result["page"] == 1
+    assert result["total"] == 4
+    assert len(result["items"]) == 4
+
+
+def test_get_list_or_paginated_data_returns_has_next_without_total_when_include_total_is_none(
+        session_maker, create_test_users_and_advs
+):
+    with session_maker() as sess:
+        result = app.repository.filtering.get_list_or_paginated_data(
+            session=sess, model_class=models.Advertisement, filter_type="search_text", column="title",
+            column_value="test_filter", paginate=True, per_page=3, include_total="none"
+        )
+    assert set(result.keys()) == {"page", "per_page", "has_next", "items"}
+    assert result["has_next"] is True
+    assert len(result["items"]) == 3
+
+
+def test_get_list_or_paginated_data_returns_estimated_total_when_include_total_is_estimate(
+        session_maker, create_test_users_and_advs
+):
+    with session_maker() as sess:
+        result = app.repository.filtering.get_list_or_paginated_data(
+            session=sess, model_class=models.Advertisement, filter_type="search_text", column="title",
+            column_value="test_filter", paginate=True, per_page=10, include_total="estimate"
+        )
+    assert result["has_next"] is False
+    assert result["total"] >= 4
+    assert result["total_pages"] == (result["total"] + 9) // 10
+    assert len(result["items"]) == 4
+
+
+def test_get_list_or_paginated_data_reuses_cached_total_of_text_search(session_maker, create_test_users_and_advs):
+    params = {"model_class": models.Advertisement, "filter_type": "search_text", "column": "title",
+              "column_value": "test_filter", "paginate": True, "per_page": 3}
+    with session_maker() as sess:
+        app.repository.filtering.get_list_or_paginated_data(session=sess, **params)
+        sess.execute(sqlalchemy.text('DELETE FROM "adv" WHERE id = 1004'))
+        result = app.repository.filtering.get_list_or_paginated_data(session=sess, page=2, **params)
+        sess.rollback()
+    assert result["total"] == 4
+    assert result["total_pages"] == 2
+    assert result["items"] == []
+
+
+def test_get_list_or_paginated_data_raises_error_when_include_total_is_invalid(
+        session_maker, create_test_users_and_advs
+):
+    with session_maker() as sess:
+        with pytest.raises(expected_exception=app.domain.errors.ValidationError) as e:
+            app.repository.filtering.get_list_or_paginated_data(
+                session=sess, model_class=models.User, filter_type="search_text", column="name",
+                column_value="test_filter", paginate=True, include_total="INVALID"
+            )
+    assert e.value.message == {
+        "invalid_params": {"include_total": "Valid values are: ['exact', 'estimate', 'none']"}
+    }
+
+
+def test_get_list_or_paginated_data_returns_advs_matching_full_text_query(session_maker, create_test_users_and_advs):
+    with session_maker() as sess:
+        sess.execute(sqlalchemy.text('UPDATE "adv" SET title = :title, description = :description WHERE id = 1003'),
+                     dict(title="Mountain bikes", description="Two bikes in good condition"))
+        sess.execute(sqlalchemy.text('UPDATE "adv" SET description = :description WHERE id = 1004'),
+                     dict(description="Bike helmet"))
+        result = app.repository.filtering.get_list_or_paginated_data(
+            session=sess, model_class=models.Advertisement, filter_type="full_text", column_value="bike -helmet",
+            paginate=True, rank=True
+        )
+        sess.rollback()
+    assert result["total"] == 1
+    assert [item["id"] for item in result["items"]] == [1003]
+
+
+def test_get_list_or_paginated_data_raises_error_when_full_text_search_is_requested_for_users(
+        session_maker, create_test_users_and_advs
+):
+    with session_maker() as sess:
+        with pytest.raises(expected_exception=app.domain.errors.ValidationError) as e:
+            app.repository.filtering.get_list_or_paginated_data(
+                session=sess, model_class=models.User, filter_type="full_text", column_value="test"
+            )
+    assert e.value.message["invalid_params"] == {
+        "model_class": 'When "filter_type" is "full_text", the only valid model class is "Advertisement".'
+    }
+
+
+@pytest.mark.parametrize("column_value,expected_total", (("t%f", 0), ("filter\\_100", 0), ("st_f", 4)))
+def test_get_list_or_paginated_data_matches_like_wildcards_in_search_text_literally(
+        session_maker, create_test_users_and_advs, column_value, expected_total
+):
+    with session_maker() as sess:
+        result = app.repository.filtering.get_list_or_paginated_data(
+            session=sess, model_class=models.Advertisement, filter_type="search_text", column="title",
+            column_value=column_value, paginate=True
+        )
+    assert result["total"] == expected_total
+
+
+def test_get_list_or_paginated_data_returns_similarity_ranked_users_when_filter_type_is_fuzzy(
+        session_maker, create_test_users_and_advs
+):
+    with session_maker() as sess:
+        result = app.repository.filtering.get_list_or_paginated_data(
+            session=sess, model_class=models.User, filter_type="fuzzy", column="name", column_value="tset_filter_1001",
+            paginate=True
+        )
+    assert [item["id"] for item in result["items"]] == [1001, 1000]
@@ -0,0 +1,46 @@
+import pytest
+
+import app.domain.errors
+import app.repository.filtering
+from app.domain.models import User, Advertisement
+from app.repository.filtering import encode_cursor, decode_cursor
+
+
+def test_decode_cursor_returns_payload_passed_to_encode_cursor():
+    assert decode_cursor(cursor=encode_cursor(payload={"id": 1000})) == {"id": 1000}
+
+
+@pytest.mark.parametrize("cursor", ("INVALID", encode_cursor(payload={"id": "1000"}), "W10="))
+def test_decode_cursor_raises_validation_error_when_cursor_is_invalid(cursor):
+    with pytest.raises(app.domain.errors.ValidationError) as e:
+        decode_cursor(cursor=cursor)
+    assert e.value.message == {"invalid_params": {"cursor": "Invalid cursor."}}
+
+
+def test_get_list_or_paginated_data_returns_keyset_pages_when_cursor_is_passed(
+        session_maker, create_test_users_and_advs
+):
+    params = {"model_class": Advertisement, "filter_type": "column_value", "comparison": ">=", "column": "id",
+              "column_value": "1000", "paginate": True, "per_page": 3}
+    with session_maker() as sess:
+        first_page = app.repository.filtering.get_list_or_paginated_data(session=sess, cursor="", **params)
+        second_page = app.repository.filtering.get_list_or_paginated_data(
+            session=sess, cursor=first_page["next_cursor"], **params
+        )
+    assert first_page["per_page"] == 3
+    assert [item["id"] for item in first_page["items"]] == [1000, 1001, 1003]
+    assert decode_cursor(cursor=first_page["next_cursor"]) == {"id": 1003}
+    assert [item["id"] for item in second_page["items"]] == [1004]
+    assert second_page["next_cursor"] is None
+
+
+def test_get_list_or_paginated_data_returns_no_next_cursor_when_last_page_is_full(
+        session_maker, create_test_users_and_advs
+):
+    with session_maker() as sess:
+        result = app.repository.filtering.get_list_or_paginated_data(
+            session=sess, model_class=User, filter_type="search_text", column="name", column_value="test_filter",
+            paginate=True, per_page=2, cursor=""
+        )
+    assert [item["id"] for item in result["items"]] == [1000, 1001]
+    assert result["next_cursor"] is None
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import pytest
+import sqlalchemy
+
+import app.domain.errors
+import app.repository.filtering
+from app.domain import services
+from app.domain.models import User, Advertisement
+from app.repository.projection import PROJECTIONS
+
+
+def test_projection_serializes_row_like_get_params_serializes_instance():
+    adv = Advertisement(id=1, title="title", description="description", user_id=2,
+                        creation_date=datetime(2024, 1, 2, 3, 4, 5))
+    row = (adv.id, adv.title, adv.description, adv.creation_date, adv.user_id, 100)
+    assert PROJECTIONS[Advertisement].serialize(row) == services.get_params(model=adv)
+
+
+def test_get_list_or_paginated_data_does_not_load_instances_into_identity_map(
+        session_maker, create_test_users_and_advs
+):
+    with session_maker() as sess:
+        result = app.repository.filtering.get_list_or_paginated_data(
+            session=sess, model_class=User, filter_type="search_text", column="name", column_value="test_filter",
+            paginate=True
+        )
+        assert len(sess.identity_map) == 0
+    assert [item["id"] for item in result["items"]] == [1000, 1001]
+
+
+def test_get_list_or_paginated_data_selects_and_returns_only_fields_passed(
+        engine, session_maker, create_test_users_and_advs
+):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    sqlalchemy.event.listen(engine, "before_cursor_execute", listener)
+    try:
+        with session_maker() as sess:
+            result = app.repository.filtering.get_list_or_paginated_data(
+                session=sess, model_class=Advertisement, filter_type="search_text", column="title",
+                column_value="test_filter", paginate=True, fields="title, id", sort="-creation_date", cursor=""
+            )
+    finally:
+        sqlalchemy.event.remove(engine, "before_cursor_execute", listener)
+    select_list = statements[-1].split("FROM")[0]
+    assert "description" not in select_list
+    assert result["items"][0] == {"title": "test_filter_1004", "id": 1004}
+
+
+@pytest.mark.parametrize("fields", ("id,password", "id,", ["id", 1]))
+def test_get_list_or_paginated_data_raises_error_when_fields_are_invalid(session_maker, fields):
+    with session_maker() as sess:
+        with pytest.raises(app.domain.errors.ValidationError) as e:
+            app.repository.filtering.get_list_or_paginated_data(
+                session=sess, model_class=User, filter_type="search_text", column="name", column_value="test",
+                paginate=True, fields=fields
+            )
+    assert e.value.message == {
+        "invalid_params": {"fields": "Valid values are: ['id', 'name', 'email', 'creation_date']"}
+    }
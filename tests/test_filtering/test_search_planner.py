@@ -0,0 +1,120 @@
+import pytest
+import sqlalchemy
+
+import app.orm
+import app.repository.filtering
+from app.domain.models import User, Advertisement
+from app.repository import search_planner
+from app.repository.search_planner import ColumnStats, SearchStrategy
+
+
+@pytest.fixture
+def fake_column_stats(monkeypatch):
+    monkeypatch.setattr(
+        search_planner, "get_column_stats", lambda **kwargs: ColumnStats(rows=100_000, distinct=100_000)
+    )
+
+
+@pytest.mark.parametrize(
+    "model_class,column,term,expected_strategy",
+    (
+            (User, "email", "seller@email.com", SearchStrategy.EQUALITY),
+            (User, "name", "seller@email.com", SearchStrategy.TRIGRAM),
+            (User, "email", "se", SearchStrategy.PREFIX),
+            (Advertisement, "title", "b", SearchStrategy.PREFIX),
+            (Advertisement, "title", "bike", SearchStrategy.TRIGRAM),
+            (Advertisement, "description", "red mountain bike", SearchStrategy.FULL_TEXT),
+    )
+)
+def test_plan_search_chooses_strategy_by_term_and_column(
+        fake_column_stats, model_class, column, term, expected_strategy
+):
+    plan = search_planner.plan_search(session="fake_session", model_class=model_class, column=column, term=term)
+    assert plan.strategy == expected_strategy
+    assert plan.estimated_cost > 0
+
+
+def test_plan_search_estimates_fewer_rows_for_longer_trigram_terms(fake_column_stats):
+    short_plan = search_planner.plan_search(
+        session="fake_session", model_class=Advertisement, column="title", term="bik"
+    )
+    long_plan = search_planner.plan_search(
+        session="fake_session", model_class=Advertisement, column="title", term="bicycle"
+    )
+    assert long_plan.estimated_rows < short_plan.estimated_rows
+
+
+def test_get_column_stats_caches_statistics_per_database(session_maker):
+    search_planner.clear_stats_cache()
+    other_engine = sqlalchemy.create_engine(app.orm.POSTGRES_DSN)
+    executed = []
+    sqlalchemy.event.listen(other_engine, "before_cursor_execute", lambda *args: executed.append(args[2]))
+    try:
+        with session_maker() as sess, sqlalchemy.orm.Session(bind=other_engine) as other_sess:
+            search_planner.get_column_stats(session=sess, table_name="adv", column="title")
+            for _ in range(2):
+                search_planner.get_column_stats(session=other_sess, table_name="adv", column="title")
+    finally:
+        other_engine.dispose()
+    assert len(executed) == 1
+
+
+def test_get_list_or_paginated_data_exposes_search_plan_when_filter_type_is_auto(
+        session_maker, create_test_users_and_advs
+):
+    with session_maker() as sess:
+        filter_object = app.repository.filtering.Filter(session=sess)
+        result = filter_object.get_filter_result(
+            model_class=User, filter_type="auto", column="email", column_value="test_filter_1001@email.com",
+            paginate=True
+        )
+    assert filter_object.search_plan.strategy == SearchStrategy.EQUALITY
+    assert [item["id"] for item in result["items"]] == [1001]
+
+
+@pytest.fixture
+def create_search_rows(clear_db_before_and_after_test, session_maker):
+    with session_maker() as sess:
+        sess.execute(sqlalchemy.text(
+            'INSERT INTO "user" (id, name, email, password, creation_date) '
+            "VALUES (1, 'seller', 'Seller@Email.com', 'password', now())"
+        ))
+        sess.execute(sqlalchemy.text(
+            "INSERT INTO adv (id, title, description, creation_date, user_id) VALUES "
+            "(1, 'Red mountain bike', 'Almost new', now(), 1), "
+            "(2, 'For sale', 'A mountain bike, red, with new tyres', now(), 1), "
+            "(3, 'Bike', 'Red road bike', now(), 1)"
+        ))
+        sess.commit()
+
+
+def search(session_maker, model_class, column, term, filter_type="auto") -> list[int]:
+    with session_maker() as sess:
+        result = app.repository.filtering.Filter(session=sess).get_filter_result(
+            model_class=model_class, filter_type=filter_type, column=column, column_value=term, paginate=True
+        )
+    return [item["id"] for item in result["items"]]
+
+
+@pytest.mark.parametrize(
+    "model_class,column,term,expected_ids,search_text_ids",
+    (
+            # Full text: all the words, in any order, in the requested column only.
+            (Advertisement, "description", "red mountain bike", [2], []),
+            (Advertisement, "title", "red mountain bike", [1], [1]),
+            # Equality: the whole e-mail, case-insensitively.
+            (User, "email", "seller@email.com", [1], [1]),
+            (User, "email", "eller@email.com", [], [1]),
+            # Prefix: short terms match the start of the value.
+            (Advertisement, "title", "fo", [2], [2]),
+            (Advertisement, "title", "ke", [], [1, 3]),
+            # Trigram: the substring semantics of "search_text".
+            (Advertisement, "description", "bike", [2, 3], [2, 3]),
+    )
+)
+def test_auto_search_returns_rows_of_chosen_strategy(
+        fake_column_stats, create_search_rows, session_maker, model_class, column, term, expected_ids,
+        search_text_ids
+):
+    assert search(session_maker, model_class, column, term) == expected_ids
+    assert search(session_maker, model_class, column, term, filter_type="search_text") == search_text_ids
@@ -0,0 +1,75 @@
+import pytest
+
+import app.domain.errors
+import app.repository.filtering
+from app.domain.models import User, Advertisement
+from app.repository.filtering import decode_cursor
+
+ADV_PARAMS = {"model_class": Advertisement, "filter_type": "column_value", "comparison": ">=", "column": "id",
+              "column_value": "1000", "paginate": True}
+
+
+@pytest.mark.parametrize("sort,expected_ids", ((None, [1000, 1001, 1003, 1004]),
+                                               ("-id", [1004, 1003, 1001, 1000]),
+                                               ("user_id", [1000, 1003, 1001, 1004]),
+                                               ("-creation_date", [1004, 1003, 1001, 1000])))
+def test_get_list_or_paginated_data_orders_offset_page_by_sort_with_id_tiebreaker(
+        session_maker, create_test_users_and_advs, sort, expected_ids
+):
+    with session_maker() as sess:
+        result = app.repository.filtering.get_list_or_paginated_data(session=sess, sort=sort, **ADV_PARAMS)
+    assert [item["id"] for item in result["items"]] == expected_ids
+
+
+def test_get_list_or_paginated_data_returns_keyset_pages_in_sort_order(session_maker, create_test_users_and_advs):
+    with session_maker() as sess:
+        first_page = app.repository.filtering.get_list_or_paginated_data(
+            session=sess, sort="-creation_date", cursor="", per_page=3, **ADV_PARAMS
+        )
+        second_page = app.repository.filtering.get_list_or_paginated_data(
+            session=sess, sort="-creation_date", cursor=first_page["next_cursor"], per_page=3, **ADV_PARAMS
+        )
+    assert [item["id"] for item in first_page["items"]] == [1004, 1003, 1001]
+    assert decode_cursor(cursor=first_page["next_cursor"]) == {
+        "id": 1001, "sort": "-creation_date", "key": "1900-01-01T00:00:00"
+    }
+    assert [item["id"] for item in second_page["items"]] == [1000]
+    assert second_page["next_cursor"] is None
+
+
+def test_get_list_or_paginated_data_rejects_cursor_created_with_another_sort(
+        session_maker, create_test_users_and_advs
+):
+    with session_maker() as sess:
+        first_page = app.repository.filtering.get_list_or_paginated_data(
+            session=sess, sort="title", cursor="", per_page=1, **ADV_PARAMS
+        )
+        with pytest.raises(app.domain.errors.ValidationError) as e:
+            app.repository.filtering.get_list_or_paginated_data(
+                session=sess, sort="-title", cursor=first_page["next_cursor"], per_page=1, **ADV_PARAMS
+            )
+    assert e.value.message == {"invalid_params": {"cursor": "Invalid cursor."}}
+
+
+def test_get_list_or_paginated_data_replaces_similarity_order_with_sort_passed(
+        session_maker, create_test_users_and_advs
+):
+    with session_maker() as sess:
+        result = app.repository.filtering.get_list_or_paginated_data(
+            session=sess, model_class=User, filter_type="fuzzy", column="name", column_value="tset_filter_1001",
+            paginate=True, sort="id"
+        )
+    assert [item["id"] for item in result["items"]] == [1000, 1001]
+
+
+@pytest.mark.parametrize("sort", ("description", "--id", "password", 1))
+def test_get_list_or_paginated_data_raises_error_when_sort_is_invalid(session_maker, sort):
+    with session_maker() as sess:
+        with pytest.raises(app.domain.errors.ValidationError) as e:
+            app.repository.filtering.get_list_or_paginated_data(
+                session=sess, model_class=User, filter_type="search_text", column="name", column_value="test",
+                paginate=True, sort=sort
+            )
+    assert e.value.message == {"invalid_params": {
+        "sort": "Valid values are: ['id', '-id', 'name', '-name', 'creation_date', '-creation_date']"
+    }}
@@ -33,7 +33,7 @@ def test_validate_params_raises_validation_error_when_all_params_are_invalid(dat
         "Valid values are: [<class 'app.models.User'>, " f"<class 'app.models.Advertisement'>]"
     )
     assert set(e.value.message["invalid_params"]["filter_type"]) == set(
-        "Valid values are: ['column_value', 'search_text']"
+        "Valid values are: ['column_value', 'search_text', 'full_text', 'fuzzy', 'prefix', 'auto']"
     )
     assert set(e.value.message["invalid_params"]["column"]) == set(
         "Valid values are: ['description', 'creation_date', 'user_id', 'name', 'email', 'id', 'title']"
@@ -97,7 +97,7 @@ def test_validate_params_raises_validation_error_when_filter_type_is_invalid(mod
     assert set(e.value.message["invalid_params"].keys()) == {"filter_type"}
     assert e.value.message["params_passed"] == data
     assert set(e.value.message["invalid_params"]["filter_type"]) == set(
-        "Valid values are: ['column_value', 'search_text']"
+        "Valid values are: ['column_value', 'search_text', 'full_text', 'fuzzy', 'prefix', 'auto']"
     )
 
 
@@ -113,7 +113,7 @@ def test_validate_params_raises_validation_error_when_model_class_and_filter_typ
         "Valid values are: [<class 'app.models.User'>, <class 'app.models.Advertisement'>]"
     )
     assert set(e.value.message["invalid_params"]["filter_type"]) == set(
-        "Valid values are: ['column_value', 'search_text']"
+        "Valid values are: ['column_value', 'search_text', 'full_text', 'fuzzy', 'prefix', 'auto']"
     )
 
 
@@ -153,7 +153,7 @@ def test_validate_params_raises_validation_error_when_filter_type_and_column_are
     assert set(e.value.message["invalid_params"].keys()) == {"filter_type", "column"}
     assert e.value.message["params_passed"] == data
     assert set(e.value.message["invalid_params"]["filter_type"]) == set(
-        "Valid values are: ['column_value', 'search_text']"
+        "Valid values are: ['column_value', 'search_text', 'full_text', 'fuzzy', 'prefix', 'auto']"
     )
     assert set(e.value.message["invalid_params"]["column"]) == set(
         f'For model class "{model_class.__name__}" valid values for "column" are: {columns}.'
@@ -236,7 +236,7 @@ def test_validate_params_raises_validation_error_when_filter_type_and_comparison
     assert set(e.value.message["invalid_params"].keys()) == {"filter_type", "comparison"}
     assert e.value.message["params_passed"] == data
     assert set(e.value.message["invalid_params"]["filter_type"]) == set(
-        "Valid values are: ['column_value', 'search_text']"
+        "Valid values are: ['column_value', 'search_text', 'full_text', 'fuzzy', 'prefix', 'auto']"
     )
     assert set(e.value.message["invalid_params"]["comparison"]) == set(
         "Valid values are: ['is', 'is_not', '<', '>', '>=', '<=']"
@@ -272,7 +272,7 @@ def test_validate_params_raises_validation_error_when_model_class_filter_type_an
         "Valid values are: [<class 'app.models.User'>, <class 'app.models.Advertisement'>]"
     )
     assert set(e.value.message["invalid_params"]["filter_type"]) == set(
-        "Valid values are: ['column_value', 'search_text']"
+        "Valid values are: ['column_value', 'search_text', 'full_text', 'fuzzy', 'prefix', 'auto']"
     )
     assert set(e.value.message["invalid_params"]["comparison"]) == set(
         "Valid values are: ['is', 'is_not', '<', '>', '>=', '<=']"
@@ -414,7 +414,7 @@ def test_validate_params_raises_validation_error_when_model_class_filter_type_an
         "Valid values are: [<class 'app.models.User'>, <class 'app.models.Advertisement'>]"
     )
     assert set(e.value.message["invalid_params"]["filter_type"]) == set(
-        "Valid values are: ['column_value', 'search_text']"
+        "Valid values are: ['column_value', 'search_text', 'full_text', 'fuzzy', 'prefix', 'auto']"
     )
     assert set(e.value.message["invalid_params"]["column"]) == set(
         "Valid values are: ['id', 'title', 'creation_date', 'name', 'user_id', 'email', 'description']"
@@ -434,7 +434,7 @@ def test_validate_params_raises_validation_error_when_model_class_filter_type_an
         "Valid values are: [<class 'app.models.User'>, <class 'app.models.Advertisement'>]"
     )
     assert set(e.value.message["invalid_params"]["filter_type"]) == set(
-        "Valid values are: ['column_value', 'search_text']"
+        "Valid values are: ['column_value', 'search_text', 'full_text', 'fuzzy', 'prefix', 'auto']"
     )
 
 
@@ -483,7 +483,7 @@ def test_validate_params_raises_validation_error_when_filter_type_comparison_and
     assert set(e.value.message["invalid_params"].keys()) == {"filter_type", "comparison"}
     assert e.value.message["params_passed"] == data
     assert set(e.value.message["invalid_params"]["filter_type"]) == set(
-        "Valid values are: ['column_value', 'search_text']"
+        "Valid values are: ['column_value', 'search_text', 'full_text', 'fuzzy', 'prefix', 'auto']"
     )
     assert set(e.value.message["invalid_params"]["comparison"]) == set(
         "Valid values are: ['is', 'is_not', '<', '>', '>=', '<=']"
@@ -504,7 +504,7 @@ def test_validate_params_raises_validation_error_when_filter_type_column_and_col
     assert set(e.value.message["invalid_params"].keys()) == {"filter_type", "column"}
     assert e.value.message["params_passed"] == data
     assert set(e.value.message["invalid_params"]["filter_type"]) == set(
-        "Valid values are: ['column_value', 'search_text']"
+        "Valid values are: ['column_value', 'search_text', 'full_text', 'fuzzy', 'prefix', 'auto']"
     )
 
 
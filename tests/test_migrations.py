@@ -0,0 +1,93 @@
+import pytest
+import sqlalchemy
+
+import app.orm
+from app.orm import migrations
+from app.orm.migrations.__main__ import main
+from app.orm.sharding import ShardRouter
+from app.orm.table_mapper import mapper
+
+
+def create_schema_engine(engine, schema: str) -> sqlalchemy.Engine:
+    with engine.begin() as connection:
+        connection.execute(sqlalchemy.text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        connection.execute(sqlalchemy.text(f"CREATE SCHEMA {schema}"))
+    return sqlalchemy.create_engine(app.orm.POSTGRES_DSN, connect_args={"options": f"-csearch_path={schema},public"})
+
+
+def describe_schema(engine: sqlalchemy.Engine, schema: str) -> dict:
+    with engine.connect() as connection:
+        indexes = connection.execute(sqlalchemy.text(
+            "SELECT indexname, replace(indexdef, :prefix, '') FROM pg_indexes "
+            "WHERE schemaname = :schema AND tablename <> 'schema_migrations'"
+        ), {"schema": schema, "prefix": f"{schema}."}).all()
+        columns = connection.execute(sqlalchemy.text(
+            "SELECT table_name, column_name, data_type, is_nullable, generation_expression "
+            "FROM information_schema.columns WHERE table_schema = :schema AND table_name <> 'schema_migrations'"
+        ), {"schema": schema}).all()
+        foreign_keys = connection.execute(sqlalchemy.text(
+            "SELECT conname, confdeltype, convalidated FROM pg_constraint "
+            "WHERE contype = 'f' AND connamespace = to_regnamespace(:schema)"
+        ), {"schema": schema}).all()
+    return {"indexes": set(indexes), "columns": set(columns), "foreign_keys": set(foreign_keys)}
+
+
+@pytest.fixture
+def schema_engines(engine):
+    engines = {schema: create_schema_engine(engine=engine, schema=schema)
+               for schema in ("migrated_schema", "created_schema")}
+    yield engines
+    for schema, schema_engine in engines.items():
+        schema_engine.dispose()
+        with engine.begin() as connection:
+            connection.execute(sqlalchemy.text(f"DROP SCHEMA {schema} CASCADE"))
+
+
+def test_migrations_produce_schema_of_table_mapper(schema_engines):
+    applied = migrations.upgrade(engine=schema_engines["migrated_schema"])
+    mapper.metadata.create_all(
+        bind=schema_engines["created_schema"].execution_options(schema_translate_map={None: "created_schema"})
+    )
+    assert [migration.version for migration in applied] == [
+        migration.version for migration in migrations.load_migrations()
+    ]
+    assert describe_schema(engine=schema_engines["migrated_schema"], schema="migrated_schema") == \
+        describe_schema(engine=schema_engines["created_schema"], schema="created_schema")
+
+
+def test_migrations_upgrade_schema_created_before_migrations_and_are_applied_once(schema_engines):
+    migrated = schema_engines["migrated_schema"]
+    migrations.upgrade(engine=migrated, target=1)
+    with migrated.begin() as connection:
+        connection.execute(sqlalchemy.text("DELETE FROM schema_migrations"))
+    assert len(migrations.upgrade(engine=migrated)) == len(migrations.load_migrations())
+    assert migrations.upgrade(engine=migrated) == []
+    indexes = {row["index"] for row in migrations.get_index_usage(engine=migrated)}
+    assert "ix_adv_user_id_id" in indexes and "ix_adv_description" not in indexes
+
+
+def test_non_transactional_migration_rebuilds_index_left_invalid(schema_engines):
+    migrated = schema_engines["migrated_schema"]
+    migrations.upgrade(engine=migrated, target=4)
+    with migrated.begin() as connection:
+        connection.execute(sqlalchemy.text("CREATE INDEX ix_adv_title_id ON adv (title, id)"))
+        connection.execute(sqlalchemy.text(
+            "UPDATE pg_index SET indisvalid = false WHERE indexrelid = 'ix_adv_title_id'::regclass"
+        ))
+    migrations.upgrade(engine=migrated)
+    with migrated.connect() as connection:
+        assert connection.execute(sqlalchemy.text(
+            "SELECT indisvalid FROM pg_index WHERE indexrelid = 'ix_adv_title_id'::regclass"
+        )).scalar() is True
+
+
+def test_migrations_command_upgrades_every_shard(schema_engines, monkeypatch, capsys):
+    monkeypatch.setattr(app.orm, "shard_router", ShardRouter(engines=list(schema_engines.values())))
+    main(["upgrade", "--target", "1"])
+    main(["--shard", "1", "upgrade"])
+    main(["status"])
+    output = capsys.readouterr().out
+    assert output.count("Applied 1 migration(s).") == 2
+    assert f"Applied {len(migrations.load_migrations()) - 1} migration(s)." in output
+    shard_0_status, shard_1_status = output.split("Shard 0 (")[-1].split("Shard 1 (")
+    assert "pending" in shard_0_status and "pending" not in shard_1_status
@@ -0,0 +1,54 @@
+import pytest
+import sqlalchemy
+import sqlalchemy.pool
+
+import app.orm
+from app.orm.pool import create_pooled_engine, get_pool_options, get_pool_stats
+
+
+def test_get_pool_options_reads_queue_pool_settings():
+    options = get_pool_options(environ={"DB_POOL_SIZE": "2", "DB_POOL_MAX_OVERFLOW": "0", "DB_POOL_TIMEOUT": "1.5",
+                                        "DB_POOL_RECYCLE": "300", "DB_POOL_PRE_PING": "true"})
+    assert options == {"poolclass": sqlalchemy.pool.QueuePool, "pool_size": 2, "max_overflow": 0,
+                       "pool_timeout": 1.5, "pool_recycle": 300, "pool_pre_ping": True}
+
+
+def test_get_pool_options_leaves_out_sizing_for_null_pool():
+    assert get_pool_options(environ={"DB_POOL_CLASS": "null", "DB_POOL_SIZE": "2"}) == {
+        "poolclass": sqlalchemy.pool.NullPool, "pool_recycle": -1, "pool_pre_ping": False
+    }
+
+
+def test_get_pool_options_raises_value_error_for_unknown_pool_class():
+    with pytest.raises(ValueError):
+        get_pool_options(environ={"DB_POOL_CLASS": "invalid"})
+
+
+def test_pool_stats_count_checked_out_connections_overflow_and_timeouts():
+    engine = create_pooled_engine(app.orm.POSTGRES_DSN, pool_options=get_pool_options(
+        environ={"DB_POOL_SIZE": "1", "DB_POOL_MAX_OVERFLOW": "1", "DB_POOL_TIMEOUT": "0.1"}
+    ))
+    try:
+        with engine.connect(), engine.connect():
+            stats = get_pool_stats(engine)
+            assert (stats["checked_out"], stats["overflow"]) == (2, 1)
+            with pytest.raises(sqlalchemy.exc.TimeoutError):
+                engine.connect()
+        stats = get_pool_stats(engine)
+    finally:
+        engine.dispose()
+    assert stats["checked_out"] == 0
+    assert stats["checkouts"] == 2
+    assert stats["timeouts"] == 1
+    assert stats["wait_seconds_max"] >= 0.1
+
+
+def test_null_pool_stats_count_checked_out_connections():
+    engine = create_pooled_engine(app.orm.POSTGRES_DSN, pool_options=get_pool_options(
+        environ={"DB_POOL_CLASS": "null"}
+    ))
+    with engine.connect():
+        stats = get_pool_stats(engine)
+    engine.dispose()
+    assert stats["pool_class"] == "NullPool"
+    assert (stats["checked_out"], stats["overflow"], stats["size"]) == (1, None, None)
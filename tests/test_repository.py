@@ -0,0 +1,203 @@
+import datetime
+import io
+
+import pytest
+import sqlalchemy
+
+import app.domain.errors
+from app.domain import services
+from app.orm.sharding import ShardRouter
+from app.pass_hashing_and_validation.pass_hashing import check_password
+from app.repository.bulk_import import TARGETS, import_records, read_records
+from app.repository.repository import UserRepository, AdvRepository
+
+
+@pytest.fixture
+def statements(engine):
+    executed = []
+    listener = lambda conn, cursor, statement, *args: executed.append(statement.lstrip().split()[0])
+    sqlalchemy.event.listen(engine, "before_cursor_execute", listener)
+    yield executed
+    sqlalchemy.event.remove(engine, "before_cursor_execute", listener)
+
+
+def test_create_sets_generated_values_without_refresh_query(clear_db_before_and_after_test, session_maker,
+                                                            statements, test_user_data):
+    with session_maker() as sess:
+        user = UserRepository(session=sess).create(services.create_user(**test_user_data))
+        sess.commit()
+        user_id, creation_date = user.id, user.creation_date
+    assert user_id == 1
+    assert creation_date is not None
+    assert statements == ["INSERT"]
+
+
+def test_create_raises_already_exists_error_when_email_is_taken(clear_db_before_and_after_test, session_maker,
+                                                                test_user_data):
+    with session_maker() as sess:
+        UserRepository(session=sess).create(services.create_user(**test_user_data))
+        with pytest.raises(app.domain.errors.AlreadyExistsError):
+            UserRepository(session=sess).create(services.create_user(**test_user_data))
+
+
+def test_update_returns_none_when_owner_does_not_match(session_maker, create_test_users_and_advs, statements):
+    with session_maker() as sess:
+        advs = AdvRepository(session=sess)
+        assert advs.update(instance_id=1000, new_attrs={"title": "new_title"}, owner_id=1001) is None
+        updated = advs.update(instance_id=1000, new_attrs={"title": "new_title"}, owner_id=1000)
+        sess.rollback()
+    assert updated["title"] == "new_title"
+    assert statements == ["UPDATE", "UPDATE"]
+
+
+def test_update_maps_constraint_violations_to_domain_errors(session_maker, create_test_users_and_advs):
+    with session_maker() as sess:
+        users = UserRepository(session=sess)
+        with pytest.raises(app.domain.errors.AlreadyExistsError):
+            users.update(instance_id=1000, new_attrs={"email": "test_filter_1001@email.com"})
+        sess.rollback()
+        with pytest.raises(app.domain.errors.ValidationError) as e:
+            users.update(instance_id=1000, new_attrs={"name": None})
+        sess.rollback()
+    assert e.value.message == {"invalid_params": {"name": "Must not be null."}}
+
+
+def test_delete_by_id_returns_deleted_row_params(session_maker, create_test_users_and_advs, test_date):
+    with session_maker() as sess:
+        advs = AdvRepository(session=sess)
+        deleted = advs.delete_by_id(instance_id=1003, owner_id=1000)
+        exists = advs.exists(instance_id=1003)
+        sess.rollback()
+    assert deleted == {"id": 1003, "title": "test_filter_1003", "description": "test_filter_1003",
+                       "creation_date": test_date.isoformat(), "user_id": 1000}
+    assert exists is False
+
+
+def test_delete_by_id_deletes_advertisements_of_user_by_cascade(session_maker, create_test_users_and_advs):
+    with session_maker() as sess:
+        UserRepository(session=sess).delete_by_id(instance_id=1000)
+        remaining = sess.execute(sqlalchemy.text("SELECT count(*) FROM adv WHERE user_id = 1000")).scalar()
+        sess.rollback()
+    assert remaining == 0
+
+
+def test_soft_deleted_user_is_invisible_until_purged(session_maker, create_test_users_and_advs):
+    with session_maker() as sess:
+        users = UserRepository(session=sess)
+        deleted = users.soft_delete_by_id(instance_id=1000)
+        assert deleted["id"] == 1000
+        assert users.get(1000) is None
+        assert users.soft_delete_by_id(instance_id=1000) is None
+        assert users.update(instance_id=1000, new_attrs={"name": "new_name"}) is None
+        assert users.get_list_or_paginated_data(filter_type="column_value", comparison="is", column="id",
+                                                column_value=1000) == []
+        assert users.get_deleted_ids(limit=10) == [1000]
+        sess.rollback()
+
+
+def test_advertisements_of_soft_deleted_user_are_invisible_until_purged(session_maker, create_test_users_and_advs):
+    with session_maker() as sess:
+        UserRepository(session=sess).soft_delete_by_id(instance_id=1000)
+        advs = AdvRepository(session=sess)
+        assert advs.get(1000) is None and advs.exists(instance_id=1000) is False
+        assert advs.update(instance_id=1003, new_attrs={"title": "new_title"}, owner_id=1000) is None
+        listed = advs.get_list_or_paginated_data(filter_type="search_text", comparison=None, column="title",
+                                                 column_value="test_filter", paginate=True)
+        remaining = sess.execute(sqlalchemy.text("SELECT count(*) FROM adv WHERE user_id = 1000")).scalar()
+        sess.rollback()
+    assert sorted(item["id"] for item in listed["items"]) == [1001, 1004]
+    assert remaining == 2
+
+
+def test_delete_by_user_id_with_limit_deletes_one_batch(session_maker, create_test_users_and_advs):
+    with session_maker() as sess:
+        advs = AdvRepository(session=sess)
+        assert advs.delete_by_user_id(user_id=1000, limit=1) == 1
+        assert advs.delete_by_user_id(user_id=1000, limit=1) == 1
+        assert advs.delete_by_user_id(user_id=1000, limit=1) == 0
+        sess.rollback()
+
+
+def test_create_many_inserts_chunks_with_multi_row_statements(session_maker, create_test_users_and_advs, statements):
+    with session_maker() as sess:
+        advs = [services.create_adv(title=f"bulk_{i}", description="bulk", user_id=1000) for i in range(5)]
+        AdvRepository(session=sess).create_many(advs, chunk_size=2)
+        titles = dict(sess.execute(sqlalchemy.text("SELECT id, title FROM adv WHERE description = 'bulk'")).all())
+        sess.rollback()
+    assert statements[:3] == ["INSERT", "INSERT", "INSERT"]
+    assert {adv.id: adv.title for adv in advs} == titles
+    assert all(adv.creation_date is not None for adv in advs)
+
+
+def test_update_many_updates_owned_rows_of_chunk_after_id(session_maker, create_test_users_and_advs):
+    with session_maker() as sess:
+        advs = AdvRepository(session=sess)
+        first_chunk = advs.update_many(owner_id=1000, new_attrs={"description": "bulk"}, ids=[1000, 1001, 1003],
+                                       limit=1)
+        second_chunk = advs.update_many(owner_id=1000, new_attrs={"description": "bulk"}, ids=[1000, 1001, 1003],
+                                        after_id=first_chunk[-1], limit=1)
+        descriptions = dict(sess.execute(sqlalchemy.text("SELECT id, description FROM adv WHERE id >= 1000")).all())
+        sess.rollback()
+    assert (first_chunk, second_chunk) == ([1000], [1003])
+    assert [adv_id for adv_id, description in descriptions.items() if description == "bulk"] == [1000, 1003]
+
+
+def test_update_many_raises_validation_error_when_value_is_null(session_maker, create_test_users_and_advs):
+    with session_maker() as sess:
+        with pytest.raises(app.domain.errors.ValidationError) as e:
+            AdvRepository(session=sess).update_many(owner_id=1000, new_attrs={"title": None}, ids=[1000])
+        sess.rollback()
+    assert e.value.message == {"invalid_params": {"title": "Must not be null."}}
+
+
+def test_delete_many_deletes_owned_rows_matching_filter(session_maker, create_test_users_and_advs):
+    with session_maker() as sess:
+        deleted = AdvRepository(session=sess).delete_many(
+            owner_id=1001, filter_expression={"column": "title", "column_value": "test_filter_1004", "comparison": "is"}
+        )
+        sess.rollback()
+    assert deleted == [1004]
+
+
+def test_import_records_copies_batches_and_skips_conflicts(clear_db_before_and_after_test, engine, session_maker):
+    users_file = io.StringIO("name,email,password,creation_date\n"
+                             "user_1,user_1@email.com,pass_1,1900-01-01\n"
+                             "user_2,user_2@email.com,pass_2,\n"
+                             "user_3,user_1@email.com,pass_3,\n"
+                             "user_4,,pass_4,not_a_date\n"
+                             f"user_5,{'u' * 31}@email.com,pass_5,\n")
+    stats = import_records(shard_router=ShardRouter(engines=[engine]), target=TARGETS["users"], batch_size=2,
+                           workers=1, records=read_records(file=users_file, file_format="csv"))
+    assert (stats.read, stats.imported, stats.skipped, stats.invalid) == (5, 2, 1, 2)
+    advs_file = io.StringIO('{"title": "title_1", "description": "desc_1", "user_id": 1}\n\n'
+                            '{"title": "title_2", "description": "desc_2", "user_id": 100}\n'
+                            '{"title": "title_3", \n')
+    stats = import_records(shard_router=ShardRouter(engines=[engine]), target=TARGETS["advs"],
+                           records=read_records(file=advs_file, file_format="ndjson"))
+    assert (stats.read, stats.imported, stats.skipped, stats.invalid) == (3, 1, 1, 1)
+    with session_maker() as sess:
+        users = sess.execute(sqlalchemy.text('SELECT name, password, creation_date FROM "user" ORDER BY id')).all()
+        advs = sess.execute(sqlalchemy.text("SELECT title, user_id FROM adv")).all()
+    assert [user.name for user in users] == ["user_1", "user_2"]
+    assert users[0].creation_date == datetime.datetime(1900, 1, 1)
+    assert check_password(password="pass_1", hashed_password=users[0].password)
+    assert advs == [("title_1", 1)]
+
+
+def test_iter_filtered_data_streams_rows_through_server_side_cursor(session_maker, create_test_users_and_advs,
+                                                                     engine):
+    cursor_names = []
+    listener = lambda conn, cursor, *args: cursor_names.append(cursor.name)
+    sqlalchemy.event.listen(engine, "before_cursor_execute", listener)
+    try:
+        with session_maker() as sess:
+            rows = AdvRepository(session=sess).iter_filtered_data(
+                filter_type="search_text", comparison="is", column="title", column_value="test_filter",
+                sort="-id", fields="id,title", chunk_size=1
+            )
+            assert next(rows) == {"id": 1004, "title": "test_filter_1004"}
+            assert next(rows) == {"id": 1003, "title": "test_filter_1003"}
+            rows.close()
+    finally:
+        sqlalchemy.event.remove(engine, "before_cursor_execute", listener)
+    assert [name is not None for name in cursor_names] == [True]
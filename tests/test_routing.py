@@ -0,0 +1,64 @@
+import pytest
+import sqlalchemy
+
+from app.orm.routing import ReplicaRouter
+from app.service_layer.unit_of_work import UnitOfWork, ReadOnlyUnitOfWork
+
+
+@pytest.fixture
+def replica(engine):
+    # The tests have a single server, so a second engine on it stands for a replica that is always caught up.
+    replica = sqlalchemy.create_engine(engine.url)
+    yield replica
+    replica.dispose()
+
+
+def test_router_without_replicas_reads_from_primary(engine):
+    router = ReplicaRouter(primary=engine)
+    assert router.get_read_engine(keys=("user:1",)) is engine
+
+
+def test_router_balances_reads_round_robin(engine, replica):
+    other_replica = sqlalchemy.create_engine(engine.url)
+    router = ReplicaRouter(primary=engine, replicas=[replica, other_replica])
+    assert [router.get_read_engine() for _ in range(3)] == [replica, other_replica, replica]
+
+
+def test_router_reads_from_replica_that_has_replayed_last_write(engine, replica, session_maker):
+    router = ReplicaRouter(primary=engine, replicas=[replica])
+    with session_maker() as sess:
+        router.record_write(session=sess, keys=("user:1",))
+    assert router.get_read_engine(keys=("user:1",)) is replica
+
+
+def test_router_pins_client_to_primary_until_replica_catches_up(engine, replica, session_maker, monkeypatch):
+    router = ReplicaRouter(primary=engine, replicas=[replica])
+    with session_maker() as sess:
+        router.record_write(session=sess, keys=("user:1", "addr:127.0.0.1"))
+    monkeypatch.setattr(ReplicaRouter, "_has_replayed", staticmethod(lambda replica, lsn: False))
+    assert router.get_read_engine(keys=("addr:127.0.0.1",)) is engine
+    assert router.get_read_engine(keys=("user:2",)) is replica
+
+
+def test_router_unpins_client_after_window(engine, replica, session_maker, monkeypatch):
+    router = ReplicaRouter(primary=engine, replicas=[replica], pin_seconds=0)
+    with session_maker() as sess:
+        router.record_write(session=sess, keys=("user:1",))
+    monkeypatch.setattr(ReplicaRouter, "_has_replayed", staticmethod(lambda replica, lsn: False))
+    assert router.get_read_engine(keys=("user:1",)) is replica
+
+
+def test_read_only_unit_of_work_reads_from_primary_after_client_commits(engine, replica, monkeypatch,
+                                                                         create_test_users_and_advs):
+    router = ReplicaRouter(primary=engine, replicas=[replica])
+    monkeypatch.setattr(ReplicaRouter, "_has_replayed", staticmethod(lambda replica, lsn: False))
+    uow = UnitOfWork(client_keys=("user:1000",))
+    uow.router = router
+    with uow:
+        uow.session.execute(sqlalchemy.text("UPDATE adv SET title = 'routed' WHERE id = 1000"))
+        uow.commit()
+    for client_keys, bind in ((("user:1000",), engine), (("user:1001",), replica)):
+        read_only_uow = ReadOnlyUnitOfWork(client_keys=client_keys)
+        read_only_uow.router = router
+        with read_only_uow:
+            assert read_only_uow.session.get_bind() is bind
@@ -0,0 +1,190 @@
+import io
+import json
+
+import pytest
+import sqlalchemy
+
+import app.domain.errors
+import app.orm
+from app.orm.sharding import ShardRouter
+from app.orm.table_mapper import mapper
+from app.repository.bulk_import import TARGETS, import_records, read_records
+from app.service_layer import app_manager
+from app.service_layer.unit_of_work import UnitOfWork, ReadOnlyUnitOfWork
+
+SHARD_SCHEMAS = ("shard_0", "shard_1")
+
+
+@pytest.fixture
+def shard_engines(engine):
+    # Schemas of the test database stand for the databases of the shards.
+    engines = []
+    for schema in SHARD_SCHEMAS:
+        with engine.begin() as connection:
+            connection.execute(sqlalchemy.text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+            connection.execute(sqlalchemy.text(f"CREATE SCHEMA {schema}"))
+        shard_engine = sqlalchemy.create_engine(app.orm.POSTGRES_DSN,
+                                                connect_args={"options": f"-csearch_path={schema},public"})
+        mapper.metadata.create_all(bind=shard_engine.execution_options(schema_translate_map={None: schema}))
+        engines.append(shard_engine)
+    yield engines
+    for schema, shard_engine in zip(SHARD_SCHEMAS, engines):
+        shard_engine.dispose()
+        with engine.begin() as connection:
+            connection.execute(sqlalchemy.text(f"DROP SCHEMA {schema} CASCADE"))
+
+
+def route(uow: UnitOfWork, shard_router: ShardRouter) -> UnitOfWork:
+    uow.shard_router = shard_router
+    return uow
+
+
+def create_users_and_advs(shard_router: ShardRouter, users: int = 6, advs_per_user: int = 2) -> list[int]:
+    user_ids = []
+    for i in range(users):
+        user_id = app_manager.create_user(
+            user_data={"name": f"name_{i}", "email": f"user_{i}@email.com", "password": "password"},
+            validate_func=lambda **data: data, hash_pass_func=lambda password: password,
+            uow=route(UnitOfWork(), shard_router)
+        )
+        for j in range(advs_per_user):
+            app_manager.create_adv(get_auth_user_id_func=lambda: user_id, validate_func=lambda **data: data,
+                                   adv_params={"title": f"title_{i}_{j}", "description": "sharded"},
+                                   uow=route(UnitOfWork(), shard_router))
+        user_ids.append(user_id)
+    return user_ids
+
+
+def count_rows(shard_engine: sqlalchemy.Engine, table: str) -> list[int]:
+    with shard_engine.connect() as connection:
+        return list(connection.scalars(sqlalchemy.text(f'SELECT id FROM "{table}" ORDER BY id')))
+
+
+def test_shard_router_maps_users_to_shards():
+    hash_router = ShardRouter(engines=[None, None, None])
+    assert [hash_router.get_user_shard(user_id=user_id) for user_id in (3, 4, 5)] == [0, 1, 2]
+    assert hash_router.get_new_user_shard(email="User@email.com") == \
+        hash_router.get_new_user_shard(email="user@email.com")
+    range_router = ShardRouter(engines=[None, None], strategy="range", range_bounds=[0, 1000])
+    assert [range_router.get_user_shard(user_id=user_id) for user_id in (1, 999, 1000)] == [0, 0, 1]
+    assert range_router.get_new_user_shard(email="user@email.com") == 1
+    with pytest.raises(ValueError):
+        ShardRouter(engines=[None, None], strategy="range", range_bounds=[1000, 0])
+
+
+def test_users_and_advs_are_stored_on_shard_of_user(shard_engines):
+    shard_router = ShardRouter(engines=shard_engines)
+    shard_router.prepare_sequences()
+    create_users_and_advs(shard_router=shard_router)
+    for shard, shard_engine in enumerate(shard_engines):
+        user_ids = count_rows(shard_engine=shard_engine, table="user")
+        assert user_ids and all(user_id % 2 == shard for user_id in user_ids)
+        with shard_engine.connect() as connection:
+            assert set(connection.scalars(sqlalchemy.text("SELECT user_id FROM adv"))) == set(user_ids)
+
+
+def test_range_sharding_prepares_user_ids_of_shard_range(shard_engines):
+    shard_router = ShardRouter(engines=shard_engines, strategy="range", range_bounds=[0, 1000])
+    shard_router.prepare_sequences()
+    user_ids = create_users_and_advs(shard_router=shard_router, users=2, advs_per_user=1)
+    assert user_ids == [1000, 1001]
+    assert count_rows(shard_engine=shard_engines[1], table="user") == user_ids
+
+
+def test_user_scoped_reads_are_routed_to_one_shard(shard_engines):
+    shard_router = ShardRouter(engines=shard_engines)
+    shard_router.prepare_sequences()
+    user_id = create_users_and_advs(shard_router=shard_router)[0]
+    result = app_manager.get_related_advs(
+        authenticated_user_id=user_id, check_current_user_func=lambda user_id, get_cuid=True: user_id,
+        uow=route(ReadOnlyUnitOfWork(), shard_router)
+    )
+    assert [item["user_id"] for item in result["items"]] == [user_id, user_id]
+
+
+def test_search_fans_out_to_all_shards_and_merges_pages(shard_engines):
+    shard_router = ShardRouter(engines=shard_engines)
+    shard_router.prepare_sequences()
+    create_users_and_advs(shard_router=shard_router)
+    adv_ids = sorted(count_rows(shard_engine=shard_engines[0], table="adv") +
+                     count_rows(shard_engine=shard_engines[1], table="adv"))
+    search = lambda **params: app_manager.search_advs_by_text(
+        column="description", column_value="sharded", per_page=5, uow=route(ReadOnlyUnitOfWork(), shard_router),
+        **params
+    )
+    page = search(page=2, include_total="exact", fields="id,title")
+    assert [item["id"] for item in page["items"]] == adv_ids[5:10]
+    assert list(page["items"][0]) == ["id", "title"]
+    assert (page["total"], page["total_pages"]) == (12, 3)
+    seen, cursor = [], ""
+    while cursor is not None:
+        page = search(cursor=cursor, sort="-id", fields="title")
+        seen.extend(page["items"])
+        cursor = page["next_cursor"]
+    assert len(seen) == len(adv_ids) == 12
+    assert seen[0] == {"title": "title_5_1"}
+
+
+def test_export_merges_streams_of_all_shards(shard_engines):
+    shard_router = ShardRouter(engines=shard_engines)
+    shard_router.prepare_sequences()
+    create_users_and_advs(shard_router=shard_router)
+    adv_ids = sorted(count_rows(shard_engine=shard_engines[0], table="adv") +
+                     count_rows(shard_engine=shard_engines[1], table="adv"))
+    rows = app_manager.export_advs(column="description", column_value="sharded", sort="-id", fields="title",
+                                   chunk_size=2, uow=route(ReadOnlyUnitOfWork(), shard_router))
+    items = list(rows)
+    assert len(items) == len(adv_ids) == 12
+    assert items[0] == {"title": "title_5_1"}
+
+
+def test_repeated_search_counts_total_of_every_shard(shard_engines):
+    shard_router = ShardRouter(engines=shard_engines)
+    shard_router.prepare_sequences()
+    user_ids = create_users_and_advs(shard_router=shard_router)
+    for j in range(4):
+        app_manager.create_adv(get_auth_user_id_func=lambda: user_ids[0], validate_func=lambda **data: data,
+                               adv_params={"title": f"extra_{j}", "description": "sharded"},
+                               uow=route(UnitOfWork(), shard_router))
+    shard_counts = [len(count_rows(shard_engine=shard_engine, table="adv")) for shard_engine in shard_engines]
+    assert shard_counts[0] != shard_counts[1]
+    totals = [
+        app_manager.search_advs_by_text(column="description", column_value="sharded", include_total="exact",
+                                        uow=route(ReadOnlyUnitOfWork(), shard_router))["total"]
+        for _ in range(2)
+    ]
+    assert totals == [sum(shard_counts)] * 2 == [16] * 2
+
+
+def test_import_routes_users_and_advs_to_their_shards(shard_engines):
+    shard_router = ShardRouter(engines=shard_engines)
+    shard_router.prepare_sequences()
+    emails = [f"imported_{i}@email.com" for i in range(6)]
+    users_file = io.StringIO("".join(
+        json.dumps({"name": f"name_{i}", "email": email, "password": "password"}) + "\n"
+        for i, email in enumerate(emails)
+    ))
+    stats = import_records(shard_router=shard_router, target=TARGETS["users"], workers=1,
+                           records=read_records(file=users_file, file_format="ndjson"))
+    assert stats.imported == 6
+    user_ids = {}
+    for shard, shard_engine in enumerate(shard_engines):
+        with shard_engine.connect() as connection:
+            for user_id, email in connection.execute(sqlalchemy.text('SELECT id, email FROM "user"')):
+                assert shard == shard_router.get_new_user_shard(email=email) == \
+                       shard_router.get_user_shard(user_id=user_id)
+                user_ids[email] = user_id
+    assert sorted(user_ids) == sorted(emails)
+    advs_file = io.StringIO("".join(
+        json.dumps({"title": f"title_{user_id}", "description": "imported", "user_id": user_id}) + "\n"
+        for user_id in user_ids.values()
+    ))
+    stats = import_records(shard_router=shard_router, target=TARGETS["advs"],
+                           records=read_records(file=advs_file, file_format="ndjson"))
+    assert (stats.imported, stats.skipped) == (6, 0)
+    with pytest.raises(app.domain.errors.AlreadyExistsError):
+        app_manager.create_user(
+            user_data={"name": "name", "email": emails[0], "password": "password"},
+            validate_func=lambda **data: data, hash_pass_func=lambda password: password,
+            uow=route(UnitOfWork(), shard_router)
+        )
@@ -0,0 +1,75 @@
+import subprocess
+import sys
+
+import pytest
+import sqlalchemy
+
+import app.domain.errors
+from app.service_layer import app_manager
+from app.service_layer.unit_of_work import UnitOfWork, ReadOnlyUnitOfWork, BatchUnitOfWork
+
+
+@pytest.mark.parametrize("module", ["app.repository.repository", "app.service_layer.unit_of_work",
+                                    "app.service_layer.app_manager"])
+def test_module_imports_in_fresh_interpreter(module):
+    process = subprocess.run([sys.executable, "-c", f"import {module}"], capture_output=True, text=True)
+    assert process.returncode == 0, process.stderr
+
+
+def test_read_only_unit_of_work_runs_read_only_transaction(create_test_users_and_advs):
+    with ReadOnlyUnitOfWork() as uow:
+        assert uow.session.execute(sqlalchemy.text("SHOW transaction_read_only")).scalar() == "on"
+        assert uow.session.autoflush is False and uow.session.expire_on_commit is False
+        with pytest.raises(sqlalchemy.exc.InternalError):
+            uow.session.execute(sqlalchemy.text('DELETE FROM "adv" WHERE id = 1000'))
+        with pytest.raises(app.domain.errors.ReadOnlyError):
+            uow.commit()
+
+
+def test_unit_of_work_is_not_read_only_after_read_only_one_returns_connection(create_test_users_and_advs):
+    with ReadOnlyUnitOfWork(deferrable=True):
+        pass
+    with UnitOfWork() as uow:
+        assert uow.session.execute(sqlalchemy.text("SHOW transaction_read_only")).scalar() == "off"
+
+
+@pytest.mark.parametrize("service_function,uow_class", ((app_manager.get_user_data, ReadOnlyUnitOfWork),
+                                                        (app_manager.search_advs_by_text, ReadOnlyUnitOfWork),
+                                                        (app_manager.update_adv, UnitOfWork),
+                                                        (app_manager.run_batch, BatchUnitOfWork)))
+def test_service_functions_declare_unit_of_work(service_function, uow_class):
+    assert service_function.unit_of_work is uow_class
+
+
+def test_purge_deleted_users_deletes_advertisements_in_batches_then_users(create_test_users_and_advs):
+    with UnitOfWork() as uow:
+        uow.users.soft_delete_by_id(instance_id=1000)
+        uow.commit()
+    assert app_manager.purge_deleted_users(uow=UnitOfWork(), batch_size=1) == 1
+    with UnitOfWork() as uow:
+        assert uow.session.execute(sqlalchemy.text('SELECT count(*) FROM "user" WHERE id = 1000')).scalar() == 0
+        assert uow.session.execute(sqlalchemy.text("SELECT count(*) FROM adv WHERE user_id = 1000")).scalar() == 0
+        assert uow.users.get(1001) is not None
+
+
+def test_batch_unit_of_work_runs_operations_in_one_transaction(create_test_users_and_advs):
+    operations = [
+        lambda uow: app_manager.delete_adv(adv_id=1000, get_auth_user_id_func=lambda: 1000, uow=uow),
+        lambda uow: app_manager.delete_adv(adv_id=1001, get_auth_user_id_func=lambda: 1000, uow=uow),
+        lambda uow: app_manager.delete_adv(adv_id=1003, get_auth_user_id_func=lambda: 1000, uow=uow)
+    ]
+    outcomes, committed = app_manager.run_batch(get_auth_user_id_func=lambda: 1000, operations=operations,
+                                                uow=BatchUnitOfWork())
+    assert committed
+    assert outcomes[0][0]["id"] == 1000 and outcomes[2][0]["id"] == 1003
+    assert isinstance(outcomes[1][1], app.domain.errors.CurrentUserError)
+    outcomes, committed = app_manager.run_batch(get_auth_user_id_func=lambda: 1001, operations=[
+        lambda uow: app_manager.delete_adv(adv_id=1001, get_auth_user_id_func=lambda: 1001, uow=uow),
+        lambda uow: app_manager.delete_adv(adv_id=1000, get_auth_user_id_func=lambda: 1001, uow=uow),
+        lambda uow: app_manager.delete_adv(adv_id=1004, get_auth_user_id_func=lambda: 1001, uow=uow)
+    ], uow=BatchUnitOfWork(), atomic=True)
+    assert not committed
+    assert len(outcomes) == 2 and isinstance(outcomes[1][1], app.domain.errors.NotFoundError)
+    with UnitOfWork() as uow:
+        assert uow.session.execute(sqlalchemy.text("SELECT array_agg(id ORDER BY id) FROM adv")).scalar() == \
+            [1001, 1004]
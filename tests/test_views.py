@@ -1,3 +1,4 @@
+import json
 from typing import Literal
 import pytest
 from datetime import datetime
@@ -42,9 +43,6 @@ def test_adv_id() -> Literal[1]:
     return 1
 
 
-app.orm.table_mapper.start_mapping()
-
-
 def test_create_user(test_client, clear_db_before_and_after_test):
     user_data = {"name": "test_name", "email": "test@email.com", "password": "test_password"}
     response = test_client.post("http://127.0.0.1:5000/users/", json=user_data)
@@ -257,6 +255,16 @@ def test_update_user_returns_403_when_user_has_no_authority_to_update(
     assert response.json == {"errors": "Unavailable operation."}
 
 
+def test_update_user_returns_409_when_email_is_taken(
+        clear_db_before_and_after_test, create_user_through_http, test_client, access_token
+):
+    test_client.post("http://127.0.0.1:5000/users/",
+                     json={"name": "other_name", "email": "other@email.test", "password": "other_pass"})
+    response = test_client.patch("http://127.0.0.1:5000/users/1/", json={"email": "other@email.test"},
+                                 headers={"Authorization": f"Bearer {access_token}"})
+    assert response.status_code == 409
+
+
 def test_get_related_advs_returns_200(
         clear_db_before_and_after_test, test_client, access_token, create_adv_through_http, test_date, test_adv_params
 ):
@@ -356,6 +364,17 @@ def test_get_related_advs_returns_200_when_incorrect_page_and_per_page_params_pa
                              "total_pages": 1}
 
 
+def test_get_related_advs_returns_400_when_invalid_include_total_passed(
+        clear_db_before_and_after_test, test_client, access_token, create_adv_through_http
+):
+    response = test_client.get("http://127.0.0.1:5000/users/1/advertisements?include_total=bad",
+                               headers={"Authorization": f"Bearer {access_token}"})
+    assert response.status_code == 400
+    assert response.json == {
+        "errors": "{'invalid_params': {'include_total': \"Valid values are: ['exact', 'estimate', 'none']\"}}"
+    }
+
+
 def test_search_advs_by_text_returns_200(
         clear_db_before_and_after_test, create_adv_through_http, test_client, test_adv_params
 ):
@@ -464,6 +483,16 @@ def test_update_adv_returns_400_when_invalid_new_adv_params_passed(
     }
 
 
+def test_update_adv_returns_400_when_null_is_passed(clear_db_before_and_after_test, test_client,
+                                                   create_adv_through_http, access_token, test_adv_id):
+    response = test_client.patch(
+        f"http://127.0.0.1:5000/advertisements/{test_adv_id}/", headers={"Authorization": f"Bearer {access_token}"},
+        json={"title": None}
+    )
+    assert response.status_code == 400
+    assert "Must not be null." in response.json["errors"]
+
+
 def test_update_adv_returns_403_when_current_user_check_fails(
         clear_db_before_and_after_test, test_client, create_adv_through_http, access_token, test_adv_id
 ):
@@ -589,3 +618,238 @@ def test_login_returns_400_when_incomplete_credentials_passed(test_client, input
         "errors": f"[{{'type': 'missing', 'loc': ('{missed_field}',), 'msg': 'Field required', 'input': {input_data}, "
                   f"'url': 'https://errors.pydantic.dev/2.9/v/missing'}}]"
     }
+
+
+def test_search_advs_by_text_returns_next_cursor_when_cursor_is_passed(
+        clear_db_before_and_after_test, create_adv_through_http, test_client, test_adv_params
+):
+    response = test_client.get("http://127.0.0.1:5000/advertisements?column_value=test&cursor=")
+    assert response.status_code == 200
+    assert response.json == {"items": [{test_adv_params["title"]: test_adv_params["description"]}],
+                             "per_page": 10,
+                             "next_cursor": None}
+
+
+def test_search_advs_by_text_returns_400_when_invalid_cursor_passed(
+        clear_db_before_and_after_test, create_adv_through_http, test_client
+):
+    response = test_client.get("http://127.0.0.1:5000/advertisements?column_value=test&cursor=invalid")
+    assert response.status_code == 400
+    assert response.json == {"errors": "{'invalid_params': {'cursor': 'Invalid cursor.'}}"}
+
+
+def test_search_advs_by_text_returns_200_when_full_text_search_is_requested(
+        clear_db_before_and_after_test, create_adv_through_http, test_client, test_adv_params
+):
+    response = test_client.get("http://127.0.0.1:5000/advertisements?filter_type=full_text&column_value=test&rank=1")
+    assert response.status_code == 200
+    assert response.json == {"items": [{test_adv_params["title"]: test_adv_params["description"]}],
+                             "page": 1,
+                             "per_page": 10,
+                             "total": 1,
+                             "total_pages": 1}
+
+
+def test_search_advs_by_text_returns_200_when_filter_expression_passed(
+        clear_db_before_and_after_test, create_adv_through_http, test_client, test_adv_params
+):
+    response = test_client.get(
+        "http://127.0.0.1:5000/advertisements",
+        query_string={"filter": '{"and": [{"column": "user_id", "comparison": "is", "column_value": "1"}, '
+                                '{"filter_type": "search_text", "column": "title", "column_value": "test"}]}'}
+    )
+    assert response.status_code == 200
+    assert response.json == {"items": [{test_adv_params["title"]: test_adv_params["description"]}],
+                             "page": 1,
+                             "per_page": 10,
+                             "total": 1,
+                             "total_pages": 1}
+
+
+@pytest.mark.parametrize("predicate", (
+        {"column": "id", "column_value": [1], "comparison": "is"},
+        {"column": "id", "column_value": True, "comparison": "is"},
+        {"column": "title", "column_value": {"a": 1}, "comparison": "is"},
+        {"filter_type": "fuzzy", "column": "title", "column_value": ["x"]},
+        {"filter_type": "full_text", "column_value": {"x": 1}},
+        {"filter_type": "search_text", "column": "title", "column_value": ["x"]}
+))
+def test_search_advs_by_text_returns_400_when_filter_expression_value_is_not_scalar(
+        clear_db_before_and_after_test, create_adv_through_http, test_client, predicate
+):
+    response = test_client.get("http://127.0.0.1:5000/advertisements",
+                               query_string={"filter": json.dumps({"and": [predicate]})})
+    assert response.status_code == 400
+    assert "invalid_params" in response.json["errors"] and "column_value" in response.json["errors"]
+
+
+def test_search_advs_by_text_returns_400_when_invalid_sort_passed(
+        clear_db_before_and_after_test, create_adv_through_http, test_client
+):
+    response = test_client.get("http://127.0.0.1:5000/advertisements?column_value=test&sort=description")
+    assert response.status_code == 400
+    assert "'sort': \"Valid values are: ['id', '-id', 'title', '-title'" in response.json["errors"]
+
+
+def test_search_advs_by_text_returns_only_fields_passed(
+        clear_db_before_and_after_test, create_adv_through_http, test_client, test_adv_params
+):
+    response = test_client.get("http://127.0.0.1:5000/advertisements?column_value=test&fields=id,title")
+    assert response.status_code == 200
+    assert response.json["items"] == [{"id": 1, "title": test_adv_params["title"]}]
+
+
+def test_get_pool_stats_returns_counters_of_primary_pool(clear_db_before_and_after_test, test_client, access_token):
+    response = test_client.get(
+        "http://127.0.0.1:5000/pool_stats/", headers={"Authorization": f"Bearer {access_token}"}
+    )
+    assert response.status_code == 200
+    assert response.json["replicas"] == response.json["shards"] == []
+    assert response.json["primary"]["checkouts"] > 0
+    assert response.json["primary"]["pool_class"] == "QueuePool"
+
+
+def test_create_advs_returns_201_with_ids_of_created_advs(clear_db_before_and_after_test, test_client, access_token):
+    response = test_client.post(
+        "http://127.0.0.1:5000/advertisements/bulk?skip_invalid=true",
+        headers={"Authorization": f"Bearer {access_token}"},
+        json=[{"title": "title_1", "description": "description_1"}, {"title": 1, "description": "description_2"},
+              {"title": "title_3", "description": "description_3"}]
+    )
+    assert response.status_code == 201
+    assert response.json["created"] == [{"index": 0, "id": 1}, {"index": 2, "id": 2}]
+    assert response.json["errors"][0]["index"] == 1
+
+
+def test_create_advs_returns_400_when_any_adv_is_invalid(clear_db_before_and_after_test, test_client,
+                                                         access_token):
+    response = test_client.post(
+        "http://127.0.0.1:5000/advertisements/bulk", headers={"Authorization": f"Bearer {access_token}"},
+        json=[{"title": "title_1", "description": "description_1"}, {"title": "title_2"}]
+    )
+    assert response.status_code == 400
+    assert response.json["errors"][0]["loc"] == [1, "description"]
+
+
+def test_update_advs_and_delete_advs_return_affected_ids(clear_db_before_and_after_test, test_client,
+                                                         access_token):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    test_client.post("http://127.0.0.1:5000/advertisements/bulk", headers=headers,
+                     json=[{"title": f"title_{i}", "description": "old"} for i in range(3)])
+    response = test_client.patch("http://127.0.0.1:5000/advertisements/bulk", headers=headers,
+                                 json={"ids": [1, 3], "set": {"description": "new"}})
+    assert (response.status_code, response.json) == (200, {"updated_advertisement_ids": [1, 3]})
+    response = test_client.delete(
+        "http://127.0.0.1:5000/advertisements/bulk", headers=headers,
+        json={"filter": {"column": "description", "column_value": "new", "comparison": "is"}}
+    )
+    assert (response.status_code, response.json) == (200, {"deleted_advertisement_ids": [1, 3]})
+
+
+@pytest.mark.parametrize("json", ({}, {"ids": [1], "filter": {}}, {"ids": [1]}, {"ids": [1], "set": {"title": 1}},
+                                  {"ids": [1], "set": ["x"]}, {"ids": [1], "set": "x"},
+                                  {"ids": [1], "set": {"title": None}}))
+def test_update_advs_returns_400_when_params_are_invalid(clear_db_before_and_after_test, test_client, access_token,
+                                                         json):
+    response = test_client.patch("http://127.0.0.1:5000/advertisements/bulk",
+                                 headers={"Authorization": f"Bearer {access_token}"}, json=json)
+    assert response.status_code == 400
+
+
+def test_export_advs_streams_ndjson(clear_db_before_and_after_test, create_adv_through_http, test_client,
+                                    test_adv_params):
+    response = test_client.get("http://127.0.0.1:5000/advertisements/export?column_value=test")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert response.is_streamed
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(row["id"], row["title"], row["description"]) for row in rows] == [
+        (1, test_adv_params["title"], test_adv_params["description"])
+    ]
+
+
+def test_export_advs_streams_csv_of_fields_passed(clear_db_before_and_after_test, create_adv_through_http,
+                                                  test_client, test_adv_params):
+    response = test_client.get("http://127.0.0.1:5000/advertisements/export?column_value=test&format=csv"
+                               "&fields=id,title")
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    assert response.get_data(as_text=True).splitlines() == ["id,title", f"1,{test_adv_params['title']}"]
+
+
+@pytest.mark.parametrize("query_string", ["column_value=test&format=xml", "column_value=test&sort=description"])
+def test_export_advs_returns_400_when_invalid_params_passed(clear_db_before_and_after_test, test_client,
+                                                            query_string):
+    response = test_client.get(f"http://127.0.0.1:5000/advertisements/export?{query_string}")
+    assert response.status_code == 400
+
+
+def test_run_batch_returns_result_of_each_operation(clear_db_before_and_after_test, test_client, access_token,
+                                                   test_user_data):
+    response = test_client.post(
+        "http://127.0.0.1:5000/batch", headers={"Authorization": f"Bearer {access_token}"},
+        json={"operations": [
+            {"op": "create_adv", "params": {"adv_params": {"title": "title_1", "description": "description_1"}}},
+            {"op": "update_adv", "params": {"adv_id": 100, "new_params": {"title": "new_title"}}},
+            {"op": "update_adv", "params": {"adv_id": 1, "new_params": {"title": "new_title"}}},
+            {"op": "get_user", "params": {"user_id": 1}}
+        ]}
+    )
+    assert response.status_code == 200
+    assert response.json["committed"] is True
+    results = response.json["results"]
+    assert results[0] == {"status": 201, "result": {"new_advertisement_id": 1}}
+    assert results[1]["status"] == 404
+    assert results[2]["status"] == 200 and results[2]["result"]["updated_adv_params"]["title"] == "new_title"
+    assert results[3]["status"] == 200 and results[3]["result"]["email"] == test_user_data["email"]
+    response = test_client.get("http://127.0.0.1:5000/advertisements/1/",
+                               headers={"Authorization": f"Bearer {access_token}"})
+    assert response.json["title"] == "new_title"
+
+
+def test_run_batch_rolls_back_atomic_batch_when_operation_fails(clear_db_before_and_after_test, test_client,
+                                                                access_token):
+    response = test_client.post(
+        "http://127.0.0.1:5000/batch", headers={"Authorization": f"Bearer {access_token}"},
+        json={"atomic": True, "operations": [
+            {"op": "create_adv", "params": {"adv_params": {"title": "title_1", "description": "description_1"}}},
+            {"op": "delete_adv", "params": {"adv_id": 100}},
+            {"op": "get_user", "params": {"user_id": 1}}
+        ]}
+    )
+    assert response.status_code == 200
+    assert response.json["committed"] is False
+    assert [result["status"] for result in response.json["results"]] == [424, 404, 424]
+    assert response.json["results"][0] == {"status": 424, "errors": "Rolled back: a later operation failed."}
+    response = test_client.get("http://127.0.0.1:5000/advertisements/1/",
+                               headers={"Authorization": f"Bearer {access_token}"})
+    assert response.status_code == 404
+
+
+def test_run_batch_returns_409_with_subject_when_email_is_taken(clear_db_before_and_after_test, test_client,
+                                                                access_token, test_user_data):
+    test_client.post("http://127.0.0.1:5000/users/",
+                     json={**test_user_data, "email": "taken@email.com"})
+    response = test_client.post(
+        "http://127.0.0.1:5000/batch", headers={"Authorization": f"Bearer {access_token}"},
+        json={"operations": [{"op": "update_user", "params": {"user_id": 1, "new_data": {"email": "taken@email.com"}}}]}
+    )
+    assert response.json["results"] == [
+        {"status": 409, "errors": "A user with the provided params already existsts."}
+    ]
+
+
+@pytest.mark.parametrize("body", [
+    {"operations": []},
+    {"operations": [{"op": "drop_table"}]},
+    {"operations": [{"op": "get_user", "params": {"user_id": 1, "uow": None}}]},
+    {"operations": [{"op": "get_adv", "params": {"adv_id": "x"}}]},
+    {"operations": [{"op": "update_user", "params": {"user_id": 1, "new_data": ["a"]}}]},
+    {"atomic": True, "operations": [{"op": "get_user", "params": {"user_id": 1}},
+                                    {"op": "create_adv", "params": {"adv_params": "str"}}]}
+])
+def test_run_batch_returns_400_when_invalid_operations_passed(clear_db_before_and_after_test, test_client,
+                                                              access_token, body):
+    response = test_client.post("http://127.0.0.1:5000/batch", json=body,
+                                headers={"Authorization": f"Bearer {access_token}"})
+    assert response.status_code == 400